@@ -0,0 +1,324 @@
+###### LLM admission control ######
+# Every request to the LLM endpoint, from any session, job worker or the batch
+# analyzer, passes one process-wide gate before it is sent (see llm_client.py):
+#
+#   - requests-per-minute and tokens-per-minute budgets (LLM_RPM, LLM_TPM), as token
+#     buckets holding LLM_BURST_S seconds of budget. A request is charged its
+#     estimated prompt tokens plus max_tokens up front; the difference from the
+#     reported usage is settled when it finishes.
+#   - a concurrency limit that adapts: halved on a 429 (at most once per cooldown),
+#     cut by 10% while latency runs above LLM_LATENCY_TOLERANCE times its recent
+#     floor, and otherwise raised by one per limit's worth of successful calls, up to
+#     LLM_MAX_CONCURRENCY. Latency is tracked per request shape (model, max_tokens,
+#     streamed or not): a 2048-token JSON answer is never compared with a 350-token
+#     summary.
+#   - a fair queue: lower priority values first (interactive uploads before batch
+#     jobs), then the client (one upload, one batch resume) served least recently,
+#     FIFO within a client.
+#
+# The caller's priority and client come from request_class(), a context variable,
+# so asyncio tasks and pipeline stages inherit them.
+import asyncio
+import collections
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+import telemetry
+from compaction import estimate_tokens
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+LLM_ADMISSION = os.getenv('LLM_ADMISSION', '1') != '0'
+# Budgets of the endpoint account; 0 disables a budget
+LLM_RPM = int(os.getenv('LLM_RPM', 600))
+LLM_TPM = int(os.getenv('LLM_TPM', 1000000))
+# Seconds of budget that may be spent at once; DashScope throttles bursts well below a full minute's budget
+LLM_BURST_S = float(os.getenv('LLM_BURST_S', 10))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 16))
+LLM_MIN_CONCURRENCY = int(os.getenv('LLM_MIN_CONCURRENCY', 1))
+# A request still queued after this long fails like any other LLM error
+LLM_ADMISSION_TIMEOUT = float(os.getenv('LLM_ADMISSION_TIMEOUT', 300))
+LLM_LATENCY_TOLERANCE = float(os.getenv('LLM_LATENCY_TOLERANCE', 2.0))
+# Decreases closer together than this count as one (a burst of 429s is one signal)
+DECREASE_COOLDOWN_S = 2.0
+LATENCY_EWMA_WEIGHT = 0.1
+# The latency floor creeps up by this much per call, so a lasting slowdown becomes the new normal
+LATENCY_FLOOR_DRIFT = 0.001
+WAIT_SAMPLES = 512
+MAX_TRACKED_CLIENTS = 4096
+
+_request_class = contextvars.ContextVar("llm_request_class", default=(PRIORITY_INTERACTIVE, None))
+
+
+@contextlib.contextmanager
+def request_class(priority, client=None):
+    """Priority and fairness key (e.g. an upload's hash) of the LLM calls made inside the block."""
+    token = _request_class.set((priority, client))
+    try:
+        yield
+    finally:
+        _request_class.reset(token)
+
+def estimate_request_tokens(request):
+    """Tokens a chat completion request can use: the estimated prompt plus max_tokens."""
+    prompt_tokens = sum(estimate_tokens(message.get("content") or "") for message in request.get("messages", ()))
+    return prompt_tokens + request.get("max_tokens", 0)
+
+def request_shape(request):
+    """Requests expected to take about as long as each other, for latency tracking."""
+    return request.get("model"), request.get("max_tokens"), bool(request.get("stream"))
+
+
+class _Bucket:
+    """Refills `per_minute` units per minute, holding at most `burst_s` seconds' worth; 0 means unlimited."""
+    def __init__(self, per_minute, burst_s):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * burst_s, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_s(self, amount, now):
+        """Seconds until `amount` can be taken (a request larger than the bucket waits for a full one)."""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount, now):
+        # May go negative: a request that used more than its estimate delays the ones after it
+        if self.rate:
+            self._refill(now)
+            self.level -= amount
+
+
+class _Ticket:
+    __slots__ = ("tokens", "shape", "priority", "client", "seq", "enqueued_at", "granted", "grant")
+
+    def __init__(self, tokens, shape, priority, client, seq, grant):
+        self.tokens = tokens
+        self.shape = shape
+        self.priority = priority
+        self.client = client
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.grant = grant
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    Gate for LLM requests: acquire() (or acquire_async()) before sending, release() with
+    the outcome afterwards. A dispatcher thread grants queued requests as budget and
+    concurrency allow. stats() reports the queue for the UI and the load test.
+    """
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, burst_s=LLM_BURST_S, max_concurrency=LLM_MAX_CONCURRENCY,
+                 min_concurrency=LLM_MIN_CONCURRENCY, timeout_s=LLM_ADMISSION_TIMEOUT, enabled=LLM_ADMISSION):
+        self.enabled = enabled
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.timeout_s = timeout_s
+        self._requests = _Bucket(rpm, burst_s)
+        self._tokens = _Bucket(tpm, burst_s)
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._queues = {}  # priority -> {client: deque of tickets}
+        self._last_served = {}  # client -> number of the grant it last received
+        self._seq = 0
+        self._grants = 0
+        self._latency = {}  # request shape -> [latency EWMA, latency floor]
+        self._last_decrease = 0.0
+        self._waits = collections.deque(maxlen=WAIT_SAMPLES)
+        self._counts = {"admitted": 0, "throttled": 0, "timed_out": 0}
+        self._lock = threading.Condition()
+        self._dispatcher = None
+
+    ###### Queue ######
+    def _enqueue(self, tokens, shape, grant):
+        priority, client = _request_class.get()
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="llm-admission", daemon=True)
+                self._dispatcher.start()
+            self._seq += 1
+            ticket = _Ticket(tokens, shape, priority, client, self._seq, grant)
+            self._queues.setdefault(priority, {}).setdefault(client, collections.deque()).append(ticket)
+            self._lock.notify_all()
+        return ticket
+
+    def _head(self):
+        for priority in sorted(self._queues):
+            clients = self._queues[priority]
+            if clients:
+                client = min(clients, key=lambda c: (self._last_served.get(c, 0), clients[c][0].seq))
+                return clients[client][0]
+        return None
+
+    def _remove(self, ticket):
+        clients = self._queues[ticket.priority]
+        tickets = clients[ticket.client]
+        tickets.remove(ticket)
+        if not tickets:
+            del clients[ticket.client]
+
+    def _next_grant(self):
+        """(ticket to grant, None) or (None, seconds to wait; None until notified)."""
+        ticket = self._head()
+        if ticket is None or self._in_flight >= int(self._limit):
+            return None, None
+        now = time.monotonic()
+        wait_s = max(self._requests.wait_s(1, now), self._tokens.wait_s(ticket.tokens, now))
+        if wait_s > 0:
+            return None, wait_s
+        self._requests.take(1, now)
+        self._tokens.take(ticket.tokens, now)
+        self._remove(ticket)
+        self._in_flight += 1
+        self._grants += 1
+        self._last_served[ticket.client] = self._grants
+        if len(self._last_served) > MAX_TRACKED_CLIENTS:
+            waiting = {client for clients in self._queues.values() for client in clients}
+            self._last_served = {client: seq for client, seq in self._last_served.items() if client in waiting}
+        ticket.granted = True
+        self._counts["admitted"] += 1
+        self._waits.append(now - ticket.enqueued_at)
+        return ticket, None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                ticket, wait_s = self._next_grant()
+                if ticket is None:
+                    self._lock.wait(wait_s)
+                    continue
+                depth = sum(len(tickets) for clients in self._queues.values() for tickets in clients.values())
+            try:
+                ticket.grant()
+            except Exception:
+                # The waiter is gone (its event loop closed, e.g. a cancelled stage as asyncio.run
+                # ended): hand the slot back rather than let the dispatcher thread die
+                self.release(ticket, tokens_used=0)
+                continue
+            telemetry.observe("llm_admission_wait_seconds", time.monotonic() - ticket.enqueued_at)
+            telemetry.gauge("llm_admission_queue_depth", depth)
+
+    def _withdraw(self, ticket):
+        """Take a waiting ticket out of the queue; True if it had been granted meanwhile."""
+        with self._lock:
+            if not ticket.granted:
+                self._remove(ticket)
+            return ticket.granted
+
+    ###### Acquire / release ######
+    def acquire(self, tokens, shape=None):
+        """
+        Block until a request of `tokens` estimated tokens may be sent; returns the ticket
+        for release(). `shape` (see request_shape) groups the latencies the concurrency limit
+        follows. Raises TimeoutError after timeout_s in the queue.
+        """
+        if not self.enabled:
+            return None
+        granted = threading.Event()
+        ticket = self._enqueue(tokens, shape, granted.set)
+        if not granted.wait(self.timeout_s) and not self._withdraw(ticket):
+            self._count_timeout()
+            raise TimeoutError(f"No LLM capacity within {self.timeout_s:g}s")
+        return ticket
+
+    async def acquire_async(self, tokens, shape=None):
+        """acquire() for coroutines: waits without blocking the event loop; cancellation leaves the queue."""
+        if not self.enabled:
+            return None
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        ticket = self._enqueue(tokens, shape, lambda: loop.call_soon_threadsafe(_resolve, granted))
+        try:
+            await asyncio.wait_for(granted, self.timeout_s)
+        except asyncio.TimeoutError:
+            if not self._withdraw(ticket):
+                self._count_timeout()
+                raise TimeoutError(f"No LLM capacity within {self.timeout_s:g}s") from None
+        except asyncio.CancelledError:
+            if self._withdraw(ticket):
+                self.release(ticket)
+            raise
+        return ticket
+
+    def _count_timeout(self):
+        with self._lock:
+            self._counts["timed_out"] += 1
+        telemetry.count("llm_admission_total", outcome="timed_out")
+
+    def release(self, ticket, latency_s=None, throttled=False, tokens_used=None):
+        """
+        Free the ticket's slot. `throttled` for a 429, `latency_s` for a completed call;
+        `tokens_used` settles the token budget (0 for a request that failed).
+        """
+        if ticket is None:
+            return
+        with self._lock:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if tokens_used is not None:
+                self._tokens.take(tokens_used - ticket.tokens, now)
+            if throttled:
+                self._counts["throttled"] += 1
+                self._decrease(0.5, now)
+            elif latency_s is not None:
+                self._observe_latency(latency_s, now, ticket.shape)
+            limit = int(self._limit)
+            self._lock.notify_all()
+        if throttled:
+            telemetry.count("llm_admission_total", outcome="throttled")
+        telemetry.gauge("llm_concurrency_limit", limit)
+
+    ###### Adaptive concurrency ######
+    def _decrease(self, factor, now):
+        if now - self._last_decrease >= DECREASE_COOLDOWN_S:
+            self._limit = max(float(self.min_concurrency), self._limit * factor)
+            self._last_decrease = now
+
+    def _observe_latency(self, latency_s, now, shape=None):
+        latency = self._latency.setdefault(shape, [latency_s, latency_s])
+        latency[0] += LATENCY_EWMA_WEIGHT * (latency_s - latency[0])
+        latency[1] = min(latency[1] * (1 + LATENCY_FLOOR_DRIFT), latency[0])
+        if latency[0] > LLM_LATENCY_TOLERANCE * latency[1]:
+            self._decrease(0.9, now)
+        else:
+            self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+
+    ###### Reporting ######
+    def stats(self):
+        """Queue depth by priority, in-flight requests, the current limit, queue waits and counts."""
+        now = time.monotonic()
+        with self._lock:
+            tickets = [ticket for clients in self._queues.values() for queue in clients.values() for ticket in queue]
+            waits = sorted(self._waits)
+            stats = dict(self._counts, in_flight=self._in_flight, concurrency_limit=int(self._limit))
+        stats["queued"] = len(tickets)
+        stats["queued_interactive"] = sum(ticket.priority == PRIORITY_INTERACTIVE for ticket in tickets)
+        stats["current_wait_s"] = max((now - ticket.enqueued_at for ticket in tickets), default=0.0)
+        stats["wait_p50_s"] = waits[len(waits) // 2] if waits else 0.0
+        stats["wait_p95_s"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+        return stats
+
+    def reset_stats(self):
+        """Clear the wait samples and counts, e.g. between load-test levels."""
+        with self._lock:
+            self._waits.clear()
+            self._counts = dict.fromkeys(self._counts, 0)
+
+
+admission_controller = AdmissionController()
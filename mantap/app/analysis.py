@@ -0,0 +1,636 @@
+###### Resume analysis stages ######
+# Prompt construction and response handling for every LLM stage, in blocking
+# and async flavours that share the same prompt/post-processing code, plus the
+# dependency graph the async pipeline runs for one resume.
+import asyncio
+import os
+
+import telemetry
+from classifier import classify_job_category, is_confident
+from compaction import compact_resume_text
+from job_index import get_job_index, match_jobs
+from json_stream import IncrementalJSONParser
+from llm import (call_alibaba_llm, call_alibaba_llm_async, model_tiers, record_escalation, structured_response,
+                 structured_response_async)
+from llm_json import parse_structured
+from memo import canonical_inputs
+from pipeline import Stage
+from skills import extract_skills, skills_for_prefill
+
+# "fused" sends the resume once and gets extraction, analysis and summary back in a single
+# schema-validated JSON response; "multi" is the original one-prompt-per-stage path.
+FUSED_MODE = "fused"
+MULTI_MODE = "multi"
+ANALYSIS_MODES = [FUSED_MODE, MULTI_MODE]
+DEFAULT_ANALYSIS_MODE = os.getenv('ANALYSIS_MODE', FUSED_MODE)
+# LLM stages each mode runs for one resume, used for the per-mode cost report
+MODE_STAGES = {
+    FUSED_MODE: ["fused", "career_paths"],
+    MULTI_MODE: ["extraction", "analysis", "summary", "career_paths"],
+}
+# Job postings listed per resume when a job index has been built (see job_index.py)
+JOB_MATCHES = int(os.getenv('JOB_MATCHES', 5))
+
+# Stream responses in the async pipeline so the summary renders token by token and
+# JSON fields show up as soon as they are complete
+STREAMING_ENABLED = os.getenv('LLM_STREAMING', '1') != '0'
+
+# Per-stage timeouts (seconds) for the async pipeline; a timed-out stage is cancelled
+# and its fallback result is rendered instead.
+STAGE_TIMEOUTS = {
+    "fused": float(os.getenv('FUSED_STAGE_TIMEOUT', 120)),
+    "extraction": float(os.getenv('EXTRACTION_STAGE_TIMEOUT', 90)),
+    "analysis": float(os.getenv('ANALYSIS_STAGE_TIMEOUT', 90)),
+    "summary": float(os.getenv('SUMMARY_STAGE_TIMEOUT', 60)),
+    "career_paths": float(os.getenv('CAREER_PATHS_STAGE_TIMEOUT', 90)),
+}
+
+JOB_CATEGORIES = [
+    "Project Manager",
+    "Product Manager",
+    "Machine Learning Engineer",
+    "Fullstack Engineer",
+    "Software Engineer",
+    "Data Engineer",
+    "Data Analyst",
+    "Data Science",
+    "FrontEnd Development",
+    "Backend Development",
+    "Android Development",
+    "IOS Development",
+    "UI-UX Development",
+    "Other (Specify if none of the above fit well)",
+]
+JOB_CATEGORIES_PROMPT_LIST = "\n    ".join(f"- {category}" for category in JOB_CATEGORIES)
+_LISTED_CATEGORIES = {category.lower() for category in JOB_CATEGORIES}
+
+# Confidence checks a cheap model's answer must pass before it is used (see _cascade)
+SUMMARY_MIN_WORDS = int(os.getenv('SUMMARY_MIN_WORDS', 20))
+CAREER_PATHS_MIN = int(os.getenv('CAREER_PATHS_MIN', 3))
+
+EXTRACTION_FIELDS = ['name', 'email', 'mobile_number', 'skills', 'education', 'experience', 'degree']
+ANALYSIS_FIELDS = ['job_category', 'experience_level', 'resume_score', 'improvement_reasons', 'match_explanation']
+
+# JSON schemas of the stage responses. Responses are coerced to them (see llm_json.py):
+# a default fills a missing field, anything else missing or unusable triggers one
+# repair request before the stage falls back.
+EXTRACTION_PROPERTIES = {
+    "name": {"type": "string", "default": "Not found"},
+    "email": {"type": "string", "default": "Not found"},
+    "mobile_number": {"type": "string", "default": "Not found"},
+    "skills": {"type": "array", "items": {"type": "string"}, "default": []},
+    "education": {"type": "string", "default": "Not found"},
+    "experience": {"type": "string", "default": "Not found"},
+    "degree": {"type": "string", "default": "Not found"},
+}
+ANALYSIS_PROPERTIES = {
+    "job_category": {"type": "string"},
+    "experience_level": {"type": "string"},
+    "resume_score": {"type": "number", "minimum": 0, "maximum": 100},
+    "improvement_reasons": {"type": "array", "items": {"type": "string"}},
+    "match_explanation": {"type": "string", "default": ""},
+}
+EXTRACTION_SCHEMA = {"type": "object", "required": EXTRACTION_FIELDS, "properties": EXTRACTION_PROPERTIES}
+ANALYSIS_SCHEMA = {"type": "object", "required": ANALYSIS_FIELDS, "properties": ANALYSIS_PROPERTIES}
+CAREER_PATHS_SCHEMA = {
+    "type": "object",
+    "required": ["career_paths"],
+    "properties": {
+        "career_paths": {"type": "array", "minItems": 1, "items": {
+            "type": "object",
+            "required": ["path_title", "focus_areas"],
+            "properties": {"path_title": {"type": "string"},
+                           "focus_areas": {"type": "array", "items": {"type": "string"}, "default": []}},
+        }},
+    },
+}
+
+SUMMARY_FAILED_MESSAGE = "Summary generation failed or returned empty."
+CAREER_PATHS_FAILED_TITLE = "Career path suggestion generation failed."
+
+# Default fallback response if the analysis LLM call or parsing fails
+ANALYSIS_FALLBACK = {
+    "job_category": "NA",
+    "experience_level": "Fresher",
+    "resume_score": 50,
+    "improvement_reasons": [
+        "Could not properly analyze the resume due to an error.",
+        "Please check the resume format and content.",
+        "Ensure the resume contains clear information about skills and experience."
+    ],
+    "match_explanation": "Analysis could not be completed."
+}
+CAREER_PATHS_FALLBACK = {"career_paths": [{"path_title": CAREER_PATHS_FAILED_TITLE, "focus_areas": []}]}
+
+async def _call_llm_async(prompt, stage, max_tokens=2048, on_delta=None, on_field=None, memo_key=None, json_mode=False, model=None):
+    """
+    Async LLM call that streams when a caller wants partial results: `on_delta(text so far)`
+    for free text, `on_field(key, value)` for each completed top-level JSON member.
+    Returns the full response text (or None), like call_alibaba_llm_async; a stream that
+    breaks off after its first delta raises, so the stage falls back and nothing is cached.
+    """
+    if not STREAMING_ENABLED or not (on_delta or on_field):
+        return await call_alibaba_llm_async(prompt, max_tokens=max_tokens, stage=stage, memo_key=memo_key, json_mode=json_mode,
+                                            model=model)
+    json_parser = IncrementalJSONParser() if on_field else None
+    text = ""
+    async for delta in await call_alibaba_llm_async(prompt, max_tokens=max_tokens, stage=stage, stream=True, memo_key=memo_key,
+                                                    json_mode=json_mode, model=model):
+        text += delta
+        if on_delta:
+            on_delta(text)
+        if json_parser:
+            for key, value in json_parser.feed(delta):
+                on_field(key, value)
+    return text or None
+
+###### Model cascade ######
+
+def _passes(stage, model, result, accept):
+    if result is None:
+        record_escalation(stage, model, "invalid")
+        return False
+    if accept is not None and not accept(result):
+        record_escalation(stage, model, "low_confidence")
+        return False
+    return True
+
+def _cascade(stage, attempt, accept=None):
+    """
+    Run `attempt(model, last)` on the stage's model tiers (llm.model_tiers), cheapest first,
+    until a result is not None and passes `accept`. The last tier's result is returned as is.
+    """
+    tiers = model_tiers(stage)
+    for tier, model in enumerate(tiers):
+        last = tier == len(tiers) - 1
+        result = attempt(model, last)
+        if last or _passes(stage, model, result, accept):
+            return result
+
+async def _cascade_async(stage, attempt, accept=None):
+    tiers = model_tiers(stage)
+    for tier, model in enumerate(tiers):
+        last = tier == len(tiers) - 1
+        result = await attempt(model, last)
+        if last or _passes(stage, model, result, accept):
+            return result
+
+def _structured_call(prompt, stage, schema, accept=None, memo_key=None):
+    """
+    Schema-checked response of a JSON stage, through the cascade. Only the last tier gets
+    a repair request; a cheap tier's unusable answer escalates instead.
+    """
+    def attempt(model, last):
+        response_text = call_alibaba_llm(prompt, stage=stage, memo_key=memo_key, json_mode=True, model=model)
+        return structured_response(response_text, schema, stage, repair=last, prompt=prompt)
+    return _cascade(stage, attempt, accept)
+
+async def _structured_call_async(prompt, stage, schema, accept=None, memo_key=None, on_field=None):
+    async def attempt(model, last):
+        response_text = await _call_llm_async(prompt, stage, on_field=on_field, memo_key=memo_key, json_mode=True, model=model)
+        return await structured_response_async(response_text, schema, stage, repair=last, prompt=prompt)
+    return await _cascade_async(stage, attempt, accept)
+
+def _listed_category(data):
+    """Confidence check: the job category is one of JOB_CATEGORIES (any "Other ..." counts)."""
+    category = str(data.get("job_category", "")).strip().lower()
+    return category in _LISTED_CATEGORIES or category.startswith("other")
+
+###### Structured extraction ######
+
+# Prompt line for skills already found by the local matcher, so the LLM does not extract them again
+PREFILLED_SKILLS_INSTRUCTION = "Already extracted separately, return an empty JSON array []"
+
+def _extraction_prompt(resume_text, known_skills=None):
+    skills_instruction = PREFILLED_SKILLS_INSTRUCTION if known_skills else "List of technical and soft skills (as a JSON array of strings)"
+    return f"""
+        Extract the following information from this resume. For each field, provide only the extracted information.
+        If a field is not found, return "Not found" or an empty list for skills.
+        Ensure your entire response is ONLY a valid JSON object.
+
+        Resume text:
+        ---
+        {resume_text}
+        ---
+
+        Please extract and return the following in JSON format:
+        1. name: Full name of the person
+        2. email: Email address
+        3. mobile_number: Phone number
+        4. skills: {skills_instruction}
+        5. education: Summary of educational background (string)
+        6. experience: Summary of work experience (string)
+        7. degree: Highest degree obtained (string)
+        """
+
+def _finish_extraction(data, page_count, known_skills=None):
+    """`data` is the schema-checked response (EXTRACTION_SCHEMA) or None."""
+    if not data:
+        return None
+    if known_skills:
+        data['skills'] = list(known_skills)
+
+    # `no_of_pages` comes from the text extractor, not the LLM
+    data['no_of_pages'] = page_count if page_count > 0 else 1
+    return data
+
+def extract_resume_data(resume_text, page_count, known_skills=None):
+    """
+    Extract structured data from resume text using Alibaba Cloud LLM.
+    With `known_skills` (from the local skill matcher) the LLM skips skill extraction.
+    """
+    if not resume_text:
+        return None
+    data = _structured_call(_extraction_prompt(resume_text, known_skills), "extraction", EXTRACTION_SCHEMA)
+    return _finish_extraction(data, page_count, known_skills)
+
+async def extract_resume_data_async(resume_text, page_count, on_field=None, known_skills=None):
+    if not resume_text:
+        return None
+    data = await _structured_call_async(_extraction_prompt(resume_text, known_skills), "extraction", EXTRACTION_SCHEMA,
+                                        on_field=on_field)
+    return _finish_extraction(data, page_count, known_skills)
+
+###### Job matching & feedback ######
+
+def _category_instruction(job_category):
+    if job_category:
+        return f'The job category has already been determined: "{job_category}". Use exactly this value for "job_category".'
+    return f"Determine which ONE of these job categories is the best match:\n    {JOB_CATEGORIES_PROMPT_LIST}"
+
+def _analysis_prompt(resume_text, skills, job_category=None):
+    return f"""
+    Analyze this resume text and skills to determine the most suitable job category, experience level,
+    resume quality score, specific improvement reasons, and an explanation for the job category match.
+    Ensure your entire response is ONLY a valid JSON object.
+
+    Resume text:
+    ---
+    {resume_text}
+    ---
+
+    Skills:
+    {', '.join(skills)}
+
+    {_category_instruction(job_category)}
+
+    Provide the following in a JSON object:
+    1. "job_category": The best matching job category from the list above.
+    2. "experience_level": The candidate's experience level (e.g., Fresher, Intern, Junior, Intermediate, Experienced, Senior).
+    3. "resume_score": A score from 0-100 based on overall resume quality, ATS friendliness, and clarity.
+    4. "improvement_reasons": An array of 3-5 specific, actionable reasons why the resume needs improvement or how it can be made better.
+    5. "match_explanation": A brief (2-3 sentences) explanation of why this job category is a good match based on the resume and skills.
+
+    Example JSON structure:
+    {{
+      "job_category": "Web Development",
+      "experience_level": "Intermediate",
+      "resume_score": 75,
+      "improvement_reasons": [
+        "Quantify achievements in past roles with numbers.",
+        "Tailor the resume summary to highlight web development projects.",
+        "Add a portfolio link if available."
+      ],
+      "match_explanation": "The candidate's experience with React and Node.js, coupled with several web-based projects, strongly aligns with Web Development roles."
+    }}
+    """
+
+def _with_category_default(schema, job_category):
+    """A category decided before the call overrides the response's, so the response may leave it out."""
+    if not job_category:
+        return schema
+    properties = dict(schema["properties"], job_category={"type": "string", "default": job_category})
+    return dict(schema, properties=properties)
+
+def _analysis_schema(job_category):
+    return _with_category_default(ANALYSIS_SCHEMA, job_category)
+
+def _finish_analysis(analysis_data, job_category=None):
+    if not analysis_data:
+        return dict(ANALYSIS_FALLBACK)
+    if job_category:
+        analysis_data["job_category"] = job_category
+    return analysis_data
+
+def analyze_resume_for_jobs_and_get_feedback(resume_text, skills, job_category=None):
+    """
+    Use Alibaba Cloud LLM to analyze resume, match with job categories, and provide feedback.
+    A `job_category` from the local classifier is kept and the LLM only does the rest.
+    """
+    data = _structured_call(_analysis_prompt(resume_text, skills, job_category), "analysis", _analysis_schema(job_category),
+                            accept=None if job_category else _listed_category)
+    return _finish_analysis(data, job_category)
+
+async def analyze_resume_for_jobs_and_get_feedback_async(resume_text, skills, on_field=None, job_category=None):
+    data = await _structured_call_async(_analysis_prompt(resume_text, skills, job_category), "analysis",
+                                        _analysis_schema(job_category), accept=None if job_category else _listed_category,
+                                        on_field=on_field)
+    return _finish_analysis(data, job_category)
+
+###### Summary ######
+
+def _summary_prompt(resume_text):
+    return f"""
+    Provide a concise summary (3-4 sentences) of the following resume.
+    Highlight key experiences, skills, and the overall professional profile.
+    Ensure your entire response is ONLY the summary text, no extra phrases.
+
+    Resume text:
+    ---
+    {resume_text}
+    ---
+    Summary:
+    """
+
+def _full_summary(summary):
+    """Confidence check: a summary of at least SUMMARY_MIN_WORDS words."""
+    return len(summary.split()) >= SUMMARY_MIN_WORDS
+
+def summarize_resume_llm(resume_text):
+    """Generates a concise summary of the resume using LLM."""
+    if not resume_text: return "Could not generate summary: No resume text provided."
+    prompt = _summary_prompt(resume_text)
+    summary = _cascade("summary", lambda model, last: call_alibaba_llm(prompt, max_tokens=350, stage="summary", model=model),
+                       _full_summary)
+    return summary if summary else SUMMARY_FAILED_MESSAGE
+
+async def summarize_resume_llm_async(resume_text, on_delta=None):
+    if not resume_text: return "Could not generate summary: No resume text provided."
+    prompt = _summary_prompt(resume_text)
+
+    async def attempt(model, last):
+        return await _call_llm_async(prompt, "summary", max_tokens=350, on_delta=on_delta, model=model)
+    summary = await _cascade_async("summary", attempt, _full_summary)
+    return summary if summary else SUMMARY_FAILED_MESSAGE
+
+###### Career paths ######
+
+def _no_career_path(job_category):
+    if not job_category or job_category == "NA":
+        return {"career_paths": [{"path_title": "No specific path suggested due to insufficient initial analysis.", "focus_areas": []}]}
+    return None
+
+def _career_paths_prompt(job_category, experience_level, skills_list):
+    return f"""
+    A candidate is currently identified as '{experience_level}' in '{job_category}' with skills: {', '.join(skills_list)}.
+    Suggest 5-6 potential career path advancements or related technical roles they could aim for.
+    For each suggestion, list 1-2 key areas or skills to focus on for that path.
+    Return this as a JSON object with a list of suggestions.
+    Ensure your entire response is ONLY a valid JSON object.
+
+    Example JSON:
+    {{
+      "career_paths": [
+        {{ "path_title": "Senior {job_category} Developer", "focus_areas": ["Project leadership", "Advanced {job_category.split()[0] if job_category else ''} frameworks"] }},
+        {{ "path_title": "Cross-functional Role (e.g., DevOps for {job_category.split()[0] if job_category else ''})", "focus_areas": ["CI/CD pipelines", "Cloud infrastructure"] }}
+      ]
+    }}
+    """
+
+def _career_paths_request(job_category, experience_level, skills_list):
+    """
+    Prompt and memo key. The suggestions depend on nothing resume-specific beyond these
+    inputs, so the response is shared by every resume with equivalent inputs (see memo.py);
+    the prompt is built from the canonical inputs so that equal keys mean equal prompts.
+    """
+    inputs = canonical_inputs({"job_category": job_category, "experience_level": experience_level, "skills": skills_list})
+    prompt = _career_paths_prompt(inputs["job_category"], inputs["experience_level"], inputs["skills"])
+    return prompt, ("career_paths.v1", inputs, _is_career_paths_response)
+
+def _is_career_paths_response(response_text):
+    return parse_structured(response_text, CAREER_PATHS_SCHEMA)[0] is not None
+
+def _enough_career_paths(suggestions):
+    """Confidence check: at least CAREER_PATHS_MIN suggestions."""
+    return len(suggestions["career_paths"]) >= CAREER_PATHS_MIN
+
+def _finish_career_paths(suggestions):
+    return suggestions if suggestions else {"career_paths": [{"path_title": CAREER_PATHS_FAILED_TITLE, "focus_areas": []}]}
+
+def get_career_path_suggestions_llm(job_category, experience_level, skills_list):
+    """Suggests career paths using LLM."""
+    no_path = _no_career_path(job_category)
+    if no_path: return no_path
+    prompt, memo_key = _career_paths_request(job_category, experience_level, skills_list)
+    return _finish_career_paths(_structured_call(prompt, "career_paths", CAREER_PATHS_SCHEMA, accept=_enough_career_paths,
+                                                 memo_key=memo_key))
+
+async def get_career_path_suggestions_llm_async(job_category, experience_level, skills_list, on_field=None):
+    no_path = _no_career_path(job_category)
+    if no_path: return no_path
+    prompt, memo_key = _career_paths_request(job_category, experience_level, skills_list)
+    return _finish_career_paths(await _structured_call_async(prompt, "career_paths", CAREER_PATHS_SCHEMA,
+                                                             accept=_enough_career_paths, memo_key=memo_key, on_field=on_field))
+
+###### Fused single-call analysis ######
+
+FUSED_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "required": EXTRACTION_FIELDS + ANALYSIS_FIELDS + ["summary"],
+    "properties": dict(EXTRACTION_PROPERTIES, **ANALYSIS_PROPERTIES, summary={"type": "string"}),
+}
+
+def _fused_prompt(resume_text, known_skills=None, job_category=None):
+    skills_instruction = PREFILLED_SKILLS_INSTRUCTION if known_skills else "JSON array of technical and soft skills"
+    if job_category:
+        category_instruction = f'Already determined, return exactly "{job_category}"'
+    else:
+        category_instruction = f"The ONE best matching job category from this list:\n    {JOB_CATEGORIES_PROMPT_LIST}"
+    return f"""
+    Analyze the following resume and return ONE valid JSON object with all of the fields below.
+    Ensure your entire response is ONLY a valid JSON object.
+
+    Resume text:
+    ---
+    {resume_text}
+    ---
+
+    Extraction fields (use "Not found" for missing strings and [] for missing skills):
+    - "name": Full name of the person
+    - "email": Email address
+    - "mobile_number": Phone number (string)
+    - "skills": {skills_instruction}
+    - "education": Summary of educational background (string)
+    - "experience": Summary of work experience (string)
+    - "degree": Highest degree obtained (string)
+
+    Analysis fields:
+    - "job_category": {category_instruction}
+    - "experience_level": One of Fresher, Intern, Junior, Intermediate, Experienced, Senior
+    - "resume_score": A number from 0-100 based on overall resume quality, ATS friendliness, and clarity
+    - "improvement_reasons": JSON array of 3-5 specific, actionable reasons the resume could be improved
+    - "match_explanation": A brief (2-3 sentences) explanation of why the job category fits
+    - "summary": A concise (3-4 sentences) summary highlighting key experiences, skills, and the overall professional profile
+    """
+
+def _finish_fused(data, page_count, known_skills=None, job_category=None):
+    """`data` is the schema-checked response (FUSED_ANALYSIS_SCHEMA) or None."""
+    if not data:
+        return None
+    if known_skills:
+        data["skills"] = list(known_skills)
+    if job_category:
+        data["job_category"] = job_category
+
+    resume_data = {field: data[field] for field in EXTRACTION_FIELDS}
+    resume_data['no_of_pages'] = page_count if page_count > 0 else 1
+    analysis = {field: data[field] for field in ANALYSIS_FIELDS}
+    return {"resume_data": resume_data, "analysis": analysis, "summary": data["summary"]}
+
+def analyze_resume_fused(resume_text, page_count, known_skills=None, job_category=None):
+    """
+    Extraction, job matching, feedback and summary in a single LLM call.
+    Returns a dict with "resume_data", "analysis" and "summary" shaped like the multi-call
+    path's results, or None if the response is missing or fails schema validation even
+    after a repair request.
+    """
+    if not resume_text:
+        return None
+    data = _structured_call(_fused_prompt(resume_text, known_skills, job_category), "fused",
+                            _with_category_default(FUSED_ANALYSIS_SCHEMA, job_category),
+                            accept=None if job_category else _listed_category)
+    return _finish_fused(data, page_count, known_skills, job_category)
+
+async def analyze_resume_fused_async(resume_text, page_count, on_field=None, known_skills=None, job_category=None):
+    if not resume_text:
+        return None
+    data = await _structured_call_async(_fused_prompt(resume_text, known_skills, job_category), "fused",
+                                        _with_category_default(FUSED_ANALYSIS_SCHEMA, job_category),
+                                        accept=None if job_category else _listed_category, on_field=on_field)
+    return _finish_fused(data, page_count, known_skills, job_category)
+
+###### Stage graph ######
+
+def is_cacheable(stage, value):
+    """Fallback results are never cached so the next rerun retries the LLM."""
+    if value is None:
+        return False
+    if stage == "analysis":
+        return value.get("job_category") != "NA"
+    if stage == "summary":
+        return value != SUMMARY_FAILED_MESSAGE
+    if stage == "career_paths":
+        return all(path.get("path_title") != CAREER_PATHS_FAILED_TITLE for path in value.get("career_paths", []))
+    return True
+
+def build_analysis_stages(resume_text, page_count, mode=FUSED_MODE, cache=None, resume_hash=None, token_budget=None):
+    """
+    Build the pipeline stages for one resume.
+
+    Every mode starts with compaction, which normalizes the extracted text and fits it
+    into `token_budget` (default RESUME_TOKEN_BUDGET); prompts only see the compacted text.
+    The skills stage then matches known skills locally; when it finds enough of them the
+    extraction prompts skip skill extraction and use the matched skills. The category stage
+    classifies the resume locally; only when it is not confident does the LLM pick the category.
+    With a job index, the job_matches stage lists the closest postings, also without the LLM.
+    multi:  extraction -> analysis -> career_paths, with summary running alongside.
+    fused:  fused -> career_paths. The extraction/analysis/summary stages still exist
+            but just unpack the fused result; they only call the LLM themselves when the
+            fused response failed, which makes the multi-call path the fallback.
+
+    With a cache, each stage is looked up by (resume_hash, stage) before calling the LLM.
+    Stages that call the LLM report progress payloads while streaming:
+    {"text": summary so far} for the summary and {"field": key, "value": value} for
+    each completed JSON field of the other stages.
+    """
+    def field_reporter(progress):
+        return (lambda key, value: progress({"field": key, "value": value})) if progress else None
+
+    async def cached(stage, compute):
+        if cache is not None:
+            value = cache.get(resume_hash, stage)
+            if value is not None:
+                return value
+        value = await compute()
+        if cache is not None and is_cacheable(stage, value):
+            cache.put(resume_hash, stage, value)
+        return value
+
+    async def run_compaction():
+        return compact_resume_text(resume_text, token_budget)
+
+    async def run_skills(compaction):
+        return extract_skills(compaction["text"])
+
+    async def run_category(compaction, skills):
+        result = classify_job_category(compaction["text"] + "\n" + " ".join(skills))
+        return dict(result, escalated=not is_confident(result))
+
+    async def run_job_matches(compaction, skills):
+        index = get_job_index()
+        if index is None:
+            return []
+        # A large index takes a while to scan, so keep it off the event loop
+        matches = await asyncio.get_running_loop().run_in_executor(
+            None, match_jobs, index, compaction["text"], skills, JOB_MATCHES)
+        return [dict(posting, score=score) for score, posting in matches if score > 0]
+
+    def confident_category(category):
+        return category["job_category"] if category and not category["escalated"] else None
+
+    async def run_fused(compaction, skills, category, progress=None):
+        if cache is not None:
+            cached_parts = [cache.get(resume_hash, stage) for stage in ("extraction", "analysis", "summary")]
+            if all(part is not None for part in cached_parts):
+                return {"resume_data": cached_parts[0], "analysis": cached_parts[1], "summary": cached_parts[2]}
+        fused = await analyze_resume_fused_async(compaction["text"], page_count, on_field=field_reporter(progress),
+                                                 known_skills=skills_for_prefill(skills), job_category=confident_category(category))
+        if fused is None:
+            telemetry.count("fused_fallbacks_total")  # Dependents run the multi-call path instead
+        elif cache is not None:
+            for stage, value in (("extraction", fused["resume_data"]), ("analysis", fused["analysis"]), ("summary", fused["summary"])):
+                if is_cacheable(stage, value):
+                    cache.put(resume_hash, stage, value)
+        return fused
+
+    async def run_extraction(compaction, skills, fused=None, progress=None):
+        if fused:
+            return fused["resume_data"]
+        return await cached("extraction", lambda: extract_resume_data_async(
+            compaction["text"], page_count, on_field=field_reporter(progress), known_skills=skills_for_prefill(skills)
+        ))
+
+    async def run_summary(compaction, fused=None, progress=None):
+        if fused:
+            return fused["summary"]
+        on_delta = (lambda text: progress({"text": text})) if progress else None
+        return await cached("summary", lambda: summarize_resume_llm_async(compaction["text"], on_delta=on_delta))
+
+    async def run_analysis(compaction, extraction, category, fused=None, progress=None):
+        if fused:
+            return fused["analysis"]
+        if not extraction:
+            return None
+        return await cached("analysis", lambda: analyze_resume_for_jobs_and_get_feedback_async(
+            compaction["text"], extraction.get('skills', []), on_field=field_reporter(progress),
+            job_category=confident_category(category)
+        ))
+
+    async def run_career_paths(extraction, analysis, progress=None):
+        if not extraction or not analysis:
+            return None
+        return await cached("career_paths", lambda: get_career_path_suggestions_llm_async(
+            analysis.get("job_category", "NA"),
+            analysis.get("experience_level", "Fresher"),
+            extraction.get('skills', []),
+            on_field=field_reporter(progress)
+        ))
+
+    fused_deps = ("compaction", "fused") if mode == FUSED_MODE else ("compaction",)
+    stages = [
+        # If compaction fails the prompts get the raw text, as before compaction existed
+        Stage("compaction", run_compaction, fallback={"text": resume_text, "tokens_before": None, "tokens_after": None,
+                                                      "boilerplate_lines": 0, "trimmed_sections": []}),
+        Stage("skills", run_skills, depends_on=("compaction",), fallback=[]),
+        # No fallback: a failed classification leaves the category to the LLM
+        Stage("category", run_category, depends_on=("compaction", "skills")),
+        Stage("job_matches", run_job_matches, depends_on=("compaction", "skills"), fallback=[]),
+        Stage("extraction", run_extraction, depends_on=("skills",) + fused_deps, timeout=STAGE_TIMEOUTS["extraction"], reports_progress=True),
+        Stage("summary", run_summary, depends_on=fused_deps, timeout=STAGE_TIMEOUTS["summary"], fallback=SUMMARY_FAILED_MESSAGE, reports_progress=True),
+        Stage("analysis", run_analysis, depends_on=("extraction", "category") + fused_deps, timeout=STAGE_TIMEOUTS["analysis"], fallback=ANALYSIS_FALLBACK, reports_progress=True),
+        Stage("career_paths", run_career_paths, depends_on=("extraction", "analysis"), timeout=STAGE_TIMEOUTS["career_paths"], fallback=CAREER_PATHS_FALLBACK, reports_progress=True),
+    ]
+    if mode == FUSED_MODE:
+        # A fused timeout yields None, so the dependents fall back to the multi-call path
+        stages.insert(4, Stage("fused", run_fused, depends_on=("compaction", "skills", "category"), timeout=STAGE_TIMEOUTS["fused"], reports_progress=True))
+    return stages
@@ -0,0 +1,187 @@
+###### Headless batch analyzer ######
+# Runs the same extraction + LLM pipeline as the Streamlit app over a directory
+# of resumes, without any st.* calls:
+#
+#   python batch.py ./resumes --output results.jsonl --concurrency 8 --llm-limit 16
+#
+# Results are appended to the JSONL output as each resume finishes. The output
+# doubles as the checkpoint: rerunning the same command skips every file that
+# already has an "ok" record with the same content hash, so a killed run
+# resumes where it stopped.
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from admission import PRIORITY_BATCH, request_class
+from analysis import ANALYSIS_MODES, DEFAULT_ANALYSIS_MODE, build_analysis_stages, is_cacheable
+from cache import content_hash, get_cache
+from llm import limit_async_llm_concurrency, llm_clients
+from pipeline import STATUS_OK, run_pipeline
+from resume_reader import extract_resume_text
+from store import analysis_row, get_store
+import telemetry
+from usage import usage_tracker
+
+RESUME_EXTENSIONS = ('.pdf', '.docx')
+
+
+def find_resumes(input_dir):
+    resumes = []
+    for root, directories, filenames in os.walk(input_dir):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(RESUME_EXTENSIONS):
+                resumes.append(os.path.join(root, filename))
+    return sorted(resumes)
+
+def load_checkpoint(output_path):
+    """(relative path, sha256) pairs that already have a successful record in the output."""
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A run killed mid-write can leave a truncated last line
+            if record.get("status") == "ok":
+                finished.add((record["file"], record["sha256"]))
+    return finished
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return content_hash(f.read())
+
+
+class ProgressReporter:
+    def __init__(self, total, interval_s=10.0):
+        self.total = total
+        self.interval_s = interval_s
+        self.done = 0
+        self.failed = 0
+        self.start_time = time.perf_counter()
+        self._last_report = 0.0
+
+    def update(self, ok):
+        self.done += 1
+        if not ok:
+            self.failed += 1
+        now = time.perf_counter()
+        if self.done == self.total or now - self._last_report >= self.interval_s:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        elapsed_min = max(time.perf_counter() - self.start_time, 1e-9) / 60
+        totals = usage_tracker.totals()
+        tokens = totals["prompt_tokens"] + totals["completion_tokens"]
+        print(f"[{self.done}/{self.total}] {self.failed} failed | "
+              f"{self.done / elapsed_min:.1f} resumes/min | {tokens / elapsed_min:.0f} tokens/min | "
+              f"{totals['calls']} LLM calls | ~${totals['cost_usd']:.3f}", flush=True)
+
+
+async def analyze_file(path, rel_path, digest, mode, extract_pool, cache, store=None):
+    start_time = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    if store is not None:
+        # Results stored by an earlier run or by the app skip the LLM stages
+        await loop.run_in_executor(None, store.hydrate, cache, digest, is_cacheable)
+    # pdfminer is CPU-bound, so text extraction runs in worker processes
+    resume_text, page_count, truncated = await loop.run_in_executor(extract_pool, extract_resume_text, path)
+    record = {"file": rel_path, "sha256": digest, "mode": mode, "truncated": truncated}
+    if not resume_text:
+        record.update(status="error", error="Could not extract text from the file.")
+        return record
+
+    # Extraction runs in another process, so only the pipeline's spans carry the trace id
+    # Batch priority: uploads in the app go first when both share the endpoint budget
+    with telemetry.trace(digest[:16]), request_class(PRIORITY_BATCH, digest[:16]):
+        results = await run_pipeline(build_analysis_stages(resume_text, page_count, mode=mode, cache=cache, resume_hash=digest))
+    resume_data = results["extraction"].value
+    record.update(
+        status="ok" if resume_data else "error",
+        resume_data=resume_data,
+        analysis=results["analysis"].value,
+        summary=results["summary"].value,
+        career_paths=results["career_paths"].value,
+        compaction={key: value for key, value in results["compaction"].value.items() if key != "text"},
+        category=results["category"].value,
+        job_matches=results["job_matches"].value,
+        stage_status={name: result.status for name, result in results.items()},
+        elapsed_s=round(time.perf_counter() - start_time, 3),
+    )
+    if not resume_data:
+        record["error"] = "Failed to get structured data from LLM."
+    elif any(result.status != STATUS_OK for result in results.values()):
+        record["status"] = "partial"
+    if store is not None:
+        store.record(analysis_row(digest, mode, results, file_name=rel_path, source="batch", elapsed_s=record["elapsed_s"]))
+    return record
+
+async def run_batch(input_dir, output_path, concurrency, llm_limit, mode, extract_workers):
+    limit_async_llm_concurrency(llm_limit)
+    finished = load_checkpoint(output_path)
+    pending = []
+    for path in find_resumes(input_dir):
+        rel_path = os.path.relpath(path, input_dir)
+        digest = file_sha256(path)
+        if (rel_path, digest) not in finished:
+            pending.append((path, rel_path, digest))
+    print(f"{len(pending)} resumes to analyze ({len(finished)} already done in {output_path})", flush=True)
+    if not pending:
+        return
+
+    progress = ProgressReporter(len(pending))
+    queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    cache = get_cache()
+    store = get_store()
+
+    # Spawned: the analysis store's writer thread is already running, and forking a threaded process can deadlock the child
+    with ProcessPoolExecutor(max_workers=extract_workers, mp_context=multiprocessing.get_context("spawn")) as extract_pool, \
+            open(output_path, "a", encoding="utf-8") as output:
+
+        async def worker():
+            while True:
+                try:
+                    path, rel_path, digest = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    record = await analyze_file(path, rel_path, digest, mode, extract_pool, cache, store)
+                except Exception as e:
+                    record = {"file": rel_path, "sha256": digest, "mode": mode, "status": "error", "error": str(e)}
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                os.fsync(output.fileno())  # Checkpoint: a finished resume survives a kill
+                progress.update(record["status"] != "error")
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+    # This loop ends with the batch, so close its connection pool rather than leave it to GC
+    await llm_clients.aclose_async_client()
+    if store is not None and not store.flush(timeout=60):
+        print(f"Analysis store: {store.stats()['pending']} rows still unwritten at exit", flush=True)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Analyze a directory of resumes with the LLM pipeline and write JSONL results.")
+    arg_parser.add_argument("input_dir", help="Directory searched recursively for .pdf and .docx resumes")
+    arg_parser.add_argument("--output", default="results.jsonl", help="JSONL output, also used as the resume checkpoint")
+    arg_parser.add_argument("--concurrency", type=int, default=8, help="Resumes analyzed at the same time")
+    arg_parser.add_argument("--llm-limit", type=int, default=16, help="Maximum in-flight LLM requests")
+    arg_parser.add_argument("--mode", choices=ANALYSIS_MODES, default=DEFAULT_ANALYSIS_MODE)
+    arg_parser.add_argument("--extract-workers", type=int, default=os.cpu_count(), help="Processes used for PDF/DOCX text extraction")
+    args = arg_parser.parse_args(argv)
+    if not os.path.isdir(args.input_dir):
+        arg_parser.error(f"{args.input_dir} is not a directory")
+    asyncio.run(run_batch(args.input_dir, args.output, args.concurrency, args.llm_limit, args.mode, args.extract_workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# Benchmarks for the resume pipeline. Run from mantap/app, e.g.:
+#   python -m benchmarks.pdf_extraction ./resumes
@@ -0,0 +1,194 @@
+###### Extraction and parsing benchmark suite ######
+# Runs every text extraction and parsing path over a synthetic corpus and
+# compares the results with a stored baseline:
+#
+#   python -m benchmarks.extraction                        # generate a corpus, compare with the baseline
+#   python -m benchmarks.extraction ./synthetic_resumes    # corpus from benchmarks.resume_corpus
+#   python -m benchmarks.extraction --save-baseline        # record this machine's numbers
+#
+# Paths: pdf.<backend> (extract_pdf, one process, no caps), docx (the DOCX branch
+# of ResumeParser.extract_text_and_pages), pyresparser (its ResumeParser on the
+# PDFs; skipped without the package or its spaCy models) and json_parse
+# (parse_llm_json_response on plain, fenced and prose-wrapped responses).
+#
+# Each path runs in a fresh process, so its peak RSS is its own. Reported per path:
+# documents and pages per second, per-page latency (document time / pages),
+# peak RSS and its increase over the imports alone, and the share of the words
+# written to the corpus that came back. Everything runs offline. Exits with 1 when
+# a metric regresses beyond --tolerance against the baseline.
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.resume_corpus import generate_corpus, load_manifest, synthetic_llm_responses
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "extraction.json")
+JSON_RESPONSES = 300
+# (metric, direction): +1 if higher is better
+COMPARED_METRICS = (("pages_per_s", 1), ("docs_per_s", 1), ("p95_page_ms", -1), ("peak_rss_mb", -1), ("recovered", 1))
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+def _path_reader(path_name):
+    """(read(file) -> text, file format) for one path; raises ImportError/OSError when it cannot run here."""
+    if path_name.startswith("pdf."):
+        from resume_reader import extract_pdf
+        backend = path_name[4:]
+        return (lambda file: extract_pdf(file, backend, max_pages=0, max_bytes=0, workers=1)["text"]), "pdf"
+    if path_name == "docx":
+        from resume_reader import ResumeParser
+        return (lambda file: ResumeParser(file).resume_text), "docx"
+    if path_name == "pyresparser":
+        from pyresparser import ResumeParser as PyresparserParser
+        from pyresparser import models
+        models.preload()  # The model load is a one-off per process, not per resume
+        return (lambda file: ' '.join(str(value) for value in PyresparserParser(file).get_extracted_data().values())), "pdf"
+    raise ValueError(f"Unknown path {path_name}")
+
+def run_path(path_name, corpus_dir, runs):
+    """Benchmark one path in the current process; meant to be called in a fresh one."""
+    try:
+        if path_name == "json_parse":
+            from llm import parse_llm_json_response
+            read, entries = parse_llm_json_response, [{"file": text, "pages": 1, "words": None}
+                                                      for text in synthetic_llm_responses(JSON_RESPONSES)]
+        else:
+            read, file_format = _path_reader(path_name)
+            entries = [dict(entry, file=os.path.join(corpus_dir, entry["file"]))
+                       for entry in load_manifest(corpus_dir)["files"] if entry["format"] == file_format]
+    except (ImportError, OSError) as e:
+        return {"path": path_name, "skipped": f"{e.__class__.__name__}: {e}"}
+    rss_before_mb = _peak_rss_mb()
+    read(entries[0]["file"])  # Warm-up: lazy imports, font and model caches
+
+    best = [None] * len(entries)
+    words_out = 0
+    for _ in range(runs):
+        words_out = 0
+        for i, entry in enumerate(entries):
+            start_time = time.perf_counter()
+            result = read(entry["file"])
+            elapsed = time.perf_counter() - start_time
+            best[i] = elapsed if best[i] is None else min(best[i], elapsed)
+            if entry["words"] is not None:
+                words_out += len(result.split()) if result else 0
+    seconds, pages = sum(best), sum(entry["pages"] for entry in entries)
+    page_ms = [elapsed / entry["pages"] * 1000 for elapsed, entry in zip(best, entries)]
+    words_in = sum(entry["words"] or 0 for entry in entries)
+    peak_rss_mb = _peak_rss_mb()
+    return {
+        "path": path_name, "docs": len(entries), "pages": pages, "seconds": round(seconds, 4),
+        "docs_per_s": round(len(entries) / seconds, 2), "pages_per_s": round(pages / seconds, 2),
+        "p50_page_ms": round(_percentile(page_ms, 50), 3), "p95_page_ms": round(_percentile(page_ms, 95), 3),
+        "peak_rss_mb": round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+        "rss_growth_mb": round(peak_rss_mb - rss_before_mb, 1) if peak_rss_mb is not None else None,
+        # Only meaningful for the text extractors; pyresparser returns fields, not the text
+        "recovered": round(min(words_out / words_in, 1.0), 4) if words_in and path_name != "pyresparser" else None,
+    }
+
+def run_isolated(path_name, corpus_dir, runs):
+    # spawn rather than fork: a forked child would inherit the parent's RSS peak
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_path, path_name, corpus_dir, runs).result()
+
+def default_paths():
+    from resume_reader import PDF_BACKENDS
+    return [f"pdf.{backend}" for backend in PDF_BACKENDS] + ["docx", "pyresparser", "json_parse"]
+
+def compare(results, baseline, tolerance):
+    """[(path, metric, baseline value, value, change)] for metrics worse than the baseline by more than tolerance."""
+    regressions = []
+    for result in results:
+        previous = baseline.get("results", {}).get(result["path"])
+        if not previous or "skipped" in result or "skipped" in previous:
+            continue
+        for metric, direction in COMPARED_METRICS:
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            # Text recovery is deterministic; any loss is a regression
+            allowed = 0.005 if metric == "recovered" else tolerance
+            if change * direction < -allowed:
+                regressions.append((result["path"], metric, before, after, change))
+    return regressions
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the resume text extraction and parsing paths.")
+    arg_parser.add_argument("corpus_dir", nargs="?", help="Corpus from benchmarks.resume_corpus; generated in a temporary directory if omitted")
+    arg_parser.add_argument("--resumes", type=int, default=30, help="Resumes per format when generating the corpus")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--paths", nargs="+", help="Paths to run (default: all)")
+    arg_parser.add_argument("--runs", type=int, default=3, help="Repetitions per document; the best time is kept")
+    arg_parser.add_argument("--baseline", default=BASELINE_PATH)
+    arg_parser.add_argument("--save-baseline", action="store_true", help="Write the results to --baseline instead of comparing")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown / RSS growth")
+    args = arg_parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus_dir
+        if corpus_dir is None:
+            corpus_dir = tmp_dir
+            generate_corpus(corpus_dir, args.resumes, args.seed)
+        manifest = load_manifest(corpus_dir)
+        print(f"Corpus: {len(manifest['files'])} files, {sum(entry['pages'] for entry in manifest['files'])} pages "
+              f"(seed {manifest['seed']}), best of {args.runs} runs")
+        results = [run_isolated(path_name, corpus_dir, args.runs) for path_name in args.paths or default_paths()]
+
+    print(f"{'path':<12} {'docs':>5} {'pages':>6} {'docs/s':>8} {'pages/s':>8} {'p50 ms/pg':>10} {'p95 ms/pg':>10} "
+          f"{'peak MB':>8} {'+MB':>6} {'text':>6}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['path']:<12} skipped ({result['skipped']})")
+            continue
+        print(f"{result['path']:<12} {result['docs']:>5} {result['pages']:>6} {result['docs_per_s']:>8.1f} "
+              f"{result['pages_per_s']:>8.1f} {result['p50_page_ms']:>10.2f} {result['p95_page_ms']:>10.2f} "
+              f"{result['peak_rss_mb'] or 0:>8.0f} {result['rss_growth_mb'] or 0:>6.1f} "
+              f"{'' if result['recovered'] is None else format(result['recovered'], '.0%'):>6}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                                   "cpus": os.cpu_count()},
+                       "corpus": {"resumes": manifest["resumes"], "seed": manifest["seed"]}, "runs": args.runs,
+                       "results": {result["path"]: result for result in results}}, f, indent=1)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("corpus") != {"resumes": manifest["resumes"], "seed": manifest["seed"]}:
+        print(f"Note: the baseline was recorded on a different corpus ({baseline.get('corpus')})")
+    regressions = compare(results, baseline, args.tolerance)
+    for path_name, metric, before, after, change in regressions:
+        print(f"REGRESSION {path_name} {metric}: {before} -> {after} ({change:+.0%})")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline} "
+              f"(recorded on {baseline.get('machine', {}).get('platform', 'an unknown machine')})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+###### Job-category classifier benchmark ######
+# Times the local classifier one resume at a time and as one batch matrix, and
+# reports how often it would still escalate the category to the LLM:
+#
+#   python -m benchmarks.job_classifier ./resumes
+#   python -m benchmarks.job_classifier --synthetic 500
+#
+# Synthetic resumes are built from one category's description and skill list plus
+# filler text, so their expected category is known and accuracy is reported too.
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.skill_extraction import load_texts
+from classifier import CATEGORY_DESCRIPTIONS, JobCategoryClassifier, is_confident
+
+FILLER = ("led team built designed delivered improved managed developed the a of and for with "
+          "project customer platform service report quarterly revenue growth users university").split()
+
+
+def synthetic_resumes(count, words_per_text=500, seed=0):
+    """[(expected category, text)]: one category's vocabulary at ~10% density in filler text."""
+    rng = random.Random(seed)
+    categories = list(CATEGORY_DESCRIPTIONS)
+    resumes = []
+    for _ in range(count):
+        category = rng.choice(categories)
+        terms = CATEGORY_DESCRIPTIONS[category].split()
+        resumes.append((category, ' '.join(rng.choice(terms) if rng.random() < 0.1 else rng.choice(FILLER)
+                                           for _ in range(words_per_text))))
+    return resumes
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Time the local job-category classifier.")
+    arg_parser.add_argument("corpus_dir", nargs="?", help="Directory of .pdf/.txt resumes")
+    arg_parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic resumes instead")
+    args = arg_parser.parse_args(argv)
+    if args.synthetic:
+        expected, texts = zip(*synthetic_resumes(args.synthetic))
+    elif args.corpus_dir:
+        expected, texts = None, load_texts(args.corpus_dir)
+    else:
+        arg_parser.error("Give a corpus directory or --synthetic N")
+    if not texts:
+        arg_parser.error("No resumes found")
+
+    start_time = time.perf_counter()
+    classifier = JobCategoryClassifier()
+    build_s = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    single = [classifier.classify(text) for text in texts]
+    single_s = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    batch = classifier.classify_batch(list(texts))
+    batch_s = time.perf_counter() - start_time
+    assert [r["job_category"] for r in single] == [r["job_category"] for r in batch]
+
+    print(f"{len(texts)} resumes, {len(classifier.vocabulary)} terms, {len(classifier.categories)} categories, "
+          f"built in {build_s * 1000:.1f} ms")
+    print(f"single  {single_s / len(texts) * 1e6:>8.0f} us/resume")
+    print(f"batch   {batch_s / len(texts) * 1e6:>8.0f} us/resume")
+    confident = [result for result in batch if is_confident(result)]
+    print(f"confident {len(confident) / len(batch):.0%}; the rest escalate the category to the LLM")
+    if expected:
+        correct = sum(result["job_category"] == category for result, category in zip(batch, expected) if is_confident(result))
+        print(f"accuracy when confident {correct / max(len(confident), 1):.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+###### Job index benchmark ######
+# Builds (or reuses) an index of synthetic postings and times opening it, single
+# and batched top-k queries, and incremental adds and deletes:
+#
+#   python -m benchmarks.job_index /tmp/job_bench --postings 1000000
+#
+# Posting vectors are random sparse unit vectors written straight into the index,
+# so building 1M postings takes seconds rather than a vectorizer pass per posting.
+# The index needs postings x JOB_INDEX_DIM x 4 bytes of disk (1 GB for 1M x 256).
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from job_index import JOB_INDEX_DIM, JobIndex
+
+BUILD_BATCH = 100_000
+
+
+def random_vectors(rng, count, dim, nonzero=40):
+    """Unit vectors with `nonzero` signed entries, like hashed resume/posting vectors."""
+    vectors = np.zeros((count, dim), dtype=np.float32)
+    columns = rng.integers(0, dim, size=(count, nonzero))
+    np.put_along_axis(vectors, columns, rng.standard_normal((count, nonzero)).astype(np.float32), axis=1)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return f"p50 {np.percentile(samples, 50):7.1f} ms | p95 {np.percentile(samples, 95):7.1f} ms"
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the job posting index.")
+    arg_parser.add_argument("index_dir", help="Index directory; rebuilt when it holds a different number of postings")
+    arg_parser.add_argument("--postings", type=int, default=1_000_000)
+    arg_parser.add_argument("--dim", type=int, default=JOB_INDEX_DIM)
+    arg_parser.add_argument("--k", type=int, default=10)
+    arg_parser.add_argument("--queries", type=int, default=20)
+    arg_parser.add_argument("--batch", type=int, default=32, help="Resumes per batched query")
+    args = arg_parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    if os.path.isdir(args.index_dir) and len(JobIndex(args.index_dir)) != args.postings:
+        shutil.rmtree(args.index_dir)
+    if not os.path.isdir(args.index_dir):
+        start_time = time.perf_counter()
+        index = JobIndex(args.index_dir, dim=args.dim)
+        for start in range(0, args.postings, BUILD_BATCH):
+            count = min(BUILD_BATCH, args.postings - start)
+            index.add([{"id": f"job-{start + i}", "title": f"Posting {start + i}"} for i in range(count)],
+                      random_vectors(rng, count, args.dim))
+        index.close()
+        print(f"built {args.postings} postings in {time.perf_counter() - start_time:.1f} s")
+
+    start_time = time.perf_counter()
+    index = JobIndex(args.index_dir)
+    print(f"open    {(time.perf_counter() - start_time) * 1000:8.1f} ms  ({len(index)} postings, {index.dim} dims, "
+          f"{os.path.getsize(os.path.join(args.index_dir, 'vectors.npy')) / 2**20:.0f} MB vectors)")
+
+    queries = random_vectors(rng, max(args.queries, args.batch), index.dim)
+    index.search(queries[0], args.k)  # Fault the vectors into the page cache
+    single = []
+    for query in queries[:args.queries]:
+        start_time = time.perf_counter()
+        index.search(query, args.k)
+        single.append(time.perf_counter() - start_time)
+    print(f"single  {percentiles(single)}")
+    start_time = time.perf_counter()
+    index.search(queries[:args.batch], args.k)
+    batch_s = time.perf_counter() - start_time
+    print(f"batch   {batch_s * 1000:8.1f} ms for {args.batch} queries, {batch_s / args.batch * 1000:.1f} ms/query")
+
+    start_time = time.perf_counter()
+    index.add([{"id": "bench-added", "title": "Added posting"}], queries[:1])
+    add_s = time.perf_counter() - start_time
+    assert index.search(queries[0], 1)[0][0][1]["id"] == "bench-added"
+    start_time = time.perf_counter()
+    index.delete(["bench-added"])
+    delete_s = time.perf_counter() - start_time
+    print(f"add     {add_s * 1000:8.2f} ms, delete {delete_s * 1000:.2f} ms (one posting, no rebuild)")
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
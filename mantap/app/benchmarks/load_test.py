@@ -0,0 +1,234 @@
+###### End-to-end load test ######
+# Simulates concurrent users uploading resumes to the app against a local mock of
+# the DashScope endpoint (stub_server.StubLLMServer), at increasing concurrency:
+#
+#   python -m benchmarks.load_test --concurrency 1 4 16 64 --latency lognormal:2.5,0.5 --error-rate 0.02
+#   python -m benchmarks.load_test --base-url http://127.0.0.1:8011/v1   # e.g. stub_server.py --replay-from ...
+#
+# Each simulated user is a thread running the steps app.run() takes for an upload
+# (hash, submit to the analysis job queue, follow the job's events, course
+# recommendations), as Streamlit runs every session's script in its own thread.
+# Uploads come from a synthetic corpus (benchmarks.resume_corpus) unless a
+# directory is given; the analysis cache, LLM memo and job queue start empty at
+# every level. Reported per level: session latency p50/p95/p99, time to the first
+# rendered result, sessions/min, LLM requests/s, queue wait p95 and worker
+# utilization, LLM admission wait p95, 429s and the adaptive concurrency limit at
+# the end of the level (admission.py), sessions with fallback stages, and the RSS
+# of this process, which plays the app server.
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.resume_corpus import generate_corpus
+from stub_server import StubLLMServer
+
+# Stages whose results are rendered as soon as they finish
+FIRST_RESULT_STAGES = ("extraction", "fused", "summary")
+RSS_SAMPLE_S = 0.1
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):  # Not Linux
+        return None
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))] if samples else float('nan')
+
+def analysis_responder(messages):
+    """Well-formed responses for each analysis prompt, so every stage completes against the mock."""
+    prompt = messages[-1]["content"]
+    if "ONE valid JSON object" in prompt:
+        return json.dumps({"name": "Alex Lee", "email": "alex.lee@example.com", "mobile_number": "+1 555 0100",
+                           "skills": ["Python", "SQL", "Docker"], "education": "BSc Computer Science",
+                           "experience": "Five years building data platforms.", "degree": "BSc",
+                           "job_category": "Data Engineer", "experience_level": "Experienced", "resume_score": 78,
+                           "improvement_reasons": ["Quantify impact", "Add a projects section", "Tighten the summary"],
+                           "match_explanation": "Pipelines, SQL and cloud tooling dominate the experience.",
+                           "summary": "Data engineer with five years of platform work. Builds batch and streaming pipelines."})
+    if "Extract the following information" in prompt:
+        return json.dumps({"name": "Alex Lee", "email": "alex.lee@example.com", "mobile_number": "+1 555 0100",
+                           "skills": ["Python", "SQL", "Docker"], "education": "BSc Computer Science",
+                           "experience": "Five years building data platforms.", "degree": "BSc"})
+    if "Analyze this resume" in prompt:
+        return json.dumps({"job_category": "Data Engineer", "experience_level": "Experienced", "resume_score": 78,
+                           "improvement_reasons": ["Quantify impact", "Add a projects section", "Tighten the summary"],
+                           "match_explanation": "Pipelines, SQL and cloud tooling dominate the experience."})
+    if "concise summary" in prompt:
+        return ("Data engineer with five years of platform work. Builds batch and streaming pipelines and owns their "
+                "reliability. Comfortable with Python, SQL and Docker across cloud environments.")
+    return json.dumps({"career_paths": [{"path_title": "Senior Data Engineer", "focus_areas": ["Data modeling", "Streaming"]},
+                                        {"path_title": "Analytics Engineer", "focus_areas": ["dbt", "Metrics layers"]},
+                                        {"path_title": "ML Platform Engineer", "focus_areas": ["Feature stores", "Model serving"]}]})
+
+def load_uploads(corpus_dir):
+    """[(name, bytes)] of the PDF and DOCX files in corpus_dir."""
+    uploads = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.lower().endswith(('.pdf', '.docx')):
+            with open(os.path.join(corpus_dir, name), 'rb') as f:
+                uploads.append((name, f.read()))
+    return uploads
+
+def simulate_session(name, data, mode, cache, job_queue):
+    """One upload through the steps of app.run(); returns (seconds, seconds to first result, status)."""
+    from cache import content_hash
+    from courses import recommend_courses
+    from jobs import EVENT_STAGE_DONE, JOB_POLL_S, submit_analysis
+    from pipeline import STATUS_OK
+
+    start_time = time.perf_counter()
+    upload = io.BytesIO(data)
+    upload.name = name  # Like Streamlit's UploadedFile
+    job = submit_analysis(upload, mode, cache, content_hash(upload.getbuffer()), job_queue)
+    if job is None:
+        return time.perf_counter() - start_time, None, "rejected"
+    results, first_result, cursor, finished = {}, None, 0, False
+    while not finished:
+        events, cursor, finished = job.poll(cursor, JOB_POLL_S)
+        for kind, result in events:
+            if kind != EVENT_STAGE_DONE:
+                continue
+            results[result.name] = result
+            if first_result is None and result.name in FIRST_RESULT_STAGES and result.value:
+                first_result = time.perf_counter() - start_time
+    resume_data = results["extraction"].value if "extraction" in results else None
+    analysis = results["analysis"].value if "analysis" in results else None
+    if resume_data and analysis:
+        recommend_courses(analysis.get("job_category", "NA"), resume_data.get("skills", []))
+    status = "error" if not resume_data else "ok" if all(r.status == STATUS_OK for r in results.values()) else "partial"
+    return time.perf_counter() - start_time, first_result, status
+
+def run_level(concurrency, sessions_per_user, uploads, mode, stub, workers):
+    from admission import admission_controller
+    from cache import AnalysisCache
+    from jobs import ANALYSIS_QUEUE_SIZE, JobQueue
+    from memo import llm_memo
+
+    cache = AnalysisCache()
+    llm_memo.clear()
+    admission_controller.reset_stats()
+    # Room for every simulated user, so the level measures waiting rather than refusals
+    job_queue = JobQueue(workers=workers, max_queued=max(ANALYSIS_QUEUE_SIZE, concurrency))
+    samples, lock = [], threading.Lock()
+    requests_before = stub.stats()["requests"] if stub else 0
+
+    def user(user_index):
+        for session in range(sessions_per_user):
+            # Distinct uploads across users and sessions while the corpus lasts
+            name, data = uploads[(user_index * sessions_per_user + session) % len(uploads)]
+            try:
+                sample = simulate_session(name, data, mode, cache, job_queue)
+            except Exception as e:
+                print(f"Session for {name} failed: {e}")
+                sample = (float('nan'), None, "error")
+            with lock:
+                samples.append(sample)
+
+    peak_rss, done = [current_rss_mb() or 0.0], threading.Event()
+
+    def sample_rss():
+        while not done.wait(RSS_SAMPLE_S):
+            peak_rss[0] = max(peak_rss[0], current_rss_mb() or 0.0)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    start_time = time.perf_counter()
+    users = [threading.Thread(target=user, args=(i,), name=f"user-{i}") for i in range(concurrency)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    wall_s = time.perf_counter() - start_time
+    done.set()
+    sampler.join()
+
+    latencies = [seconds for seconds, _, status in samples if status not in ("error", "rejected")]
+    queue_stats = job_queue.stats()
+    first_results = [first for _, first, _ in samples if first is not None]
+    admission_stats = admission_controller.stats()
+    return {
+        "concurrency": concurrency, "sessions": len(samples),
+        "partial": sum(status == "partial" for _, _, status in samples),
+        "errors": sum(status in ("error", "rejected") for _, _, status in samples),
+        "p50_s": percentile(latencies, 50), "p95_s": percentile(latencies, 95), "p99_s": percentile(latencies, 99),
+        "first_result_p50_s": percentile(first_results, 50),
+        "sessions_per_min": len(samples) / wall_s * 60,
+        "llm_requests_per_s": (stub.stats()["requests"] - requests_before) / wall_s if stub else None,
+        "queue_wait_p95_s": queue_stats["wait_p95_s"], "worker_utilization": queue_stats["utilization"],
+        "llm_wait_p95_s": admission_stats["wait_p95_s"], "throttled": admission_stats["throttled"],
+        "concurrency_limit": admission_stats["concurrency_limit"],
+        "rss_mb": current_rss_mb(), "peak_rss_mb": peak_rss[0],
+    }
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Load-test the upload flow against a mock LLM endpoint.")
+    arg_parser.add_argument("corpus_dir", nargs="?", help="Directory of PDF/DOCX resumes (default: a synthetic corpus)")
+    arg_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    arg_parser.add_argument("--sessions", type=int, default=2, help="Uploads per simulated user at every level")
+    arg_parser.add_argument("--mode", default=None, help="Analysis mode (default: the app's default)")
+    arg_parser.add_argument("--workers", type=int, default=None, help="Analysis job workers (default: ANALYSIS_WORKERS)")
+    arg_parser.add_argument("--base-url", help="Use this endpoint instead of starting a mock server")
+    arg_parser.add_argument("--latency", default="lognormal:1.0,0.4", help="Mock latency distribution (see stub_server.parse_latency)")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="Share of mock requests failed with 429/500/503")
+    arg_parser.add_argument("--tokens-per-s", type=float, default=0.0, help="Mock completion generation rate")
+    arg_parser.add_argument("--replay-from", help="Serve recorded responses (stub_server --record-to)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--json", help="Also write the report rows to this JSON file")
+    args = arg_parser.parse_args(argv)
+
+    stub = None
+    if args.base_url:
+        os.environ['ALIBABA_BASE_URL'] = args.base_url
+    else:
+        stub = StubLLMServer(responder=analysis_responder, latency=args.latency, error_rate=args.error_rate,
+                             tokens_per_s=args.tokens_per_s, seed=args.seed, replay_from=args.replay_from).start()
+        os.environ['ALIBABA_BASE_URL'] = stub.base_url
+    # The LLM client reads the endpoint when llm.py is first imported
+    os.environ.setdefault('API_KEY', 'load-test')
+    from analysis import DEFAULT_ANALYSIS_MODE
+    from jobs import ANALYSIS_WORKERS
+    mode = args.mode or DEFAULT_ANALYSIS_MODE
+    workers = args.workers or ANALYSIS_WORKERS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus_dir
+        if corpus_dir is None:
+            corpus_dir = tmp_dir
+            generate_corpus(corpus_dir, resumes=max(args.concurrency) * args.sessions, seed=args.seed)
+        uploads = load_uploads(corpus_dir)
+    if not uploads:
+        arg_parser.error(f"No PDF or DOCX files in {corpus_dir}")
+    print(f"{len(uploads)} uploads, mode {mode}, {workers} job workers, endpoint {os.environ['ALIBABA_BASE_URL']}"
+          + (f", latency {args.latency}, error rate {args.error_rate:.0%}" if stub else ""))
+
+    rows = []
+    print(f"{'users':>5} {'sessions':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'first s':>8} {'per min':>8} "
+          f"{'LLM req/s':>9} {'wait p95':>8} {'util':>5} {'LLM wait':>8} {'429s':>5} {'limit':>5} {'partial':>7} {'errors':>6} {'RSS MB':>7} {'peak MB':>8}")
+    for concurrency in args.concurrency:
+        row = run_level(concurrency, args.sessions, uploads, mode, stub, workers)
+        rows.append(row)
+        print(f"{row['concurrency']:>5} {row['sessions']:>8} {row['p50_s']:>7.2f} {row['p95_s']:>7.2f} {row['p99_s']:>7.2f} "
+              f"{row['first_result_p50_s']:>8.2f} {row['sessions_per_min']:>8.1f} "
+              f"{row['llm_requests_per_s'] if row['llm_requests_per_s'] is not None else float('nan'):>9.1f} "
+              f"{row['queue_wait_p95_s']:>8.2f} {row['worker_utilization']:>5.0%} {row['llm_wait_p95_s']:>8.2f} "
+              f"{row['throttled']:>5} {row['concurrency_limit']:>5} {row['partial']:>7} {row['errors']:>6} {row['rss_mb'] or 0:>7.0f} {row['peak_rss_mb']:>8.0f}", flush=True)
+    if stub:
+        print(f"Mock server: {stub.stats()}")
+        stub.stop()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
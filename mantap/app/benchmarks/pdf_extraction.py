@@ -0,0 +1,62 @@
+###### PDF extraction backend benchmark ######
+# Compares the PDF backends of resume_reader on the same corpus:
+#
+#   python -m benchmarks.pdf_extraction ./resumes --runs 3 --workers 1 4
+#
+# Every backend/worker combination reads every PDF without page or byte caps, and
+# reports wall time, pages/s and how much text it recovered relative to the
+# layout backend (the reader the app originally used).
+import argparse
+import os
+import sys
+import time
+
+from resume_reader import PDF_BACKENDS, extract_pdf
+
+
+def find_pdfs(corpus_dir):
+    pdfs = []
+    for root, directories, filenames in os.walk(corpus_dir):
+        pdfs.extend(os.path.join(root, name) for name in filenames if name.lower().endswith('.pdf'))
+    return sorted(pdfs)
+
+def run_backend(pdfs, backend, workers, runs):
+    """Best-of-`runs` wall time over the corpus, with the pages and words extracted."""
+    best, pages, words = None, 0, 0
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        pages, words = 0, 0
+        for path in pdfs:
+            result = extract_pdf(path, backend, max_pages=0, max_bytes=0, workers=workers)
+            pages += result["pages_read"]
+            words += len(result["text"].split())
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return {"backend": backend, "workers": workers, "seconds": best, "pages": pages, "words": words}
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compare PDF text extraction backends on a directory of PDFs.")
+    arg_parser.add_argument("corpus_dir")
+    arg_parser.add_argument("--backends", nargs="+", choices=list(PDF_BACKENDS), default=list(PDF_BACKENDS))
+    arg_parser.add_argument("--workers", nargs="+", type=int, default=[1, min(4, os.cpu_count() or 1)])
+    arg_parser.add_argument("--runs", type=int, default=3, help="Repetitions per combination; the best run is reported")
+    args = arg_parser.parse_args(argv)
+    pdfs = find_pdfs(args.corpus_dir)
+    if not pdfs:
+        arg_parser.error(f"No PDFs found in {args.corpus_dir}")
+    print(f"{len(pdfs)} PDFs, best of {args.runs} runs")
+
+    rows = [run_backend(pdfs, backend, workers, args.runs)
+            for backend in args.backends for workers in sorted(set(args.workers))]
+    baseline = next((row for row in rows if row["backend"] == "layout"), rows[0])
+    print(f"{'backend':<10} {'workers':>7} {'seconds':>9} {'pages/s':>9} {'text':>9} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['backend']:<10} {row['workers']:>7} {row['seconds']:>9.3f} "
+              f"{row['pages'] / max(row['seconds'], 1e-9):>9.1f} "
+              f"{row['words'] / max(baseline['words'], 1):>9.0%} "
+              f"{baseline['seconds'] / max(row['seconds'], 1e-9):>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
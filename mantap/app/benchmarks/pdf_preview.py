@@ -0,0 +1,59 @@
+###### PDF preview footprint benchmark ######
+# Compares the inline base64 iframe with the cached page-image preview:
+#
+#   python -m benchmarks.pdf_preview ./resumes --pages 2
+#
+# For every PDF it reports the bytes each mode sends to the browser, the Python
+# memory allocated to build it (tracemalloc peak) and the render time, cold and
+# from the preview cache.
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+
+from benchmarks.pdf_extraction import find_pdfs
+from cache import content_hash
+from preview import PREVIEW_WIDTH, get_preview, inline_pdf_html, preview_available
+
+
+def measure(func):
+    """(result, seconds, peak bytes allocated by func)."""
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start_time
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compare payload and memory of the inline PDF view and the image preview.")
+    arg_parser.add_argument("corpus_dir")
+    arg_parser.add_argument("--pages", type=int, default=2, help="Pages rendered by the preview")
+    arg_parser.add_argument("--width", type=int, default=PREVIEW_WIDTH, help="Preview width in pixels")
+    args = arg_parser.parse_args(argv)
+    if not preview_available():
+        arg_parser.error("PyMuPDF is not installed, so there is no preview to compare")
+    pdfs = find_pdfs(args.corpus_dir)
+    if not pdfs:
+        arg_parser.error(f"No PDFs found in {args.corpus_dir}")
+
+    print(f"{'file':<28} {'size KB':>8} | {'inline KB':>9} {'mem KB':>8} | "
+          f"{'preview KB':>10} {'mem KB':>8} {'cold ms':>8} {'warm ms':>8}")
+    for path in pdfs:
+        with open(path, "rb") as f:
+            upload = io.BytesIO(f.read())
+        digest = content_hash(upload.getbuffer())
+        html, _, inline_peak = measure(lambda: inline_pdf_html(upload.getbuffer()))
+        preview, cold_s, preview_peak = measure(lambda: get_preview(digest, upload, args.pages, args.width))
+        _, warm_s, _ = measure(lambda: get_preview(digest, upload, args.pages, args.width))
+        image_size = sum(len(image) for image in preview["images"]) if preview else 0
+        print(f"{path[-28:]:<28} {upload.getbuffer().nbytes / 1024:>8.0f} | {len(html) / 1024:>9.0f} {inline_peak / 1024:>8.0f} | "
+              f"{image_size / 1024:>10.0f} {preview_peak / 1024:>8.0f} {cold_s * 1000:>8.1f} {warm_s * 1000:>8.3f}")
+    print("The inline markup is resent on every rerun; preview images are fetched once and then served from the cache.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
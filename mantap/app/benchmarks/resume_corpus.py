@@ -0,0 +1,254 @@
+###### Synthetic resume corpus ######
+# Reproducible PDF and DOCX resumes for the extraction benchmarks, generated
+# offline from a seed:
+#
+#   python -m benchmarks.resume_corpus ./synthetic_resumes --resumes 40 --seed 0
+#
+# Resumes vary in page count (1 to 10), layout (single column, two columns with a
+# sidebar, dense small print) and font size. The PDFs are written directly with
+# the standard Helvetica fonts, so no PDF library is needed. manifest.json lists
+# every file with its layout, page count and the number of words written, which
+# the benchmarks compare extracted text against.
+import argparse
+import json
+import os
+import random
+import sys
+import zlib
+
+import docx
+from docx.shared import Pt
+
+from skills import default_vocabulary
+
+MANIFEST = "manifest.json"
+LAYOUTS = ("single", "two_column", "dense")
+PAGE_COUNTS = (1, 1, 1, 2, 2, 3, 4, 6, 10)
+PAGE_WIDTH, PAGE_HEIGHT, MARGIN = 612, 792, 54  # US Letter, points
+SIDEBAR_WIDTH = 160
+SECTIONS = ("Experience", "Projects", "Education", "Certifications", "Publications")
+FILLER = ("led team built designed delivered improved managed developed analysed migrated automated reduced "
+          "the a of and for with across to by project customer platform service pipeline dashboard report "
+          "quarterly revenue growth users latency cost reliability stakeholders release").split()
+FIRST_NAMES = ("Alex", "Sam", "Jordan", "Taylor", "Morgan", "Riley", "Casey", "Jamie", "Avery", "Quinn")
+LAST_NAMES = ("Lee", "Garcia", "Smith", "Nguyen", "Patel", "Kim", "Silva", "Muller", "Rossi", "Tan")
+
+
+def _ascii(text):
+    # Helvetica with WinAnsiEncoding: keep the corpus to characters every backend decodes alike
+    return text.encode('ascii', 'ignore').decode('ascii')
+
+class _ResumeWriter:
+    """Deterministic resume content: a header, a skills list and sections of bullet lines."""
+    def __init__(self, rng):
+        self.rng = rng
+        self.skills = [_ascii(skill) for skill in default_vocabulary() if _ascii(skill)]
+        self.name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    def header(self):
+        handle = self.name.lower().replace(' ', '.')
+        return [self.name, f"{handle}@example.com | +1 555 {self.rng.randint(1000000, 9999999)} | linkedin.com/in/{handle}"]
+
+    def skill_lines(self, count):
+        return [', '.join(self.rng.sample(self.skills, 4)) for _ in range(count)]
+
+    def bullet(self, words):
+        rng = self.rng
+        return ' '.join(rng.choice(self.skills) if rng.random() < 0.08 else rng.choice(FILLER) for _ in range(words))
+
+    def section(self):
+        return self.rng.choice(SECTIONS)
+
+def _wrap(text, chars):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > chars:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return lines + ([line] if line else [])
+
+
+###### PDF ######
+def _pdf_string(text):
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+def _text_ops(x, y, size, bold, text):
+    return f"BT /{'F2' if bold else 'F1'} {size} Tf {x} {y} Td {_pdf_string(text)} Tj ET"
+
+def _column_lines(writer, first_page, width, font_size, height):
+    """[(text, bold, size)] filling one column of one page."""
+    chars = int(width / (font_size * 0.5))
+    lines, used = [], 0
+    if first_page:
+        name, contact = writer.header()
+        lines += [(name, True, font_size + 8), (contact, False, font_size)]
+        used += font_size + 8 + 2 * font_size * 1.3
+    while used + font_size * 1.3 * 6 < height:
+        lines.append((writer.section(), True, font_size + 2))
+        used += (font_size + 2) * 1.6
+        for _ in range(writer.rng.randint(2, 5)):
+            for i, line in enumerate(_wrap(writer.bullet(writer.rng.randint(12, 40)), chars - 2)):
+                if used + font_size * 1.3 > height:
+                    return lines
+                lines.append((("- " if i == 0 else "  ") + line, False, font_size))
+                used += font_size * 1.3
+    return lines
+
+def _page_stream(writer, layout, page_number, font_size):
+    ops, height = [], PAGE_HEIGHT - 2 * MARGIN
+    columns = [(MARGIN, PAGE_WIDTH - 2 * MARGIN)]
+    if layout == "two_column":
+        # Sidebar with the skills on every page, main column beside it
+        main_x = MARGIN + SIDEBAR_WIDTH + 20
+        columns = [(main_x, PAGE_WIDTH - MARGIN - main_x)]
+        y = PAGE_HEIGHT - MARGIN
+        ops.append(_text_ops(MARGIN, y, font_size + 2, True, "Skills"))
+        for line in writer.skill_lines(int(height / (font_size * 1.3 * 2))):
+            for wrapped in _wrap(line, int(SIDEBAR_WIDTH / (font_size * 0.5))):
+                y -= font_size * 1.3
+                if y < MARGIN:
+                    break
+                ops.append(_text_ops(MARGIN, round(y, 2), font_size, False, wrapped))
+    for x, width in columns:
+        y = PAGE_HEIGHT - MARGIN
+        for text, bold, size in _column_lines(writer, page_number == 0, width, font_size, height):
+            y -= size * 1.3
+            ops.append(_text_ops(x, round(y, 2), size, bold, text))
+    return '\n'.join(ops)
+
+def write_pdf(path, writer, layout, pages, font_size):
+    """A PDF of `pages` pages; returns the text written, for the manifest word count."""
+    streams = [_page_stream(writer, layout, page, font_size) for page in range(pages)]
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{5 + 2 * i} 0 R' for i in range(pages))}] /Count {pages} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, stream in enumerate(streams):
+        data = zlib.compress(stream.encode('latin-1'))
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                       f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {6 + 2 * i} 0 R >>")
+        objects.append((f"<< /Length {len(data)} /Filter /FlateDecode >>\nstream\n".encode('latin-1'), data))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode('latin-1')
+        if isinstance(body, tuple):
+            out += body[0] + body[1] + b"\nendstream"
+        else:
+            out += body.encode('latin-1')
+        out += b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    out += ''.join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    with open(path, 'wb') as f:
+        f.write(out)
+    return ' '.join(stream_text for stream in streams for stream_text in _stream_strings(stream))
+
+def _stream_strings(stream):
+    for line in stream.splitlines():
+        text = line[line.index(' Td (') + 5:line.rindex(') Tj')]
+        yield text.replace('\\(', '(').replace('\\)', ')').replace('\\\\', '\\')
+
+
+###### DOCX ######
+def write_docx(path, writer, layout, pages, font_size):
+    """A DOCX with `pages` page-break-separated pages; two_column puts the sidebar in a table."""
+    document = docx.Document()
+    document.styles['Normal'].font.size = Pt(font_size)
+    written = []
+    name, contact = writer.header()
+    document.add_heading(name, level=1)
+    document.add_paragraph(contact)
+    written += [name, contact]
+    lines_per_page = int((PAGE_HEIGHT - 2 * MARGIN) / (font_size * 1.3 * 3))
+    for page in range(pages):
+        if page:
+            document.add_page_break()
+        if layout == "two_column":
+            # Text in table cells, as resume templates with a sidebar lay it out
+            cells = document.add_table(rows=1, cols=2).rows[0].cells
+            skills = writer.skill_lines(lines_per_page // 2)
+            cells[0].text = '\n'.join(skills)
+            written += skills
+            body = cells[1]
+        for _ in range(lines_per_page // 4):
+            heading = writer.section()
+            bullets = [writer.bullet(writer.rng.randint(12, 40)) for _ in range(3)]
+            if layout == "two_column":
+                body.add_paragraph(heading)
+                for bullet in bullets:
+                    body.add_paragraph(bullet)
+            else:
+                document.add_heading(heading, level=2)
+                for bullet in bullets:
+                    document.add_paragraph(bullet, style='List Bullet')
+            written += [heading] + bullets
+    document.save(path)
+    return ' '.join(written)
+
+
+def generate_corpus(out_dir, resumes=40, seed=0, formats=("pdf", "docx")):
+    """Write `resumes` files of each format to out_dir with a manifest; returns the manifest entries."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    manifest = []
+    for i in range(resumes):
+        layout = LAYOUTS[i % len(LAYOUTS)]
+        pages = rng.choice(PAGE_COUNTS)
+        font_size = 8 if layout == "dense" else rng.choice((10, 11, 12))
+        for file_format in formats:
+            name = f"resume-{i:03d}-{layout}-{pages}p.{file_format}"
+            writer = _ResumeWriter(random.Random(f"{seed}-{i}"))
+            write = write_pdf if file_format == "pdf" else write_docx
+            text = write(os.path.join(out_dir, name), writer, layout, pages, font_size)
+            manifest.append({"file": name, "format": file_format, "layout": layout, "pages": pages,
+                             "font_size": font_size, "words": len(text.split())})
+    with open(os.path.join(out_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump({"seed": seed, "resumes": resumes, "files": manifest}, f, indent=1)
+    return manifest
+
+def load_manifest(corpus_dir):
+    with open(os.path.join(corpus_dir, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+def synthetic_llm_responses(count, seed=0):
+    """
+    Analysis-shaped LLM responses in the shapes parse_llm_json_response handles: plain JSON,
+    fenced in markdown, and wrapped in prose.
+    """
+    rng = random.Random(seed)
+    writer = _ResumeWriter(rng)
+    responses = []
+    for i in range(count):
+        payload = json.dumps({
+            "name": writer.name, "skills": rng.sample(writer.skills, rng.randint(5, 30)),
+            "job_category": "Software Engineer", "experience_level": "Mid-Level", "resume_score": rng.randint(40, 95),
+            "improvement_reasons": [writer.bullet(15) for _ in range(rng.randint(2, 6))],
+            "match_explanation": writer.bullet(40),
+        }, indent=rng.choice((None, 2)))
+        shape = i % 3
+        responses.append(payload if shape == 0 else f"```json\n{payload}\n```" if shape == 1
+                         else f"Here is the analysis you asked for:\n{payload}\nLet me know if you need more.")
+    return responses
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Generate a reproducible synthetic resume corpus.")
+    arg_parser.add_argument("out_dir")
+    arg_parser.add_argument("--resumes", type=int, default=40, help="Resumes per format")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--formats", nargs="+", choices=("pdf", "docx"), default=["pdf", "docx"])
+    args = arg_parser.parse_args(argv)
+    manifest = generate_corpus(args.out_dir, args.resumes, args.seed, args.formats)
+    print(f"Wrote {len(manifest)} resumes ({sum(entry['pages'] for entry in manifest)} pages) to {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+###### Skill extraction benchmark ######
+# Compares the Aho-Corasick skill matcher with the spaCy path pyresparser uses
+# (tokens and noun chunks looked up in a skills set) on the same texts:
+#
+#   python -m benchmarks.skill_extraction ./resumes
+#   python -m benchmarks.skill_extraction --synthetic 200
+#
+# PDFs are extracted with resume_reader first; .txt files are read as they are.
+# The spaCy side is skipped without spaCy; without en_core_web_sm it falls back to
+# the blank English tokenizer, a lower bound on the cost of the real pipeline.
+import argparse
+import os
+import random
+import sys
+import time
+
+from resume_reader import extract_pdf
+from skills import SkillMatcher, default_vocabulary
+
+
+def load_texts(corpus_dir):
+    texts = []
+    for root, directories, filenames in os.walk(corpus_dir):
+        for name in sorted(filenames):
+            path = os.path.join(root, name)
+            if name.lower().endswith('.pdf'):
+                texts.append(extract_pdf(path, max_pages=0, max_bytes=0, workers=1)["text"])
+            elif name.lower().endswith('.txt'):
+                with open(path, encoding='utf-8', errors='ignore') as f:
+                    texts.append(f.read())
+    return texts
+
+def synthetic_texts(count, words_per_text=600, seed=0):
+    """Resume-sized filler text with a sprinkling of vocabulary skills."""
+    rng = random.Random(seed)
+    filler = ("led team built designed delivered improved managed developed analysed the a of and for with "
+              "project customer platform service pipeline dashboard report quarterly revenue growth users").split()
+    vocabulary = default_vocabulary()
+    return [' '.join(rng.choice(vocabulary) if rng.random() < 0.05 else rng.choice(filler) for _ in range(words_per_text))
+            for _ in range(count)]
+
+def spacy_extract_skills(nlp, text, skills):
+    """pyresparser's utils.extract_skills: non-stopword tokens and noun chunks found in `skills` (lowercase)."""
+    doc = nlp(text)
+    found = {token.text.lower() for token in doc if not token.is_stop and token.text.lower() in skills}
+    if doc.has_annotation("DEP"):
+        found.update(chunk.text.lower().strip() for chunk in doc.noun_chunks if chunk.text.lower().strip() in skills)
+    return found
+
+def timed(func, texts):
+    start_time = time.perf_counter()
+    results = [func(text) for text in texts]
+    return results, time.perf_counter() - start_time
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compare the Aho-Corasick skill matcher with the spaCy skill extraction path.")
+    arg_parser.add_argument("corpus_dir", nargs="?", help="Directory of .pdf/.txt resumes")
+    arg_parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic resumes instead")
+    args = arg_parser.parse_args(argv)
+    if args.synthetic:
+        texts = synthetic_texts(args.synthetic)
+    elif args.corpus_dir:
+        texts = load_texts(args.corpus_dir)
+    else:
+        arg_parser.error("Give a corpus directory or --synthetic N")
+    if not texts:
+        arg_parser.error("No resumes found")
+    total_chars = sum(len(text) for text in texts)
+    print(f"{len(texts)} texts, {total_chars / 1024:.0f} KB")
+
+    start_time = time.perf_counter()
+    matcher = SkillMatcher()
+    build_s = time.perf_counter() - start_time
+    matched, matcher_s = timed(matcher.extract, texts)
+    print(f"{'aho-corasick':<14} build {build_s * 1000:>7.1f} ms | {len(texts) / matcher_s:>9.1f} docs/s | "
+          f"{total_chars / matcher_s / 1e6:>6.2f} MB/s | {sum(len(skills) for skills in matched) / len(texts):.1f} skills/doc")
+
+    try:
+        import spacy
+    except ImportError as e:
+        print(f"{'spacy':<14} skipped: {e}")
+        return 0
+    start_time = time.perf_counter()
+    try:
+        nlp, label = spacy.load('en_core_web_sm'), 'spacy'
+    except OSError:
+        nlp, label = spacy.blank('en'), 'spacy (blank)'
+    load_s = time.perf_counter() - start_time
+    skills = {skill.lower() for skill in default_vocabulary()}
+    spacy_found, spacy_s = timed(lambda text: spacy_extract_skills(nlp, text, skills), texts)
+    print(f"{label:<14} load  {load_s * 1000:>7.1f} ms | {len(texts) / spacy_s:>9.1f} docs/s | "
+          f"{total_chars / spacy_s / 1e6:>6.2f} MB/s | {sum(len(found) for found in spacy_found) / len(texts):.1f} skills/doc")
+    # Agreement on the same vocabulary: the matcher also resolves aliases and multi-word skills
+    overlap = [len({skill.lower() for skill in ours} & theirs) / max(len(theirs), 1) for ours, theirs in zip(matched, spacy_found)]
+    print(f"speedup {spacy_s / matcher_s:.0f}x; the matcher finds {sum(overlap) / len(overlap):.0%} of the spaCy skills")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+###### Content-addressed analysis cache ######
+# Streamlit reruns the whole script on every widget interaction, which used to
+# re-parse the resume and fire every LLM call again. Results are keyed by the
+# SHA-256 of the uploaded bytes plus a stage name, so a rerun or a re-upload of
+# the same file is served from memory (or disk) without any network calls.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+# The disk tier is listed at most this often unless the size estimate exceeds the limit
+DISK_SCAN_INTERVAL_S = 300
+# Size eviction goes down to this share of the limit, leaving headroom before the next scan
+DISK_EVICT_TARGET = 0.9
+
+
+def content_hash(data):
+    """Return the hex SHA-256 digest of the uploaded file bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Two-tier cache for per-stage analysis results.
+    The in-process tier is a bounded LRU; the optional on-disk tier stores one JSON
+    file per (content hash, stage) and is evicted by TTL and total size.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=None,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # Running estimate of the disk tier's size, so a put does not list the directory;
+        # None until the first scan. Other processes' writes show up at the next scan.
+        self._disk_bytes = None
+        self._last_scan = 0.0
+        self._disk_lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, digest, stage):
+        """Return the cached value for a stage, or None on a miss."""
+        key = (digest, stage)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        value = self._disk_get(digest, stage)
+        if value is not None:
+            self._memory_put(key, value)
+        return value
+
+    def put(self, digest, stage, value):
+        """Store a stage result in both tiers. None is never cached."""
+        if value is None:
+            return
+        self._memory_put((digest, stage), value)
+        self._disk_put(digest, stage, value)
+
+    def get_or_compute(self, digest, stage, compute, should_cache=None):
+        """
+        Return the cached stage result, computing and storing it on a miss.
+        `should_cache` lets callers keep degraded fallback results out of the cache.
+        """
+        value = self.get(digest, stage)
+        if value is not None:
+            return value
+        value = compute()
+        if value is not None and (should_cache is None or should_cache(value)):
+            self.put(digest, stage, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for path, _, _ in self._disk_entries():
+            self._remove(path)
+        with self._disk_lock:
+            self._disk_bytes = 0
+
+    ###### In-process LRU tier ######
+    def _memory_put(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    ###### On-disk tier ######
+    def _disk_path(self, digest, stage):
+        return os.path.join(self.cache_dir, f"{digest}.{stage}.json")
+
+    def _disk_get(self, digest, stage):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(digest, stage)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                self._remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path, None)  # Refresh mtime so size eviction is least-recently-used
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, digest, stage, value):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(digest, stage)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced_size = os.path.getsize(path)
+            except OSError:
+                replaced_size = 0
+            os.replace(tmp_path, path)  # Atomic so concurrent sessions never read a partial file
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not write analysis cache entry {path}: {e}")
+            self._remove(tmp_path)
+            return
+        with self._disk_lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size - replaced_size
+            now = time.monotonic()
+            scan = (self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+                    or now - self._last_scan > DISK_SCAN_INTERVAL_S)
+            if scan:
+                self._last_scan = now
+        if scan:
+            self._evict_disk()
+
+    def _disk_entries(self):
+        if not self.cache_dir:
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st_result = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st_result.st_mtime, st_result.st_size))
+        return entries
+
+    def _evict_disk(self):
+        """Drop expired entries, then, over max_disk_bytes, the oldest ones down to DISK_EVICT_TARGET of it."""
+        now = time.time()
+        live = []
+        for path, mtime, size in self._disk_entries():
+            if now - mtime > self.ttl_seconds:
+                self._remove(path)
+            else:
+                live.append((path, mtime, size))
+        total = sum(size for _, _, size in live)
+        target = self.max_disk_bytes if total <= self.max_disk_bytes else self.max_disk_bytes * DISK_EVICT_TARGET
+        for path, _, size in sorted(live, key=lambda entry: entry[1]):
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+        with self._disk_lock:
+            self._disk_bytes = total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """
+    Process-wide cache shared by all sessions.
+    Set MANTAP_CACHE_DIR to enable the on-disk tier; MANTAP_CACHE_ENTRIES,
+    MANTAP_CACHE_TTL (seconds) and MANTAP_CACHE_MAX_MB tune the limits.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnalysisCache(
+                max_entries=int(os.getenv('MANTAP_CACHE_ENTRIES', DEFAULT_MAX_ENTRIES)),
+                cache_dir=os.getenv('MANTAP_CACHE_DIR') or None,
+                ttl_seconds=float(os.getenv('MANTAP_CACHE_TTL', DEFAULT_TTL_SECONDS)),
+                max_disk_bytes=int(float(os.getenv('MANTAP_CACHE_MAX_MB', DEFAULT_MAX_DISK_BYTES / (1024 * 1024))) * 1024 * 1024),
+            )
+        return _cache
@@ -0,0 +1,175 @@
+###### Local job-category classifier ######
+# TF-IDF centroid classifier over the job categories of the analysis prompt.
+# Each category profile is built from its recommend_skills list, a short
+# description of the role and any labeled example resumes; a resume is assigned
+# to the profile with the highest cosine similarity. Only when the best match is
+# not clearly ahead of the runner-up does the analysis LLM pick the category.
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+from skills import skill_recommendations
+
+# Role descriptions: titles and typical vocabulary, so every category has a profile even
+# without a recommend_skills list ("FrontEnd Development") or labeled examples
+CATEGORY_DESCRIPTIONS = {
+    "Project Manager": "project manager project management program manager delivery timelines milestones scope budget stakeholders risk agile scrum master sprint planning pmp prince2 jira ms project gantt",
+    "Product Manager": "product manager product owner roadmap product strategy user stories requirements prioritization discovery customer interviews market research product analytics a/b testing launch kpis okrs",
+    "Machine Learning Engineer": "machine learning engineer ml engineer model training deployment mlops tensorflow pytorch scikit-learn deep learning neural networks feature engineering inference serving nlp computer vision",
+    "Fullstack Engineer": "full stack fullstack engineer frontend backend javascript typescript react angular vue node.js express rest apis graphql databases docker ci/cd web applications",
+    "Software Engineer": "software engineer software developer programming java python c++ c# go data structures algorithms system design microservices object oriented design patterns unit testing git code review",
+    "Data Engineer": "data engineer data pipelines etl elt data warehouse data lake spark hadoop airflow kafka snowflake bigquery databricks dbt sql data modeling batch streaming",
+    "Data Analyst": "data analyst business analyst reporting dashboards excel sql tableau power bi looker kpis business intelligence insights data cleaning stakeholders google analytics",
+    "Data Science": "data scientist data science statistics statistical modeling hypothesis testing regression classification machine learning python r pandas numpy experiments predictive modeling visualization",
+    "FrontEnd Development": "frontend front end developer web developer ui html css javascript typescript react angular vue.js next.js redux responsive design accessibility webpack tailwind bootstrap browser",
+    "Backend Development": "backend back end developer server side apis rest restful graphql node.js express django flask spring boot ruby on rails php databases sql postgresql mysql mongodb redis microservices",
+    "Android Development": "android developer mobile kotlin java android sdk android studio jetpack compose gradle firebase play store mobile apps",
+    "IOS Development": "ios developer mobile swift swiftui objective-c xcode uikit core data cocoapods app store iphone ipad mobile apps",
+    "UI-UX Development": "ui ux designer user experience user interface product design figma adobe xd sketch wireframes prototypes user research usability testing interaction design visual design design systems",
+}
+# The best match counts as confident when its cosine similarity is at least
+# MIN_SIMILARITY and it leads the runner-up by CONFIDENCE_THRESHOLD (relative margin)
+CLASSIFIER_MIN_SIMILARITY = float(os.getenv('CLASSIFIER_MIN_SIMILARITY', 0.1))
+CLASSIFIER_CONFIDENCE_THRESHOLD = float(os.getenv('CLASSIFIER_CONFIDENCE_THRESHOLD', 0.25))
+# Optional JSONL of labeled resumes, one {"category": ..., "text": ...} per line
+CLASSIFIER_EXAMPLES_PATH = os.getenv('CLASSIFIER_EXAMPLES')
+
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9+#]*(?:[./-][a-z0-9+#]+)*")
+
+
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def load_examples(path):
+    """[(category, text)] from a JSONL file of labeled resumes."""
+    examples = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                examples.append((record["category"], record["text"]))
+    return examples
+
+
+class JobCategoryClassifier:
+    """
+    Nearest-centroid classifier on L2-normalized TF-IDF vectors.
+    Each category's centroid is the normalized mean of its profile documents (the description,
+    the recommend_skills list and labeled examples). classify_batch scores a whole matrix of
+    resumes against every centroid with one matrix product.
+    """
+    def __init__(self, examples=()):
+        documents = {category: [description] for category, description in CATEGORY_DESCRIPTIONS.items()}
+        for category in documents:
+            skill_list = skill_recommendations(category)
+            if skill_list:
+                documents[category].append(' '.join(skill_list))
+        for category, text in examples:
+            if category not in documents:
+                print(f"Ignoring classifier example for unknown category '{category}'")
+                continue
+            documents[category].append(text)
+        self.categories = list(documents)
+
+        # Vocabulary and IDF over the profile documents: terms that appear in no profile
+        # cannot move a resume towards any category, so they are never counted
+        tokenized = [[tokenize(doc) for doc in docs] for docs in documents.values()]
+        self.vocabulary = {}
+        document_frequency = Counter()
+        for docs in tokenized:
+            category_terms = set()
+            for tokens in docs:
+                category_terms.update(tokens)
+            for term in category_terms:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+            document_frequency.update(category_terms)
+        n_categories = len(self.categories)
+        self.idf = np.zeros(len(self.vocabulary))
+        for term, index in self.vocabulary.items():
+            self.idf[index] = math.log((1 + n_categories) / (1 + document_frequency[term])) + 1
+
+        self.centroids = np.zeros((n_categories, len(self.vocabulary)))
+        for row, docs in enumerate(tokenized):
+            self.centroids[row] = self._normalize(self.vectorize_tokens(tokens) for tokens in docs)
+
+    @staticmethod
+    def _normalize(vectors):
+        mean = np.mean(list(vectors), axis=0)
+        norm = np.linalg.norm(mean)
+        return mean / norm if norm else mean
+
+    def _term_counts(self, tokens):
+        # Counter is C-accelerated; the vocabulary filter then only sees distinct tokens
+        vocabulary = self.vocabulary
+        return [(vocabulary[term], count) for term, count in Counter(tokens).items() if term in vocabulary]
+
+    def vectorize_tokens(self, tokens):
+        """Sublinear-TF x IDF vector, L2-normalized."""
+        return self._matrix([self._term_counts(tokens)])[0]
+
+    def vectorize(self, texts):
+        """Matrix of resume vectors, one row per text."""
+        return self._matrix([self._term_counts(tokenize(text)) for text in texts])
+
+    def _matrix(self, rows):
+        # One scatter, one log and one normalization for the whole batch
+        matrix = np.zeros((len(rows), len(self.vocabulary)))
+        row_indexes = [row for row, counts in enumerate(rows) for _ in counts]
+        if row_indexes:
+            columns, counts = zip(*(entry for counts in rows for entry in counts))
+            matrix[row_indexes, list(columns)] = 1 + np.log(np.array(counts, dtype=float))
+            matrix *= self.idf
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def classify_batch(self, texts):
+        """[{"job_category", "confidence", "similarity"}] for every text; see classify."""
+        scores = self.vectorize(texts) @ self.centroids.T
+        # Top two per row without a full sort
+        top_two = np.argpartition(-scores, 1, axis=1)[:, :2] if len(self.categories) > 1 else np.zeros((len(texts), 1), dtype=np.intp)
+        results = []
+        for row, candidates in enumerate(top_two):
+            candidates = sorted(candidates, key=lambda index: -scores[row, index])
+            best = scores[row, candidates[0]]
+            runner_up = scores[row, candidates[1]] if len(candidates) > 1 else 0.0
+            confidence = (best - runner_up) / best if best >= CLASSIFIER_MIN_SIMILARITY else 0.0
+            results.append({
+                "job_category": self.categories[candidates[0]],
+                "confidence": round(float(confidence), 4),
+                "similarity": round(float(best), 4),
+            })
+        return results
+
+    def classify(self, text):
+        """
+        Best category for one resume. "confidence" is the best similarity's relative lead over
+        the runner-up (0 when nothing is similar enough), "similarity" its cosine similarity.
+        """
+        return self.classify_batch([text])[0]
+
+
+def is_confident(result, threshold=None):
+    threshold = CLASSIFIER_CONFIDENCE_THRESHOLD if threshold is None else threshold
+    return result is not None and result["confidence"] >= threshold
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_classifier():
+    """Process-wide classifier, built on first use (with CLASSIFIER_EXAMPLES if set)."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                examples = load_examples(CLASSIFIER_EXAMPLES_PATH) if CLASSIFIER_EXAMPLES_PATH else ()
+                _classifier = JobCategoryClassifier(examples)
+    return _classifier
+
+def classify_job_category(text):
+    return get_classifier().classify(text)
@@ -0,0 +1,212 @@
+###### Resume text compaction ######
+# Runs between text extraction and prompt construction. Extracted PDF text is
+# full of layout whitespace, page-break artifacts and headers/footers repeated
+# on every page, and all of it used to be pasted into every prompt. Compaction
+# normalizes the text, drops the repeated boilerplate and, if the resume is still
+# over the token budget, trims it section by section, keeping the sections the
+# analysis depends on most.
+import math
+import os
+import re
+
+RESUME_TOKEN_BUDGET = int(os.getenv('RESUME_TOKEN_BUDGET', 3000))
+TRUNCATION_MARKER = "[...]"
+
+# Section headings and their priority when the budget forces trimming (lower is kept first).
+# Text before the first heading (name, contact details) is "header" and always kept first.
+SECTION_PRIORITIES = {
+    "header": 0,
+    "experience": 1,
+    "skills": 2,
+    "education": 3,
+    "projects": 4,
+    "summary": 5,
+    "certifications": 6,
+    "achievements": 7,
+    "publications": 8,
+    "languages": 9,
+    "volunteering": 10,
+    "interests": 11,
+    "references": 12,
+}
+SECTION_HEADINGS = {
+    "experience": ("experience", "work experience", "professional experience", "employment history",
+                   "work history", "internships", "internship", "employment"),
+    "skills": ("skills", "technical skills", "key skills", "core competencies", "competencies", "technologies",
+               "tools", "skills & tools", "skills and tools"),
+    "education": ("education", "academic background", "qualifications", "academic qualifications"),
+    "projects": ("projects", "personal projects", "academic projects", "key projects"),
+    "summary": ("summary", "professional summary", "profile", "about me", "objective", "career objective"),
+    "certifications": ("certifications", "certificates", "licenses", "courses", "training"),
+    "achievements": ("achievements", "awards", "honors", "honours", "accomplishments"),
+    "publications": ("publications", "research", "papers"),
+    "languages": ("languages",),
+    "volunteering": ("volunteering", "volunteer experience", "extracurricular activities", "activities", "leadership"),
+    "interests": ("interests", "hobbies", "hobbies and interests", "personal interests"),
+    "references": ("references", "referees"),
+}
+_HEADING_TO_SECTION = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Explicit page numbers: "Page 2", "Page 2 of 3", "2 of 3", "- 2 -", "(2)"
+_PAGE_NUMBER_PATTERN = re.compile(r"^(page\s*\d{1,3}(\s*of\s*\d{1,3})?|\d{1,3}\s*of\s*\d{1,3}|[-–]\s*\d{1,3}\s*[-–]|\(\s*\d{1,3}\s*\))$",
+                                  re.IGNORECASE)
+_BARE_NUMBER_PATTERN = re.compile(r"^\d{1,3}$")
+
+
+def estimate_tokens(text):
+    """
+    Local estimate of the LLM token count, without the model's tokenizer.
+    BPE vocabularies keep common short words whole and split long ones into pieces of
+    about four characters; every punctuation mark is its own token.
+    """
+    return sum(max(1, math.ceil(len(word) / 4)) for word in _WORD_PATTERN.findall(text))
+
+def _boilerplate_key(line):
+    """
+    Lines that differ only in digits (dates in a running header) are the same header/footer.
+    Lines without letters (phone numbers, years) only match themselves.
+    """
+    line = line.strip().lower()
+    return re.sub(r"\d+", "#", line) if re.search(r"[^\W\d_]", line) else line
+
+def _page_number_offsets(page_edges, min_repeats):
+    """
+    Offsets (number - page index) of bare numbers used as page numbers: the printed number
+    matches the 1-based page index, or keeps the same offset from it on `min_repeats` pages.
+    """
+    counts = {}
+    for index, edges in enumerate(page_edges):
+        offsets = {int(line.strip()) - index for line in edges if _BARE_NUMBER_PATTERN.match(line.strip())}
+        for offset in offsets:
+            counts[offset] = counts.get(offset, 0) + 1
+    return {1} | {offset for offset, count in counts.items() if count >= min_repeats}
+
+def drop_repeated_boilerplate(pages, edge_lines=3):
+    """
+    Remove page numbers and header/footer lines: lines among the first or last `edge_lines`
+    of a page that repeat on at least half of the pages (and on at least two), except for
+    their first occurrence. Bare numbers are dropped only when they follow the page index.
+    `pages` is a list of page texts; returns the cleaned pages and the number of lines dropped.
+    """
+    page_lines = [page.split('\n') for page in pages]
+    page_edges = []
+    for lines in page_lines:
+        content = [line for line in lines if line.strip()]
+        page_edges.append(content[:edge_lines] + content[-edge_lines:])
+    counts = {}
+    for edges in page_edges:
+        for key in {_boilerplate_key(line) for line in edges}:
+            counts[key] = counts.get(key, 0) + 1
+    min_repeats = max(2, math.ceil(len(pages) / 2))
+    repeated = {key for key, count in counts.items() if count >= min_repeats}
+    page_number_offsets = _page_number_offsets(page_edges, min_repeats)
+
+    cleaned, dropped, seen = [], 0, set()
+    for index, lines in enumerate(page_lines):
+        content_indexes = [i for i, line in enumerate(lines) if line.strip()]
+        edge_indexes = set(content_indexes[:edge_lines] + content_indexes[-edge_lines:])
+        kept = []
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped and i in edge_indexes:
+                key = _boilerplate_key(line)
+                # A bare number (a year, a count) is only a page number if it tracks the page index
+                is_page_number = _PAGE_NUMBER_PATTERN.match(stripped) or (
+                    _BARE_NUMBER_PATTERN.match(stripped) and int(stripped) - index in page_number_offsets)
+                # The first occurrence stays: a name repeated as a page header is still the name
+                if is_page_number or (key in repeated and key in seen):
+                    dropped += 1
+                    continue
+                seen.add(key)
+            kept.append(line)
+        cleaned.append('\n'.join(kept))
+    return cleaned, dropped
+
+def normalize_whitespace(text):
+    """Collapse layout whitespace and undo the artifacts of PDF text extraction."""
+    text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\u00a0', ' ')
+    text = re.sub(r"\(cid:\d+\)", "", text)          # Glyphs pdfminer could not map
+    text = re.sub("[\u200b\u200c\u200d\ufeff]", "", text)  # Zero-width characters
+    text = re.sub("[\u2022\u25cf\u25aa\u25a0\u25e6\u2023\u2219\u00b7]", "-", text)  # One bullet style
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)      # Words hyphenated across lines
+    text = re.sub(r"[ \t\f\v]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+def _section_of(line):
+    """Section name if `line` is a heading ("EXPERIENCE", "Technical Skills:"), else None."""
+    heading = re.sub(r"[^a-z& ]", "", line.strip().lower()).strip()
+    if not heading or len(heading) > 40:
+        return None
+    return _HEADING_TO_SECTION.get(heading)
+
+def split_sections(text):
+    """[(section name, text)] in document order; the part before the first heading is "header"."""
+    sections = [["header", []]]
+    for line in text.split('\n'):
+        section = _section_of(line)
+        if section:
+            sections.append([section, [line]])
+        else:
+            sections[-1][1].append(line)
+    return [(name, '\n'.join(lines).strip()) for name, lines in sections if '\n'.join(lines).strip()]
+
+def _truncate_to_tokens(text, budget):
+    """Longest prefix of whole lines within `budget` tokens, marked as truncated."""
+    kept, used = [], estimate_tokens(TRUNCATION_MARKER)
+    for line in text.split('\n'):
+        tokens = estimate_tokens(line)
+        if used + tokens > budget:
+            break
+        kept.append(line)
+        used += tokens
+    return '\n'.join(kept + [TRUNCATION_MARKER]) if kept else ""
+
+def truncate_sections(text, budget):
+    """
+    Fit `text` into `budget` tokens. Sections are granted budget in priority order, so
+    low-value sections (interests, references) are trimmed or dropped before experience
+    and skills are touched; the kept text stays in document order.
+    Returns the text and the names of the sections that were trimmed or dropped.
+    """
+    sections = split_sections(text)
+    sizes = [estimate_tokens(section_text) for _, section_text in sections]
+    order = sorted(range(len(sections)), key=lambda i: (SECTION_PRIORITIES.get(sections[i][0], len(SECTION_PRIORITIES)), i))
+    kept = [None] * len(sections)
+    remaining = budget
+    for i in order:
+        if sizes[i] <= remaining:
+            kept[i] = sections[i][1]
+            remaining -= sizes[i]
+        else:
+            kept[i] = _truncate_to_tokens(sections[i][1], remaining)
+            remaining -= estimate_tokens(kept[i])
+    # A section name can head several sections; report it once, in document order
+    trimmed = list(dict.fromkeys(sections[i][0] for i in range(len(sections)) if kept[i] != sections[i][1]))
+    return '\n\n'.join(part for part in kept if part), trimmed
+
+def compact_resume_text(text, budget=None):
+    """
+    Normalize, de-boilerplate and budget the extracted resume text.
+    Returns {"text", "tokens_before", "tokens_after", "boilerplate_lines", "trimmed_sections"}.
+    """
+    budget = RESUME_TOKEN_BUDGET if budget is None else budget
+    tokens_before = estimate_tokens(text)
+    # Page breaks ("\f" from the PDF reader) delimit the pages that headers/footers repeat on
+    pages = [page for page in text.split('\f') if page.strip()]
+    boilerplate_lines = 0
+    if len(pages) > 1:
+        pages, boilerplate_lines = drop_repeated_boilerplate(pages)
+    compacted = normalize_whitespace('\n'.join(pages))
+    trimmed_sections = []
+    if budget and estimate_tokens(compacted) > budget:
+        compacted, trimmed_sections = truncate_sections(compacted, budget)
+    return {
+        "text": compacted,
+        "tokens_before": tokens_before,
+        "tokens_after": estimate_tokens(compacted),
+        "boilerplate_lines": boilerplate_lines,
+        "trimmed_sections": trimmed_sections,
+    }
@@ -1,57 +1,116 @@
-ds_course = [['Machine Learning Crash Course by Google [Free]', 'https://developers.google.com/machine-learning/crash-course'],
-             ['Machine Learning A-Z by Udemy','https://www.udemy.com/course/machinelearning/'],
-             ['Machine Learning by Andrew NG','https://www.coursera.org/learn/machine-learning'],
-             ['Data Scientist Master Program of Simplilearn (IBM)','https://www.simplilearn.com/big-data-and-analytics/senior-data-scientist-masters-program-training'],
-             ['Data Science Foundations: Fundamentals by LinkedIn','https://www.linkedin.com/learning/data-science-foundations-fundamentals-5'],
-             ['Data Scientist with Python','https://www.datacamp.com/tracks/data-scientist-with-python'],
-             ['Programming for Data Science with Python','https://www.udacity.com/course/programming-for-data-science-nanodegree--nd104'],
-             ['Programming for Data Science with R','https://www.udacity.com/course/programming-for-data-science-nanodegree-with-R--nd118'],
-             ['Introduction to Data Science','https://www.udacity.com/course/introduction-to-data-science--cd0017'],
-             ['Intro to Machine Learning with TensorFlow','https://www.udacity.com/course/intro-to-machine-learning-with-tensorflow-nanodegree--nd230']]
+###### Course catalog and skill-gap ranking ######
+# Courses live in a JSONL catalog (COURSE_CATALOG, default courses.jsonl next to
+# this file), one {"title", "url", "skills", "categories"} object per line. The
+# catalog is loaded once into an inverted index from skill to course, so ranking
+# only touches the courses that teach a missing skill, however large the catalog.
+# Courses are ranked by how much of the gap between the candidate's skills and the
+# category's recommended skills they cover; the result is deterministic and cached.
+import heapq
+import json
+import os
+import threading
+from functools import lru_cache
 
-web_course = [['Django Crash course [Free]','https://youtu.be/e1IyzVyrLSU'],
-              ['Python and Django Full Stack Web Developer Bootcamp','https://www.udemy.com/course/python-and-django-full-stack-web-developer-bootcamp'],
-              ['React Crash Course [Free]','https://youtu.be/Dorf8i6lCuk'],
-              ['ReactJS Project Development Training','https://www.dotnettricks.com/training/masters-program/reactjs-certification-training'],
-              ['Full Stack Web Developer - MEAN Stack','https://www.simplilearn.com/full-stack-web-developer-mean-stack-certification-training'],
-              ['Node.js and Express.js [Free]','https://youtu.be/Oe421EPjeBE'],
-              ['Flask: Develop Web Applications in Python','https://www.educative.io/courses/flask-develop-web-applications-in-python'],
-              ['Full Stack Web Developer by Udacity','https://www.udacity.com/course/full-stack-web-developer-nanodegree--nd0044'],
-              ['Front End Web Developer by Udacity','https://www.udacity.com/course/front-end-web-developer-nanodegree--nd0011'],
-              ['Become a React Developer by Udacity','https://www.udacity.com/course/react-nanodegree--nd019']]
+import telemetry
+from skills import canonical_skill, category_skills
 
-android_course = [['Android Development for Beginners [Free]','https://youtu.be/fis26HvvDII'],
-                  ['Android App Development Specialization','https://www.coursera.org/specializations/android-app-development'],
-                  ['Associate Android Developer Certification','https://grow.google/androiddev/#?modal_active=none'],
-                  ['Become an Android Kotlin Developer by Udacity','https://www.udacity.com/course/android-kotlin-developer-nanodegree--nd940'],
-                  ['Android Basics by Google','https://www.udacity.com/course/android-basics-nanodegree-by-google--nd803'],
-                  ['The Complete Android Developer Course','https://www.udemy.com/course/complete-android-n-developer-course/'],
-                  ['Building an Android App with Architecture Components','https://www.linkedin.com/learning/building-an-android-app-with-architecture-components'],
-                  ['Android App Development Masterclass using Kotlin','https://www.udemy.com/course/android-oreo-kotlin-app-masterclass/'],
-                  ['Flutter & Dart - The Complete Flutter App Development Course','https://www.udemy.com/course/flutter-dart-the-complete-flutter-app-development-course/'],
-                  ['Flutter App Development Course [Free]','https://youtu.be/rZLR5olMR64']]
+COURSE_CATALOG_PATH = os.getenv('COURSE_CATALOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'courses.jsonl'))
+MAX_COURSE_RECOMMENDATIONS = 10
 
-ios_course = [['IOS App Development by LinkedIn','https://www.linkedin.com/learning/subscription/topics/ios'],
-              ['iOS & Swift - The Complete iOS App Development Bootcamp','https://www.udemy.com/course/ios-13-app-development-bootcamp/'],
-              ['Become an iOS Developer','https://www.udacity.com/course/ios-developer-nanodegree--nd003'],
-              ['iOS App Development with Swift Specialization','https://www.coursera.org/specializations/app-development'],
-              ['Mobile App Development with Swift','https://www.edx.org/professional-certificate/curtinx-mobile-app-development-with-swift'],
-              ['Swift Course by LinkedIn','https://www.linkedin.com/learning/subscription/topics/swift-2'],
-              ['Objective-C Crash Course for Swift Developers','https://www.udemy.com/course/objectivec/'],
-              ['Learn Swift by Codecademy','https://www.codecademy.com/learn/learn-swift'],
-              ['Swift Tutorial - Full Course for Beginners [Free]','https://youtu.be/comQ1-x2a1Q'],
-              ['Learn Swift Fast - [Free]','https://youtu.be/FcsY1YPBwzQ']]
 
-uiux_course = [['Google UX Design Professional Certificate','https://www.coursera.org/professional-certificates/google-ux-design'],
-               ['UI / UX Design Specialization','https://www.coursera.org/specializations/ui-ux-design'],
-               ['The Complete App Design Course - UX, UI and Design Thinking','https://www.udemy.com/course/the-complete-app-design-course-ux-and-ui-design/'],
-               ['UX & Web Design Master Course: Strategy, Design, Development','https://www.udemy.com/course/ux-web-design-master-course-strategy-design-development/'],
-               ['The Complete App Design Course - UX, UI and Design Thinking','https://www.udemy.com/course/the-complete-app-design-course-ux-and-ui-design/'],
-               ['DESIGN RULES: Principles + Practices for Great UI Design','https://www.udemy.com/course/design-rules/'],
-               ['Become a UX Designer by Udacity','https://www.udacity.com/course/ux-designer-nanodegree--nd578'],
-               ['Adobe XD Tutorial: User Experience Design Course [Free]','https://youtu.be/68w2VwalD5w'],
-               ['Adobe XD for Beginners [Free]','https://youtu.be/WEljsc2jorI'],
-               ['Adobe XD in Simple Way','https://learnux.io/course/adobe-xd']]
+class CourseCatalog:
+    """
+    Courses with an inverted index skill -> courses and category -> courses.
+    Skills are matched by canonical name, case-insensitively, so catalogs may use aliases.
+    """
+    def __init__(self, courses):
+        self.courses = []
+        self._by_skill = {}
+        self._by_category = {}
+        seen = set()
+        for course in courses:
+            if course["url"] in seen:
+                continue  # The same course listed twice would take two recommendation slots
+            seen.add(course["url"])
+            index = len(self.courses)
+            skills = list(dict.fromkeys(canonical_skill(skill) for skill in course.get("skills", [])))
+            self.courses.append({"title": course["title"], "url": course["url"], "skills": skills})
+            for skill in skills:
+                self._by_skill.setdefault(skill.lower(), []).append(index)
+            for category in course.get("categories", []):
+                self._by_category.setdefault(category, []).append(index)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.loads(line) for line in f if line.strip())
+
+    def __len__(self):
+        return len(self.courses)
+
+    def rank(self, gap_skills, job_category=None, limit=MAX_COURSE_RECOMMENDATIONS):
+        """
+        Up to `limit` courses, greedily picked to cover the most still-uncovered gap skills;
+        ties go to courses of `job_category`, then to broader coverage, then to catalog order.
+        Once every coverable gap skill is covered, the remaining slots go to courses of the
+        category, then to the other courses teaching a gap skill.
+        Returns [{"title", "url", "covers"}], "covers" being the gap skills the course teaches.
+        """
+        gap = {skill.lower(): skill for skill in gap_skills}
+        in_category = set(self._by_category.get(job_category, ()))
+        covers = {}
+        for key in gap:
+            for index in self._by_skill.get(key, ()):
+                covers.setdefault(index, set()).add(key)
+        # Lazy greedy set cover: a course's gain only shrinks as skills get covered, so a
+        # popped entry whose gain is still current beats every other entry in the heap
+        def priority(index, gain):
+            return (-gain, index not in in_category, -len(covers[index]), index)
+        heap = [priority(index, len(skills)) for index, skills in covers.items()]
+        heapq.heapify(heap)
+        ranked, uncovered = [], set(gap)
+        while heap and len(ranked) < limit:
+            entry = heapq.heappop(heap)
+            index = entry[-1]
+            gain = len(covers[index] & uncovered)
+            if gain < -entry[0]:
+                heapq.heappush(heap, priority(index, gain))
+                continue
+            if not gain:
+                break
+            ranked.append(index)
+            uncovered -= covers[index]
+        rest = (set(covers) | in_category) - set(ranked)
+        ranked += sorted(rest, key=lambda index: (index not in in_category, -len(covers.get(index, ())), index))[:limit - len(ranked)]
+        return [{"title": self.courses[index]["title"], "url": self.courses[index]["url"],
+                 "covers": [skill for skill in self.courses[index]["skills"] if skill.lower() in gap]}
+                for index in ranked]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_course_catalog():
+    """Process-wide catalog, loaded from COURSE_CATALOG on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = CourseCatalog.load(COURSE_CATALOG_PATH)
+            telemetry.event("course_catalog_loaded", courses=len(_catalog), path=COURSE_CATALOG_PATH)
+        return _catalog
+
+def skill_gap(job_category, candidate_skills):
+    """The category's recommended skills the candidate does not list, in recommendation order."""
+    have = {canonical_skill(skill).lower() for skill in candidate_skills}
+    return [skill for skill in category_skills(job_category) if skill.lower() not in have]
+
+@lru_cache(maxsize=1024)
+def _recommend_courses(job_category, candidate_skills, limit):
+    return get_course_catalog().rank(skill_gap(job_category, candidate_skills), job_category, limit)
+
+def recommend_courses(job_category, candidate_skills, limit=MAX_COURSE_RECOMMENDATIONS):
+    """Courses for the candidate's skill gap in `job_category`; the same inputs always give the same list."""
+    return [dict(course) for course in _recommend_courses(job_category, tuple(sorted(set(candidate_skills))), limit)]
 
 resume_videos = [ 'https://youtu.be/Tt08KmFfIYQ','https://youtu.be/y8YH0Qbu5h4',
                   'https://youtu.be/u75hUSShvnc','https://youtu.be/BYUy1yvjHxE',
@@ -0,0 +1,383 @@
+###### Job posting index ######
+# Matches a resume against a corpus of job postings. Every posting is stored as an
+# L2-normalized hashed TF-IDF-style vector in a memory-mapped float32 matrix, so
+# opening the index re-vectorizes nothing and the OS pages vectors in as queries
+# touch them. A query is one matrix product per block of postings with a running top-k,
+# and a batch of resumes shares each block. Postings are added and deleted in
+# place; an append-only JSONL log records the posting metadata and deletions.
+#
+#   python job_index.py add postings.jsonl     # {"id", "title", "description", ...} per line
+#   python job_index.py delete ID [ID ...]
+#   python job_index.py compact
+#   python job_index.py search resume.txt --k 10
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from classifier import tokenize
+from skills import extract_skills
+
+JOB_INDEX_DIR = os.getenv('JOB_INDEX_DIR', 'job_index')
+JOB_INDEX_DIM = int(os.getenv('JOB_INDEX_DIM', 256))
+# Skills are matched separately and weigh more than the same words in running text
+JOB_INDEX_SKILL_WEIGHT = float(os.getenv('JOB_INDEX_SKILL_WEIGHT', 2.0))
+# Postings scored per matrix product; bounds the temporary score matrix
+SEARCH_BLOCK_ROWS = int(os.getenv('JOB_INDEX_BLOCK_ROWS', 65536))
+MIN_CAPACITY = 1024
+
+VECTORS_FILE = "vectors.npy"
+LOG_FILE = "postings.jsonl"
+META_FILE = "meta.json"
+SNAPSHOT_FILE = "snapshot.json"
+# Posting fields kept in the log; the description is only needed to build the vector
+STORED_FIELDS = ("id", "title", "company", "location", "url", "job_category")
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature(term, dim):
+    """Column and sign of a term. crc32 rather than hash(), which changes between processes."""
+    digest = zlib.crc32(term.encode('utf-8'))
+    return digest % dim, 1.0 if digest & 0x80000000 else -1.0
+
+def vectorize(text, skills=(), dim=None):
+    """
+    Hashed sublinear-TF vector of the text's words plus its skills, L2-normalized float32.
+    Signed hashing keeps the collisions of unrelated terms from adding up.
+    """
+    dim = dim or JOB_INDEX_DIM
+    vector = np.zeros(dim, dtype=np.float32)
+    features = [(term, 1 + math.log(count)) for term, count in Counter(tokenize(text)).items()]
+    features += [("skill:" + skill.lower(), JOB_INDEX_SKILL_WEIGHT) for skill in set(skills)]
+    for term, weight in features:
+        column, sign = _feature(term, dim)
+        vector[column] += sign * weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def posting_text(posting):
+    return '\n'.join(str(posting.get(key) or '') for key in ("title", "description"))
+
+def vectorize_posting(posting, dim=None):
+    """Posting vector; skills come from a "skills" list or are matched in the text."""
+    text = posting_text(posting)
+    skills = posting.get("skills") or extract_skills(text)
+    return vectorize(text, skills, dim)
+
+
+class JobIndex:
+    """
+    Top-k cosine search over job postings, persisted in `path`.
+    vectors.npy holds one row per added posting (deleted rows stay until compact());
+    postings.jsonl replays into the id -> row map on open, starting from the snapshot of
+    that map written by close() so only the records appended since are parsed. Rows are
+    written before their log line, so a crash between the two leaves an unused row, never
+    a missing vector.
+    """
+    def __init__(self, path=None, dim=None):
+        self.path = path or JOB_INDEX_DIR
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        meta_path = os.path.join(self.path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.dim = json.load(f)["dim"]
+            if dim and dim != self.dim:
+                raise ValueError(f"Index in {self.path} has {self.dim} dimensions, not {dim}")
+        else:
+            self.dim = dim or JOB_INDEX_DIM
+            with open(meta_path, 'w') as f:
+                json.dump({"dim": self.dim}, f)
+        self._vectors = self._open_vectors()
+        self._replay_log()
+        self._log = open(self._file(LOG_FILE), 'a+b')
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open_vectors(self, capacity=MIN_CAPACITY):
+        vectors_path = self._file(VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            return np.load(vectors_path, mmap_mode='r+')
+        return np.lib.format.open_memmap(vectors_path, mode='w+', dtype=np.float32, shape=(capacity, self.dim))
+
+    def _load_snapshot(self, log_size):
+        """Log offset the snapshot covers; 0 (and an empty map) without a usable snapshot."""
+        try:
+            with open(self._file(SNAPSHOT_FILE)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if snapshot["log_offset"] > log_size:
+            return 0  # The log was replaced after the snapshot was taken
+        self._row_ids = snapshot["row_ids"]
+        self._offsets = snapshot["offsets"]
+        deleted = set(snapshot["deleted_rows"])
+        self._ids = {posting_id: row for row, posting_id in enumerate(self._row_ids) if row not in deleted}
+        return snapshot["log_offset"]
+
+    def _replay_log(self):
+        self._ids = {}
+        self._row_ids = []
+        self._offsets = []
+        log_path = self._file(LOG_FILE)
+        if not os.path.exists(log_path):
+            self._live = np.zeros(len(self._vectors), dtype=bool)
+            return
+        offset = self._load_snapshot(os.path.getsize(log_path))
+        with open(log_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # A crash mid-write can leave a truncated last line
+                if record["op"] == "add":
+                    self._ids[record["id"]] = len(self._row_ids)
+                    self._row_ids.append(record["id"])
+                    self._offsets.append(offset)
+                elif record["op"] == "delete":
+                    self._ids.pop(record["id"], None)
+                offset += len(line)
+        self._live = np.zeros(len(self._vectors), dtype=bool)
+        self._live[list(self._ids.values())] = True
+
+    @property
+    def rows(self):
+        """Rows in use, deleted postings included."""
+        return len(self._row_ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, posting_id):
+        return posting_id in self._ids
+
+    def _grow(self, needed):
+        # Double the file so that a stream of adds copies each vector O(1) times
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown_path = self._file(VECTORS_FILE + ".tmp")
+        grown = np.lib.format.open_memmap(grown_path, mode='w+', dtype=np.float32, shape=(capacity, self.dim))
+        grown[:self.rows] = self._vectors[:self.rows]
+        grown.flush()
+        del grown
+        self._vectors.flush()
+        self._vectors = None
+        os.replace(grown_path, self._file(VECTORS_FILE))
+        self._vectors = self._open_vectors()
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self._live)] = self._live
+        self._live = live
+
+    def _append_log(self, records):
+        self._log.seek(0, os.SEEK_END)
+        offset = self._log.tell()
+        offsets = []
+        lines = []
+        for record in records:
+            line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+            offsets.append(offset)
+            offset += len(line)
+            lines.append(line)
+        self._log.write(b''.join(lines))
+        self._log.flush()
+        return offsets
+
+    def add(self, postings, vectors=None):
+        """
+        Add (or replace, by "id") postings. Without `vectors` each posting is vectorized
+        from its title, description and skills.
+        """
+        postings = list(postings)
+        if vectors is None:
+            vectors = [vectorize_posting(posting, self.dim) for posting in postings]
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(postings), self.dim)
+        with self._lock:
+            replaced = [posting["id"] for posting in postings if posting["id"] in self._ids]
+            if replaced:
+                self._delete_locked(replaced)
+            start = self.rows
+            self._grow(start + len(postings))
+            self._vectors[start:start + len(postings)] = vectors
+            self._vectors.flush()
+            records = [dict({key: posting[key] for key in STORED_FIELDS if key in posting}, op="add") for posting in postings]
+            self._offsets.extend(self._append_log(records))
+            for row, posting in enumerate(postings, start):
+                self._ids[posting["id"]] = row
+                self._row_ids.append(posting["id"])
+            self._live[start:start + len(postings)] = True
+
+    def delete(self, posting_ids):
+        """Delete postings by id; unknown ids are ignored. Returns the number deleted."""
+        with self._lock:
+            return self._delete_locked(posting_ids)
+
+    def _delete_locked(self, posting_ids):
+        posting_ids = [posting_id for posting_id in posting_ids if posting_id in self._ids]
+        if posting_ids:
+            self._append_log([{"op": "delete", "id": posting_id} for posting_id in posting_ids])
+            for posting_id in posting_ids:
+                self._live[self._ids.pop(posting_id)] = False
+        return len(posting_ids)
+
+    def posting(self, row):
+        """Stored posting fields of a row, read back from the log."""
+        line = os.pread(self._log.fileno(), 1 << 16, self._offsets[row]).split(b'\n', 1)[0]
+        record = json.loads(line)
+        del record["op"]
+        return record
+
+    def search(self, query_vectors, k=10):
+        """
+        Top `k` postings for each query vector (one vector or a matrix of them).
+        Returns one list of (cosine similarity, posting) per query, best first.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        with self._lock:
+            rows = self.rows
+            best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            for start in range(0, rows, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, rows)
+                scores = queries @ self._vectors[start:end].T
+                scores[:, ~self._live[start:end]] = -np.inf
+                # Keep the block's top k, then merge them with the running top k
+                if end - start > k:
+                    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                    scores = np.take_along_axis(scores, top, axis=1)
+                else:
+                    top = np.broadcast_to(np.arange(end - start), scores.shape)
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, top + start], axis=1)
+                if best_scores.shape[1] > k:
+                    keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+            results = []
+            for scores, query_rows in zip(best_scores, best_rows):
+                order = np.argsort(-scores)
+                results.append([(round(float(scores[i]), 4), self.posting(query_rows[i]))
+                                for i in order if scores[i] > -np.inf])
+            return results
+
+    def compact(self):
+        """Rewrite the vectors and the log without deleted rows."""
+        with self._lock:
+            live_rows = sorted(self._ids.values())
+            postings = [self.posting(row) for row in live_rows]
+            capacity = max(MIN_CAPACITY, len(live_rows))
+            compacted_path = self._file(VECTORS_FILE + ".tmp")
+            compacted = np.lib.format.open_memmap(compacted_path, mode='w+', dtype=np.float32, shape=(capacity, self.dim))
+            for start in range(0, len(live_rows), SEARCH_BLOCK_ROWS):
+                block = live_rows[start:start + SEARCH_BLOCK_ROWS]
+                compacted[start:start + len(block)] = self._vectors[block]
+            compacted.flush()
+            del compacted
+            log_path = self._file(LOG_FILE + ".tmp")
+            with open(log_path, 'wb') as f:
+                for posting in postings:
+                    f.write((json.dumps(dict(posting, op="add"), ensure_ascii=False) + '\n').encode('utf-8'))
+            self._vectors = None
+            self._log.close()
+            # The old snapshot describes the old log
+            if os.path.exists(self._file(SNAPSHOT_FILE)):
+                os.remove(self._file(SNAPSHOT_FILE))
+            os.replace(compacted_path, self._file(VECTORS_FILE))
+            os.replace(log_path, self._file(LOG_FILE))
+            self._vectors = self._open_vectors()
+            self._replay_log()
+            self._log = open(self._file(LOG_FILE), 'a+b')
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        live = set(self._ids.values())
+        snapshot = {
+            "log_offset": os.path.getsize(self._file(LOG_FILE)),
+            "row_ids": self._row_ids,
+            "offsets": self._offsets,
+            "deleted_rows": [row for row in range(self.rows) if row not in live],
+        }
+        snapshot_path = self._file(SNAPSHOT_FILE)
+        with open(snapshot_path + ".tmp", 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+    def close(self):
+        with self._lock:
+            self._vectors.flush()
+            self._log.close()
+            self._write_snapshot()
+
+
+def match_jobs(index, resume_text, skills=(), k=10):
+    """Top `k` postings for one resume."""
+    return index.search(vectorize(resume_text, skills, index.dim), k)[0]
+
+_job_index = None
+_job_index_lock = threading.Lock()
+
+def get_job_index():
+    """Process-wide index opened from JOB_INDEX_DIR, or None if no index was built there."""
+    global _job_index
+    with _job_index_lock:
+        if _job_index is None and os.path.exists(os.path.join(JOB_INDEX_DIR, META_FILE)):
+            _job_index = JobIndex(JOB_INDEX_DIR)
+        return _job_index
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build and query the job posting index.")
+    arg_parser.add_argument("--index", default=JOB_INDEX_DIR, help="Index directory")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="Add or replace postings from a JSONL file")
+    add_parser.add_argument("postings")
+    add_parser.add_argument("--batch-size", type=int, default=1000)
+    delete_parser = commands.add_parser("delete", help="Delete postings by id")
+    delete_parser.add_argument("ids", nargs="+")
+    commands.add_parser("compact", help="Drop deleted postings from disk")
+    search_parser = commands.add_parser("search", help="Match a resume text file")
+    search_parser.add_argument("resume")
+    search_parser.add_argument("--k", type=int, default=10)
+    args = arg_parser.parse_args(argv)
+
+    index = JobIndex(args.index)
+    if args.command == "add":
+        batch = []
+        with open(args.postings, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= args.batch_size:
+                    index.add(batch)
+                    batch = []
+        if batch:
+            index.add(batch)
+        print(f"{len(index)} postings in {args.index}")
+    elif args.command == "delete":
+        print(f"Deleted {index.delete(args.ids)} postings")
+    elif args.command == "compact":
+        rows = index.rows
+        index.compact()
+        print(f"Compacted {rows} rows to {index.rows}")
+    elif args.command == "search":
+        with open(args.resume, encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+        for score, posting in match_jobs(index, text, extract_skills(text), args.k):
+            print(f"{score:.3f}  {posting.get('title', '')} ({posting['id']})")
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
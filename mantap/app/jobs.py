@@ -0,0 +1,244 @@
+###### Background analysis jobs ######
+# Parsing and LLM work for an upload runs on a process-wide pool of worker threads
+# instead of the Streamlit script thread. A job is keyed by the upload hash and
+# analysis mode: a rerun (or a second tab) submitting the same upload attaches to
+# the job already queued, running or recently finished, and replays its events
+# from the start rather than starting the work again. Reruns only restart the
+# polling loop.
+import collections
+import io
+import os
+import threading
+import time
+import uuid
+
+import telemetry
+from admission import PRIORITY_INTERACTIVE, request_class
+from analysis import build_analysis_stages, is_cacheable
+from pipeline import run_pipeline_sync
+from resume_reader import ResumeParser
+from store import analysis_row, get_store
+
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 4))
+# Jobs waiting beyond this are refused rather than queued
+ANALYSIS_QUEUE_SIZE = int(os.getenv('ANALYSIS_QUEUE_SIZE', 32))
+# Finished jobs stay attachable this long, so a rerun shows the results again without any work
+ANALYSIS_JOB_RETENTION = float(os.getenv('ANALYSIS_JOB_RETENTION', 900))
+WAIT_SAMPLES = 512
+# Longest a reader blocks in poll() before checking back (e.g. for a Streamlit rerun)
+JOB_POLL_S = 0.25
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Event kinds of an analysis job
+EVENT_EXTRACTED = "extracted"
+EVENT_STAGE_PROGRESS = "stage_progress"
+EVENT_STAGE_DONE = "stage_done"
+
+
+class AnalysisJob:
+    """
+    One submitted analysis. `work(job)` runs on a worker and reports through `emit()`;
+    readers follow the event list with `poll()`, each from its own cursor.
+    """
+    def __init__(self, key, work):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = JOB_QUEUED
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._work = work
+        self._events = []
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def emit(self, kind, payload):
+        with self._changed:
+            self._events.append((kind, payload))
+            self._changed.notify_all()
+
+    def poll(self, cursor=0, timeout=None):
+        """
+        (events after `cursor`, new cursor, finished). Waits up to `timeout` seconds when
+        there is nothing new; once finished is True no more events follow.
+        """
+        with self._changed:
+            if timeout and len(self._events) <= cursor and not self.finished:
+                self._changed.wait(timeout)
+            events = self._events[cursor:]
+            return events, cursor + len(events), self.finished
+
+    def _set_status(self, status, error=None):
+        with self._changed:
+            self.status = status
+            if status == JOB_RUNNING:
+                self.started_at = time.time()
+            else:
+                self.error = error
+                self.finished_at = time.time()
+                self._work = None  # Let go of the upload bytes
+            self._changed.notify_all()
+
+
+class JobQueue:
+    """
+    FIFO queue drained by `workers` daemon threads, holding at most `max_queued` waiting
+    jobs. Queue depth, wait times and worker utilization are kept for stats() and
+    exported through telemetry.
+    """
+    def __init__(self, workers=ANALYSIS_WORKERS, max_queued=ANALYSIS_QUEUE_SIZE, retention_s=ANALYSIS_JOB_RETENTION):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention_s = retention_s
+        self._queue = collections.deque()
+        self._jobs = {}
+        self._running = {}
+        self._busy_s = 0.0
+        self._started = time.perf_counter()
+        self._waits = collections.deque(maxlen=WAIT_SAMPLES)
+        self._counts = {"submitted": 0, "attached": 0, "rejected": 0, "done": 0, "failed": 0}
+        self._lock = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"analysis-worker-{i}", daemon=True).start()
+
+    def submit(self, key, make_work):
+        """
+        The job for `key`: the one queued, running or finished within the retention time
+        if there is one (a failed job is retried), else a new job that runs `make_work()(job)`.
+        None when the queue is full. `make_work` is only called for a new job, so attaching
+        to an existing one costs nothing.
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            if job is not None and job.status != JOB_FAILED:
+                outcome = "attached"
+            elif len(self._queue) >= self.max_queued:
+                job, outcome = None, "rejected"
+            else:
+                job, outcome = AnalysisJob(key, make_work()), "submitted"
+                self._jobs[key] = job
+                self._queue.append(job)
+                self._lock.notify()
+            self._counts[outcome] += 1
+            depth = len(self._queue)
+        telemetry.count("jobs_total", outcome=outcome)
+        telemetry.gauge("job_queue_depth", depth)
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_s
+        for key in [key for key, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[key]
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._lock.wait()
+                job = self._queue.popleft()
+                start_time = time.perf_counter()
+                self._running[job.id] = start_time
+                self._waits.append(time.time() - job.submitted_at)
+                depth, busy = len(self._queue), len(self._running)
+            telemetry.observe("job_wait_seconds", time.time() - job.submitted_at)
+            telemetry.gauge("job_queue_depth", depth)
+            telemetry.gauge("job_workers_busy", busy)
+            status, error = JOB_DONE, None
+            work = job._work
+            job._set_status(JOB_RUNNING)
+            try:
+                work(job)
+            except Exception as e:
+                status, error = JOB_FAILED, str(e)
+                telemetry.event("job_failed", key=job.key, error=f"{e.__class__.__name__}: {e}")
+            job._set_status(status, error)
+            with self._lock:
+                del self._running[job.id]
+                self._busy_s += time.perf_counter() - start_time
+                self._counts[status] += 1
+                busy = len(self._running)
+            telemetry.count("jobs_total", outcome=status)
+            telemetry.gauge("job_workers_busy", busy)
+
+    def stats(self):
+        """Queue depth, busy workers, utilization since start, queue wait percentiles and job counts."""
+        now = time.perf_counter()
+        with self._lock:
+            waits = sorted(self._waits)
+            busy_s = self._busy_s + sum(now - start for start in self._running.values())
+            stats = dict(self._counts, queued=len(self._queue), running=len(self._running), workers=self.workers)
+        stats["utilization"] = busy_s / (self.workers * (now - self._started)) if self.workers else 0.0
+        stats["wait_p50_s"] = waits[len(waits) // 2] if waits else 0.0
+        stats["wait_p95_s"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+        return stats
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Process-wide job queue shared by all sessions (ANALYSIS_WORKERS, ANALYSIS_QUEUE_SIZE)."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+    return _job_queue
+
+
+def analysis_work(upload_name, upload_bytes, mode, cache, resume_hash):
+    """
+    Job body for an upload: text extraction (cached by hash), then the analysis pipeline.
+    Emits EVENT_EXTRACTED {"has_text", "page_count", "truncated"}, then EVENT_STAGE_PROGRESS
+    (stage name, payload) and EVENT_STAGE_DONE StageResult as the pipeline runs. Stored
+    results of the same upload are loaded into the cache first; the new result is queued
+    for the analysis store.
+    """
+    def work(job):
+        start_time = time.perf_counter()
+        store = get_store()
+        # Interactive priority for the job's LLM calls, shared fairly with the other uploads
+        with telemetry.trace(resume_hash[:16]), request_class(PRIORITY_INTERACTIVE, resume_hash[:16]):
+            def extract_text():
+                upload = io.BytesIO(upload_bytes)
+                upload.name = upload_name
+                parser = ResumeParser(upload)
+                return {"resume_text": parser.resume_text, "page_count": parser.actual_num_pages,
+                        "truncated": parser.truncated}
+
+            extracted = cache.get_or_compute(
+                resume_hash, "text", extract_text,
+                should_cache=lambda result: bool(result["resume_text"])
+            )
+            job.emit(EVENT_EXTRACTED, {"has_text": bool(extracted["resume_text"]), "page_count": extracted["page_count"],
+                                       "truncated": extracted.get("truncated")})
+            if not extracted["resume_text"]:
+                return
+            if store is not None:
+                store.hydrate(cache, resume_hash, is_cacheable)
+            stages = build_analysis_stages(extracted["resume_text"], extracted["page_count"], mode=mode,
+                                           cache=cache, resume_hash=resume_hash)
+            results = run_pipeline_sync(stages, lambda result: job.emit(EVENT_STAGE_DONE, result),
+                                        lambda stage_name, payload: job.emit(EVENT_STAGE_PROGRESS, (stage_name, payload)))
+            if store is not None:
+                store.record(analysis_row(resume_hash, mode, results, file_name=upload_name, source="app",
+                                          elapsed_s=round(time.perf_counter() - start_time, 3)))
+    return work
+
+def submit_analysis(upload, mode, cache, resume_hash, job_queue=None):
+    """
+    Queue (or attach to) the analysis of an upload (a file object with `name`, such as
+    Streamlit's UploadedFile); None when the queue is full. The upload is only copied
+    when a new job is queued, not on every rerun that attaches.
+    """
+    job_queue = job_queue or get_job_queue()
+    return job_queue.submit(f"{resume_hash}:{mode}",
+                            lambda: analysis_work(upload.name, upload.getvalue(), mode, cache, resume_hash))
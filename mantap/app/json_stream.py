@@ -0,0 +1,106 @@
+###### Incremental JSON object parser ######
+# Lets the JSON stages surface fields such as job_category and resume_score as
+# soon as they are complete in a streamed LLM response, instead of waiting for
+# the whole object. Anything before the first '{' (e.g. a ```json fence) is ignored.
+import json
+
+_KEY, _COLON, _VALUE, _PRIMITIVE, _NESTED, _AFTER_VALUE, _DONE = range(7)
+
+
+class IncrementalJSONParser:
+    """
+    Feed text chunks of one JSON object; feed() returns the (key, value) pairs of the
+    top-level members completed by that chunk. All completed members are kept in `fields`.
+    """
+    def __init__(self):
+        self.fields = {}
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._state = _KEY
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._token_start = 0
+        self._key = None
+
+    @property
+    def done(self):
+        return self._state == _DONE
+
+    def _emit(self, raw, completed):
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return  # Malformed member; the final full-text parse decides what to do
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+
+    def feed(self, chunk):
+        completed = []
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self._state == _DONE:
+                break
+            c = text[i]
+            if not self._started:
+                if c == '{':
+                    self._started, self._depth, self._state = True, 1, _KEY
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == _KEY:
+                        self._key = json.loads(text[self._token_start:i + 1])
+                        self._state = _COLON
+                    elif self._depth == 1 and self._state == _VALUE:
+                        self._emit(text[self._token_start:i + 1], completed)
+                        self._state = _AFTER_VALUE
+                continue
+
+            if self._state == _KEY:
+                if c == '"':
+                    self._in_string, self._token_start = True, i
+                elif c == '}':
+                    self._state = _DONE
+            elif self._state == _COLON:
+                if c == ':':
+                    self._state = _VALUE
+            elif self._state == _VALUE:
+                if c.isspace():
+                    continue
+                self._token_start = i
+                if c == '"':
+                    self._in_string = True
+                elif c in '{[':
+                    self._depth += 1
+                    self._state = _NESTED
+                else:
+                    self._state = _PRIMITIVE
+            elif self._state == _PRIMITIVE:
+                if c in ',}':
+                    self._emit(text[self._token_start:i].strip(), completed)
+                    self._state = _KEY if c == ',' else _DONE
+            elif self._state == _NESTED:
+                if c == '"':
+                    self._in_string = True
+                elif c in '{[':
+                    self._depth += 1
+                elif c in '}]':
+                    self._depth -= 1
+                    if self._depth == 1:
+                        self._emit(text[self._token_start:i + 1], completed)
+                        self._state = _AFTER_VALUE
+            elif self._state == _AFTER_VALUE:
+                if c == ',':
+                    self._state = _KEY
+                elif c == '}':
+                    self._state = _DONE
+        self._pos = len(text)
+        return completed
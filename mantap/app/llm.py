@@ -0,0 +1,347 @@
+###### Alibaba Cloud LLM Functions ######
+# Shared by the Streamlit app and the async analysis pipeline. Nothing in here
+# calls st.*, so failures are logged to the console and surface in the UI
+# through each stage's fallback result.
+import asyncio
+import contextlib
+import os
+import time
+
+from dotenv import load_dotenv
+
+import telemetry
+from llm_client import get_llm_clients
+from llm_json import parse_json_object, parse_structured
+from memo import llm_memo, request_digest
+from usage import usage_tracker
+
+load_dotenv()
+
+# Alibaba Cloud API endpoints and configuration
+ALIBABA_API_KEY = os.getenv('API_KEY')
+# Overridable so the app can be pointed at a local stub (see stub_server.py)
+ALIBABA_BASE_URL = os.getenv('ALIBABA_BASE_URL', "https://dashscope-intl.aliyuncs.com/compatible-mode/v1")
+DEFAULT_MODEL = "qwen-max"
+# Model routing: LLM_MODEL_<STAGE> (e.g. LLM_MODEL_SUMMARY=qwen-plus) pins a stage to a
+# model, DEFAULT_MODEL otherwise. Stages in LLM_CASCADE_STAGES first run on LLM_CHEAP_MODEL
+# and escalate to their own model only when the cheap answer fails its checks (see
+# analysis.py). Repair requests ("<stage>_repair") follow the same rules.
+LLM_CHEAP_MODEL = os.getenv('LLM_CHEAP_MODEL', "qwen-turbo")
+CASCADE_STAGES = {stage.strip() for stage in os.getenv('LLM_CASCADE_STAGES', "summary,career_paths").split(',') if stage.strip()}
+# Ask for JSON-object output (response_format) on calls that expect JSON. If the endpoint
+# rejects it once, the process stops sending it.
+LLM_JSON_MODE = os.getenv('LLM_JSON_MODE', '1') != '0'
+_json_mode_supported = True
+# Longest previous response quoted back in a repair request
+REPAIR_RESPONSE_CHARS = 8000
+
+# Pooled keep-alive clients with timeouts and retry/backoff, shared by every session
+llm_clients = get_llm_clients(ALIBABA_API_KEY, ALIBABA_BASE_URL)
+
+# Optional cap on in-flight async LLM requests (see limit_async_llm_concurrency)
+_async_llm_slots = None
+
+def limit_async_llm_concurrency(max_in_flight):
+    """
+    Cap concurrent async LLM requests, e.g. for the batch analyzer. Must be called from
+    inside the event loop that will make the calls; None removes the cap.
+    """
+    global _async_llm_slots
+    _async_llm_slots = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+
+def _async_llm_slot():
+    return _async_llm_slots if _async_llm_slots is not None else contextlib.nullcontext()
+
+
+def _build_messages(prompt, system_prompt):
+    return [
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': prompt}
+    ]
+
+def stage_model(stage):
+    """The model a stage is pinned to (LLM_MODEL_<STAGE>, else DEFAULT_MODEL)."""
+    return os.getenv(f"LLM_MODEL_{stage.upper()}", DEFAULT_MODEL)
+
+def model_tiers(stage):
+    """Models to try for a stage, cheapest first; the last one is the stage's own model."""
+    model = stage_model(stage)
+    if stage in CASCADE_STAGES and LLM_CHEAP_MODEL and LLM_CHEAP_MODEL != model:
+        return [LLM_CHEAP_MODEL, model]
+    return [model]
+
+def record_escalation(stage, model, reason):
+    """A cascade moving `stage` past `model`: reason is "invalid" (no usable answer) or "low_confidence"."""
+    usage_tracker.record_escalation(stage, model, reason)
+    telemetry.count("llm_escalations_total", stage=stage, model=model, reason=reason)
+
+def _record_usage(stage, model, completion, start_time, first_token_time=None):
+    usage = completion.usage if completion is not None else None
+    prompt_tokens = usage.prompt_tokens if usage else 0
+    completion_tokens = usage.completion_tokens if usage else 0
+    latency_s = time.perf_counter() - start_time
+    first_token_s = first_token_time - start_time if first_token_time is not None else None
+    usage_tracker.record(stage, prompt_tokens, completion_tokens, latency_s, first_token_s, model=model)
+    if telemetry.TELEMETRY_ENABLED:
+        telemetry.record_span(f"llm.{stage}", latency_s, model=model, prompt_tokens=prompt_tokens,
+                              completion_tokens=completion_tokens, first_token_s=first_token_s)
+        telemetry.count("llm_tokens_total", prompt_tokens, stage=stage, model=model, kind="prompt")
+        telemetry.count("llm_tokens_total", completion_tokens, stage=stage, model=model, kind="completion")
+        if first_token_s is not None:
+            telemetry.observe("llm_first_token_seconds", first_token_s, stage=stage)
+
+def _chunk_text(chunk):
+    if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+        return chunk.choices[0].delta.content
+    return ""
+
+def _stream_alibaba_llm(request, prompt, stage):
+    """
+    Yield content deltas of a streamed completion; usage arrives in the final chunk.
+    An error before the first delta ends the stream empty; after it the error is re-raised,
+    so a truncated response is never taken for a complete one.
+    """
+    try:
+        start_time = time.perf_counter()
+        first_token_time = None
+        usage_chunk = None
+        for chunk in llm_clients.create_completion(**request):
+            if chunk.usage:
+                usage_chunk = chunk
+            text = _chunk_text(chunk)
+            if text:
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                yield text
+        _record_usage(stage, request["model"], usage_chunk, start_time, first_token_time)
+    except Exception as e:
+        if _json_mode_rejected(e, request):
+            yield from _stream_alibaba_llm(_without_json_mode(request), prompt, stage)
+            return
+        _log_llm_error(e, prompt, stage)
+        if first_token_time is not None:
+            raise
+
+async def _stream_alibaba_llm_async(request, prompt, stage):
+    try:
+        first_token_time = None
+        usage_chunk = None
+        async with _async_llm_slot():
+            start_time = time.perf_counter()
+            async for chunk in await llm_clients.create_completion_async(**request):
+                if chunk.usage:
+                    usage_chunk = chunk
+                text = _chunk_text(chunk)
+                if text:
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                    yield text
+        _record_usage(stage, request["model"], usage_chunk, start_time, first_token_time)
+    except Exception as e:
+        if _json_mode_rejected(e, request):
+            async for text in _stream_alibaba_llm_async(_without_json_mode(request), prompt, stage):
+                yield text
+            return
+        _log_llm_error(e, prompt, stage)
+        if first_token_time is not None:
+            raise
+
+def _completion_request(prompt, max_tokens, system_prompt, stream, json_mode=False, model=DEFAULT_MODEL):
+    request = dict(
+        model=model,
+        messages=_build_messages(prompt, system_prompt),
+        max_tokens=max_tokens,
+        temperature=0.5,
+        top_p=0.8
+    )
+    if stream:
+        request.update(stream=True, stream_options={"include_usage": True})
+    if json_mode and LLM_JSON_MODE and _json_mode_supported:
+        request["response_format"] = {"type": "json_object"}
+    return request
+
+def _without_json_mode(request):
+    return {key: value for key, value in request.items() if key != "response_format"}
+
+def _json_mode_rejected(e, request):
+    """Whether the endpoint refused response_format; JSON mode is then off for the rest of the process."""
+    global _json_mode_supported
+    if "response_format" not in request or getattr(e, "status_code", None) != 400:
+        return False
+    message = str(e).lower()
+    if "response_format" not in message and "json" not in message:
+        return False
+    _json_mode_supported = False
+    print(f"The LLM endpoint rejected JSON mode ({e}); sending requests without response_format.")
+    return True
+
+def _log_llm_error(e, prompt, stage="general"):
+    telemetry.count("llm_errors_total", stage=stage, error=e.__class__.__name__)
+    telemetry.event("llm_error", stage=stage, error=f"{e.__class__.__name__}: {e}")
+    error_message = f"Error calling Alibaba Cloud LLM: {e}"
+    print(error_message) # Log to console for server-side debugging
+    # Consider logging the prompt as well for debugging (server-side only for security)
+    print(f"Failed prompt (first 100 chars): {prompt[:100]}")
+    print("For more information, see: https://www.alibabacloud.com/help/en/model-studio/developer-reference/error-code")
+
+def _call_alibaba_llm(request, prompt, stage):
+    try:
+        start_time = time.perf_counter()
+        completion = llm_clients.create_completion(**request)
+        _record_usage(stage, request["model"], completion, start_time)
+        return completion.choices[0].message.content
+    except Exception as e:
+        if _json_mode_rejected(e, request):
+            return _call_alibaba_llm(_without_json_mode(request), prompt, stage)
+        _log_llm_error(e, prompt, stage)
+        return None
+
+def _memo_digest(memo_key, request):
+    template_id, inputs = memo_key[:2]
+    return request_digest(template_id, inputs, request)
+
+def _replay(text):
+    if text:
+        yield text
+
+async def _replay_async(text):
+    if text:
+        yield text
+
+def call_alibaba_llm(prompt, max_tokens=2048, system_prompt="You are a helpful assistant.", stage="general", stream=False,
+                     memo_key=None, json_mode=False, model=None):
+    """
+    Call Alibaba Cloud's LLM with the given prompt using OpenAI-compatible interface.
+    Token usage and latency are recorded under `stage` for the per-mode cost report.
+    Transient failures are retried by the shared client manager before returning None.
+    With stream=True an iterator of text deltas is returned instead; it is empty when the
+    call fails, and raises if the call fails after the first delta.
+    `memo_key` = (template id, inputs[, should_cache]) shares the response with every later
+    call with the same template, equivalent inputs and request parameters (see memo.py); the
+    prompt must be built from those inputs alone, and `should_cache(response)` can keep a
+    malformed response from being shared. Memoized calls are not streamed from the endpoint:
+    with stream=True the whole response arrives as one delta.
+    `json_mode` requests JSON-object output where the endpoint supports it; the prompt must
+    still ask for JSON (the endpoint requires the word) and describe the fields.
+    `model` defaults to the stage's model (stage_model).
+    """
+    request = _completion_request(prompt, max_tokens, system_prompt, stream and memo_key is None, json_mode,
+                                  model or stage_model(stage))
+    if memo_key is not None:
+        response = llm_memo.call(_memo_digest(memo_key, request), lambda: _call_alibaba_llm(request, prompt, stage), *memo_key[2:])
+        return _replay(response) if stream else response
+    if stream:
+        return _stream_alibaba_llm(request, prompt, stage)
+    return _call_alibaba_llm(request, prompt, stage)
+
+async def call_alibaba_llm_async(prompt, max_tokens=2048, system_prompt="You are a helpful assistant.", stage="general", stream=False,
+                                 memo_key=None, json_mode=False, model=None):
+    """
+    Async counterpart of call_alibaba_llm, used by the analysis pipeline so that
+    independent stages can wait on the endpoint concurrently.
+    Cancellation (e.g. a stage timeout) is propagated rather than turned into None.
+    With stream=True the awaited result is an async iterator of text deltas.
+    """
+    request = _completion_request(prompt, max_tokens, system_prompt, stream and memo_key is None, json_mode,
+                                  model or stage_model(stage))
+    if memo_key is not None:
+        response = await llm_memo.call_async(_memo_digest(memo_key, request), lambda: _call_alibaba_llm_async(request, prompt, stage),
+                                             *memo_key[2:])
+        return _replay_async(response) if stream else response
+    if stream:
+        return _stream_alibaba_llm_async(request, prompt, stage)
+    return await _call_alibaba_llm_async(request, prompt, stage)
+
+async def _call_alibaba_llm_async(request, prompt, stage):
+    try:
+        async with _async_llm_slot():
+            start_time = time.perf_counter()
+            completion = await llm_clients.create_completion_async(**request)
+        _record_usage(stage, request["model"], completion, start_time)
+        return completion.choices[0].message.content
+    except Exception as e:
+        if _json_mode_rejected(e, request):
+            return await _call_alibaba_llm_async(_without_json_mode(request), prompt, stage)
+        _log_llm_error(e, prompt, stage)
+        return None
+
+def parse_llm_json_response(response_text):
+    """
+    Attempts to parse a JSON object from the LLM's response text.
+    Handles cases where the JSON might be embedded in markdown or have surrounding text
+    (see llm_json.parse_json_object).
+    """
+    return parse_json_object(response_text)[0]
+
+###### Schema-checked responses ######
+
+def _repair_prompt(prompt, response_text, problems, schema):
+    return f"""
+    Your previous response to the request below could not be used: {'; '.join(problems[:10])}.
+
+    Request:
+    ---
+    {prompt}
+    ---
+
+    Previous response:
+    ---
+    {response_text[:REPAIR_RESPONSE_CHARS]}
+    ---
+
+    Return ONLY the corrected JSON object, with the fields {', '.join(schema.get("properties", {}))}.
+    Keep every value that was already valid, and take missing values from the request.
+    """
+
+def _record_json_outcome(stage, outcome):
+    usage_tracker.record_json(stage, outcome)
+    telemetry.count("llm_json_total", stage=stage, outcome=outcome)
+
+def _first_pass(response_text, schema, stage, repair, prompt):
+    """(data, problems, whether to send a repair request)."""
+    data, problems, changed = parse_structured(response_text, schema)
+    if data is not None:
+        _record_json_outcome(stage, "coerced" if changed else "ok")
+        return data, problems, False
+    if not repair:
+        # The caller escalates to another model instead (see analysis._cascade)
+        return None, problems, False
+    if not response_text:
+        # The call itself failed (after the client's retries); there is nothing to repair
+        _record_json_outcome(stage, "failed")
+        return None, problems, False
+    if prompt is None and any(problem.startswith("missing field") for problem in problems):
+        # Without the original input a repair could only make the missing values up
+        _record_json_outcome(stage, "failed")
+        return None, problems, False
+    return None, problems, True
+
+def _after_repair(repaired_text, schema, stage):
+    data, problems, _ = parse_structured(repaired_text, schema)
+    _record_json_outcome(stage, "repaired" if data is not None else "failed")
+    if data is None:
+        print(f"{stage} response still invalid after a repair request: {'; '.join(problems[:5])}")
+    return data
+
+def structured_response(response_text, schema, stage, max_tokens=2048, repair=True, prompt=None):
+    """
+    The response as an object satisfying `schema` (see llm_json), or None. A response
+    that cannot be coerced gets one repair request quoting `prompt` (the original request),
+    the response and its problems, unless repair=False; without `prompt` only responses
+    with no missing fields are repaired. The repair goes to the stage's model and is
+    billed as "<stage>_repair". Outcomes (ok, coerced, repaired, failed) are counted per stage.
+    """
+    data, problems, needs_repair = _first_pass(response_text, schema, stage, repair, prompt)
+    if not needs_repair:
+        return data
+    repaired_text = call_alibaba_llm(_repair_prompt(prompt, response_text, problems, schema), max_tokens=max_tokens,
+                                     stage=f"{stage}_repair", json_mode=True, model=stage_model(stage))
+    return _after_repair(repaired_text, schema, stage)
+
+async def structured_response_async(response_text, schema, stage, max_tokens=2048, repair=True, prompt=None):
+    data, problems, needs_repair = _first_pass(response_text, schema, stage, repair, prompt)
+    if not needs_repair:
+        return data
+    repaired_text = await call_alibaba_llm_async(_repair_prompt(prompt, response_text, problems, schema), max_tokens=max_tokens,
+                                                 stage=f"{stage}_repair", json_mode=True, model=stage_model(stage))
+    return _after_repair(repaired_text, schema, stage)
@@ -0,0 +1,268 @@
+###### Shared LLM client manager ######
+# One pooled OpenAI-compatible client per process instead of a fresh OpenAI(...)
+# (and a fresh TCP + TLS handshake to DashScope) on every call. Transient
+# failures (429, 5xx, connection errors, timeouts) are retried with jittered
+# exponential backoff before the caller falls back to its "NA" result. Every
+# attempt first passes the process-wide admission control (admission.py).
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+import telemetry
+from admission import admission_controller, estimate_request_tokens, request_shape
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 120.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 8.0
+DEFAULT_POOL_SIZE = 20
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_throttled(error):
+    return getattr(error, "status_code", None) == 429
+
+def _total_tokens(response):
+    usage = getattr(response, "usage", None)
+    return usage.total_tokens if usage else None
+
+def _admitted_stream(stream, ticket, start_time):
+    """The stream's chunks; the admission slot is held until it is consumed."""
+    tokens_used = None
+    try:
+        for chunk in stream:
+            tokens_used = _total_tokens(chunk) or tokens_used
+            yield chunk
+    finally:
+        admission_controller.release(ticket, time.perf_counter() - start_time, tokens_used=tokens_used)
+
+async def _admitted_stream_async(stream, ticket, start_time):
+    tokens_used = None
+    try:
+        async for chunk in stream:
+            tokens_used = _total_tokens(chunk) or tokens_used
+            yield chunk
+    finally:
+        admission_controller.release(ticket, time.perf_counter() - start_time, tokens_used=tokens_used)
+
+def is_retryable(error):
+    """429/5xx responses, connection resets and timeouts are worth another attempt."""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+class LLMClientManager:
+    """
+    Owns the keep-alive connection pools for the blocking and async OpenAI clients
+    and applies the retry policy around chat completion calls.
+    Counters are exposed through stats() for the UI and the load-test tooling.
+    """
+    def __init__(self, api_key, base_url, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX,
+                 pool_size=DEFAULT_POOL_SIZE, keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client = None
+        # An httpx.AsyncClient's pool is bound to the event loop it was used on. The app's
+        # pipelines share one long-lived loop (pipeline.run_pipeline_sync); callers with a
+        # loop of their own (the batch CLI) close its client with aclose_async_client().
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "retries": 0, "failures": 0, "connections_opened": 0, "connections_reused": 0}
+
+    ###### Counters ######
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _count_retry(self, error, attempt, delay):
+        self._count("retries")
+        telemetry.count("llm_retries_total", error=error.__class__.__name__)
+        telemetry.event("llm_retry", error=error.__class__.__name__, attempt=attempt + 1, delay_s=round(delay, 3))
+
+    def _tracer(self, request):
+        # httpcore reports every new TCP connection; a response to a request without one
+        # came over a pooled connection (failed requests count as neither)
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                request.extensions["connection_opened"] = True
+                self._count("connections_opened")
+        return trace
+
+    def _on_request(self, request):
+        request.extensions["trace"] = self._tracer(request)
+
+    async def _on_request_async(self, request):
+        trace = self._tracer(request)
+
+        async def atrace(event_name, info):
+            trace(event_name, info)
+        request.extensions["trace"] = atrace
+
+    def _on_response(self, response):
+        if not response.request.extensions.get("connection_opened"):
+            self._count("connections_reused")
+
+    async def _on_response_async(self, response):
+        self._on_response(response)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    ###### Clients ######
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                http_client = httpx.Client(
+                    timeout=self._timeout, limits=self._limits,
+                    event_hooks={"request": [self._on_request], "response": [self._on_response]},
+                )
+                # Retries are handled here so they are counted and jittered consistently
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                      http_client=http_client, max_retries=0)
+            return self._client
+
+    @property
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                http_client = httpx.AsyncClient(
+                    timeout=self._timeout, limits=self._limits,
+                    event_hooks={"request": [self._on_request_async], "response": [self._on_response_async]},
+                )
+                client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                     http_client=http_client, max_retries=0)
+                self._async_clients[loop] = client
+            return client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose_async_client(self):
+        """Close the running loop's async client, before a loop of one's own shuts down."""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    ###### Retry policy ######
+    def backoff_delay(self, attempt, error=None):
+        """Full-jitter exponential backoff, never shorter than a server-provided Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+        return delay
+
+    def create_completion(self, **kwargs):
+        """
+        chat.completions.create on the pooled client, with retries. Each attempt waits for
+        admission; a stream keeps its slot until it has been read to the end.
+        """
+        attempt = 0
+        tokens, shape = estimate_request_tokens(kwargs), request_shape(kwargs)
+        while True:
+            ticket = admission_controller.acquire(tokens, shape)
+            self._count("requests")
+            start_time = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                admission_controller.release(ticket, throttled=is_throttled(e), tokens_used=0)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                self._count_retry(e, attempt, delay)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            if kwargs.get("stream"):
+                return _admitted_stream(response, ticket, start_time)
+            admission_controller.release(ticket, time.perf_counter() - start_time, tokens_used=_total_tokens(response))
+            return response
+
+    async def create_completion_async(self, **kwargs):
+        attempt = 0
+        tokens, shape = estimate_request_tokens(kwargs), request_shape(kwargs)
+        while True:
+            ticket = await admission_controller.acquire_async(tokens, shape)
+            self._count("requests")
+            start_time = time.perf_counter()
+            try:
+                response = await self.async_client.chat.completions.create(**kwargs)
+            except asyncio.CancelledError:  # e.g. a stage timeout
+                admission_controller.release(ticket, tokens_used=0)
+                raise
+            except Exception as e:
+                admission_controller.release(ticket, throttled=is_throttled(e), tokens_used=0)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                self._count_retry(e, attempt, delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            if kwargs.get("stream"):
+                return _admitted_stream_async(response, ticket, start_time)
+            admission_controller.release(ticket, time.perf_counter() - start_time, tokens_used=_total_tokens(response))
+            return response
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_llm_clients(api_key, base_url):
+    """
+    Process-wide client manager, tuned through LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+    LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_POOL_SIZE and LLM_KEEPALIVE_EXPIRY.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = LLMClientManager(
+                api_key, base_url,
+                connect_timeout=float(os.getenv('LLM_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+                read_timeout=float(os.getenv('LLM_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)),
+                max_retries=int(os.getenv('LLM_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+                backoff_base=float(os.getenv('LLM_BACKOFF_BASE', DEFAULT_BACKOFF_BASE)),
+                backoff_max=float(os.getenv('LLM_BACKOFF_MAX', DEFAULT_BACKOFF_MAX)),
+                pool_size=int(os.getenv('LLM_POOL_SIZE', DEFAULT_POOL_SIZE)),
+                keepalive_expiry=float(os.getenv('LLM_KEEPALIVE_EXPIRY', DEFAULT_KEEPALIVE_EXPIRY)),
+            )
+        return _manager
@@ -0,0 +1,173 @@
+###### Structured LLM output ######
+# One tolerant pass from response text to a schema-conforming object:
+#   1. parse_json_object: the JSON object inside markdown fences or surrounding
+#      prose, with trailing commas removed;
+#   2. coerce: values brought to the types of the stage's JSON schema ("75/100"
+#      for a number, "Python, SQL" for an array of strings, defaults for missing
+#      optional fields), then validated with jsonschema.
+# What cannot be coerced is returned as a list of problems, which the LLM layer
+# sends back in a single repair request (see llm.structured_response).
+import copy
+import json
+import re
+
+import jsonschema
+
+import telemetry
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+# String values that mean "nothing" for an array field
+_EMPTY_VALUES = {"", "none", "n/a", "na", "not found", "null", "-"}
+_decoder = json.JSONDecoder()
+
+
+def _strip_trailing_commas(text):
+    # Only reached when a response fails to parse, so a character loop is fine here
+    out, in_string, escaped = [], False, False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ',':
+            j = i + 1
+            while j < len(text) and text[j].isspace():
+                j += 1
+            if text[j:j + 1] in ('}', ']'):
+                continue
+        out.append(char)
+    return ''.join(out)
+
+def _fenced(text):
+    """The body of the first markdown code fence in text (an unclosed fence runs to the end), or None."""
+    start = text.find('```')
+    if start == -1:
+        return None
+    body_start = text.find('\n', start + 3)
+    if body_start == -1:
+        return None
+    end = text.find('```', body_start)
+    return text[body_start + 1:end if end != -1 else len(text)].strip()
+
+def parse_json_object(response_text):
+    """
+    (parsed value or None, path): path is "direct", the repairs applied joined by "+"
+    (markdown_fence, brace_scan, trailing_comma), "no_json" or "failed". Only sizes are
+    traced, never the response text.
+    """
+    if not response_text:
+        return None, "no_json"
+    text, repairs = response_text.strip(), []
+    try:
+        value = json.loads(text)
+        telemetry.count("json_parse_total", path="direct")
+        return value, "direct"
+    except json.JSONDecodeError:
+        pass
+    fenced = _fenced(text) if '```' in text else None
+    if fenced:
+        text = fenced
+        repairs.append("markdown_fence")
+    if not text.startswith('{') or not text.endswith('}'):
+        start, end = text.find('{'), text.rfind('}')
+        if start == -1 or end < start:
+            return _repair_result(None, "no_json", response_text)
+        repairs.append("brace_scan")
+        try:
+            # The first complete object, even when the prose after it has braces too
+            return _repair_result(_decoder.raw_decode(text, start)[0], "+".join(repairs), response_text)
+        except json.JSONDecodeError:
+            text = text[start:]
+    else:
+        try:
+            return _repair_result(json.loads(text), "+".join(repairs), response_text)
+        except json.JSONDecodeError:
+            pass
+    try:
+        repairs.append("trailing_comma")
+        # `text` starts at the object; stripping commas never moves it, and prose after it is ignored
+        return _repair_result(_decoder.raw_decode(_strip_trailing_commas(text))[0], "+".join(repairs), response_text)
+    except json.JSONDecodeError as e:
+        print(f"Failed to parse LLM JSON response: {e}. Response was: {response_text[:200]}...")
+        return _repair_result(None, "failed", response_text)
+
+def _repair_result(value, path, response_text):
+    telemetry.count("json_parse_total", path=path)
+    telemetry.event("json_repair", path=path, response_chars=len(response_text))
+    return value, path
+
+
+def _coerce(value, schema, where, problems):
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(value, dict):
+            problems.append(f"{where or 'response'} must be a JSON object")
+            return value
+        value = dict(value)
+        properties = schema.get("properties", {})
+        for field in schema.get("required", ()):
+            if value.get(field) is None:
+                if "default" in properties.get(field, {}):
+                    value[field] = copy.deepcopy(properties[field]["default"])
+                else:
+                    problems.append(f'missing field "{where + field}"')
+        for field, field_schema in properties.items():
+            if value.get(field) is not None:
+                value[field] = _coerce(value[field], field_schema, f"{where}{field}.", problems)
+        return value
+    where = where.rstrip('.')
+    if value is None and "default" in schema:
+        return copy.deepcopy(schema["default"])
+    if expected == "array":
+        if isinstance(value, str):
+            # "Python, SQL" or a bulleted list where an array was asked for
+            value = [] if value.strip().lower() in _EMPTY_VALUES else \
+                [item.strip().lstrip('-*• ').strip() for item in re.split(r"[,;\n]", value) if item.strip().lstrip('-*• ').strip()]
+        elif not isinstance(value, list):
+            value = [value]
+        item_schema = schema.get("items")
+        return [_coerce(item, item_schema, f"{where}[{i}].", problems) for i, item in enumerate(value)] if item_schema else value
+    if expected == "string":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return ", ".join(value)
+        return value
+    if expected in ("number", "integer"):
+        if isinstance(value, str):
+            match = _NUMBER.search(value)  # "75", "75/100", "75%"
+            if not match:
+                problems.append(f'"{where}" must be a number, got "{value[:40]}"')
+                return value
+            value = float(match.group())
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = min(max(value, schema.get("minimum", value)), schema.get("maximum", value))
+            return int(round(value)) if expected == "integer" or float(value).is_integer() else value
+    return value
+
+def coerce(value, schema):
+    """(value with the schema's types and defaults applied, [problems that coercion could not fix])."""
+    problems = []
+    value = _coerce(value, schema, "", problems)
+    if not problems:
+        problems = [f"{'/'.join(str(part) for part in error.path) or 'response'}: {error.message}"
+                    for error in jsonschema.Draft7Validator(schema).iter_errors(value)]
+    return value, problems
+
+def parse_structured(response_text, schema):
+    """
+    (object or None, problems, changed): the parsed and coerced response if it satisfies
+    `schema`; `changed` tells whether any repair or coercion was needed.
+    """
+    value, path = parse_json_object(response_text)
+    if value is None:
+        return None, ["the response is not a JSON object" if path == "no_json" else "the response is not valid JSON"], True
+    coerced, problems = coerce(value, schema)
+    if problems:
+        return None, problems, True
+    return coerced, [], path != "direct" or coerced != value
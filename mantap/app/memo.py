@@ -0,0 +1,163 @@
+###### Cross-user LLM response memoization ######
+# Some prompts depend only on a few inputs that repeat across users, e.g. the
+# career paths for (job category, experience level, skills). Callers of
+# call_alibaba_llm opt in with a memo key, (template id, inputs); the response is
+# then stored under a canonical digest of the template, the normalized inputs and
+# every request parameter that can change the output, and served to the next
+# request with the same digest. Concurrent identical requests share one LLM call.
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from cache import AnalysisCache
+
+LLM_MEMO_ENTRIES = int(os.getenv('LLM_MEMO_ENTRIES', 4096))
+LLM_MEMO_TTL = float(os.getenv('LLM_MEMO_TTL', 24 * 3600))
+# Optional directory shared by every process on the host (app workers, batch runs)
+LLM_MEMO_DIR = os.getenv('LLM_MEMO_DIR') or None
+# Request fields that change the response; the prompt itself is covered by the template id and inputs
+REQUEST_PARAMS = ("model", "max_tokens", "temperature", "top_p", "response_format")
+MEMO_STAGE = "llm_memo"
+
+
+def canonical_inputs(value):
+    """
+    Inputs in a form where equivalent values are equal: whitespace collapsed, and lists
+    or sets of strings deduplicated case-insensitively and sorted.
+    """
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    if isinstance(value, dict):
+        return {str(key): canonical_inputs(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [canonical_inputs(item) for item in value]
+        if all(isinstance(item, str) for item in items):
+            unique = {}
+            for item in items:
+                if item:
+                    # The same spelling whatever order the duplicates come in
+                    unique[item.lower()] = min(unique.get(item.lower(), item), item)
+            return [unique[key] for key in sorted(unique)]
+        return items
+    return value
+
+def request_digest(template_id, inputs, request):
+    """
+    Digest of the template id, canonical inputs, system prompt and sampling parameters.
+    Inputs are compared case-insensitively ("SQL" and "sql" are the same skill).
+    """
+    system_prompts = [message["content"] for message in request.get("messages", []) if message["role"] == "system"]
+    key = {
+        "template": template_id,
+        "inputs": json.dumps(canonical_inputs(inputs), sort_keys=True, ensure_ascii=False).lower(),
+        "system": system_prompts,
+        "params": {name: request.get(name) for name in REQUEST_PARAMS},
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class PromptMemo:
+    """
+    Response store with LRU eviction (in memory, plus the optional disk tier of AnalysisCache)
+    and a TTL, and single-flight: while one caller is waiting on the LLM for a digest, the
+    others wait for that response instead of sending the same request.
+    """
+    def __init__(self, max_entries=LLM_MEMO_ENTRIES, ttl_seconds=LLM_MEMO_TTL, cache_dir=LLM_MEMO_DIR):
+        self.ttl_seconds = ttl_seconds
+        self._store = AnalysisCache(max_entries=max_entries, cache_dir=cache_dir, ttl_seconds=ttl_seconds)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, digest):
+        entry = self._store.get(digest, MEMO_STAGE)
+        if entry is None or time.time() - entry["stored_at"] > self.ttl_seconds:
+            return None
+        return entry["response"]
+
+    def put(self, digest, response):
+        if response:
+            self._store.put(digest, MEMO_STAGE, {"response": response, "stored_at": time.time()})
+
+    def _lookup_or_join(self, digest):
+        """(cached response, None, False) on a hit, else (None, in-flight future, whether this caller leads)."""
+        response = self.get(digest)
+        if response is not None:
+            self._count("hits")
+            return response, None, False
+        with self._lock:
+            flight = self._flights.get(digest)
+            if flight is not None:
+                self._counts["coalesced"] += 1
+                return None, flight, False
+            # A leader stores its response before leaving _flights, so look again
+            response = self.get(digest)
+            if response is not None:
+                self._counts["hits"] += 1
+                return response, None, False
+            flight = self._flights[digest] = Future()
+            self._counts["misses"] += 1
+            return None, flight, True
+
+    def _land(self, digest, flight, response, should_cache):
+        if response and (should_cache is None or should_cache(response)):
+            self.put(digest, response)
+        with self._lock:
+            self._flights.pop(digest, None)
+        if not flight.done():
+            flight.set_result(response)
+
+    def call(self, digest, compute, should_cache=None):
+        """
+        Memoized `compute()`. `should_cache(response)` keeps unusable responses out of the
+        store (they are still handed to the waiting followers); a follower whose leader got
+        no response computes for itself.
+        """
+        response, flight, leader = self._lookup_or_join(digest)
+        if flight is None:
+            return response
+        if not leader:
+            return flight.result() or compute()
+        response = None
+        try:
+            response = compute()
+            return response
+        finally:
+            self._land(digest, flight, response, should_cache)
+
+    async def call_async(self, digest, compute, should_cache=None):
+        """Async `call`; `compute` is a coroutine function. Works across event loops and threads."""
+        response, flight, leader = self._lookup_or_join(digest)
+        if flight is None:
+            return response
+        if not leader:
+            # Shielded: a cancelled follower must not cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(flight)) or await compute()
+        response = None
+        try:
+            response = await compute()
+            return response
+        finally:
+            # Also on cancellation, so followers are never left waiting
+            self._land(digest, flight, response, should_cache)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["hits"] + counts["coalesced"] + counts["misses"]
+        counts["hit_rate"] = (counts["hits"] + counts["coalesced"]) / lookups if lookups else 0.0
+        return counts
+
+    def clear(self):
+        self._store.clear()
+
+
+llm_memo = PromptMemo()
@@ -0,0 +1,140 @@
+###### Async stage pipeline ######
+# Runs the analysis stages as a dependency graph: every stage starts as soon as
+# the stages it depends on have finished, so independent LLM calls overlap and
+# the wall-clock time per resume drops to the critical path.
+import asyncio
+import copy
+import threading
+import time
+
+from telemetry import record_span
+
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+
+
+class Stage:
+    """
+    One node of the pipeline.
+    `func` is an async callable that receives the results of `depends_on` as keyword
+    arguments (keyed by stage name). If it raises or exceeds `timeout` seconds it is
+    cancelled and `fallback` is passed on to its dependents instead.
+    Stages with `reports_progress` also get a `progress(payload)` keyword argument for
+    partial results (e.g. streamed tokens) before they finish.
+    """
+    def __init__(self, name, func, depends_on=(), timeout=None, fallback=None, reports_progress=False):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.fallback = fallback
+        self.reports_progress = reports_progress
+
+
+class StageResult:
+    def __init__(self, name, value, status, elapsed_s, error=None):
+        self.name = name
+        self.value = value
+        self.status = status
+        self.elapsed_s = elapsed_s
+        self.error = error
+
+    def __repr__(self):
+        return f"StageResult({self.name!r}, status={self.status!r}, elapsed_s={self.elapsed_s:.3f})"
+
+
+def _check_graph(stages):
+    """Reject unknown dependencies and cycles before any task is started."""
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Pipeline stage names must be unique.")
+    visiting, done = set(), set()
+
+    def visit(name, path):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a dependency cycle: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dep in by_name[name].depends_on:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'.")
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+
+    for stage in stages:
+        visit(stage.name, [])
+
+async def run_pipeline(stages, on_stage_done=None, on_stage_progress=None):
+    """
+    Run all stages concurrently subject to their dependencies.
+    `on_stage_done(result)` is called on the event loop thread as each stage finishes,
+    and `on_stage_progress(stage name, payload)` whenever a stage reports progress,
+    which lets the UI render partial results. Returns {stage name: StageResult}.
+    If the pipeline itself is cancelled, every unfinished stage is cancelled too.
+    """
+    _check_graph(stages)
+    tasks = {}
+    results = {}
+
+    async def run_stage(stage):
+        dep_results = [await tasks[dep] for dep in stage.depends_on]
+        kwargs = {result.name: result.value for result in dep_results}
+        if stage.reports_progress:
+            kwargs["progress"] = (lambda payload: on_stage_progress(stage.name, payload)) if on_stage_progress else None
+        start_time = time.perf_counter()
+        error = None
+        try:
+            if stage.timeout:
+                value = await asyncio.wait_for(stage.func(**kwargs), stage.timeout)
+            else:
+                value = await stage.func(**kwargs)
+            status = STATUS_OK
+        except asyncio.TimeoutError:
+            value, status = copy.deepcopy(stage.fallback), STATUS_TIMEOUT
+            print(f"Pipeline stage '{stage.name}' timed out after {stage.timeout}s")
+        except Exception as e:
+            value, status, error = copy.deepcopy(stage.fallback), STATUS_ERROR, e
+            print(f"Pipeline stage '{stage.name}' failed: {e}")
+        result = StageResult(stage.name, value, status, time.perf_counter() - start_time, error)
+        record_span(f"stage.{stage.name}", result.elapsed_s, status, **({"error": str(error)} if error else {}))
+        results[stage.name] = result
+        if on_stage_done:
+            on_stage_done(result)
+        return result
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+    return results
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _shared_loop():
+    """
+    One long-lived event loop on a daemon thread. Per-loop resources such as the async
+    HTTP connection pool are then reused from one resume to the next, where an
+    asyncio.run() per resume would build (and leak) a new pool every time.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="pipeline-loop", daemon=True).start()
+        return _loop
+
+def run_pipeline_sync(stages, on_stage_done=None, on_stage_progress=None):
+    """
+    Blocking wrapper for callers without an event loop (the job workers). Pipelines from
+    every thread run on the shared loop, with the caller's context variables (trace id,
+    request class); the callbacks are called on the loop thread.
+    """
+    return asyncio.run_coroutine_threadsafe(run_pipeline(stages, on_stage_done, on_stage_progress), _shared_loop()).result()
@@ -0,0 +1,82 @@
+###### Lightweight PDF preview ######
+# Inlining the whole PDF as a base64 data: iframe puts ~1.33x the file size into
+# every rerun's websocket message and keeps several copies of it per session.
+# The preview instead renders the first PDF_PREVIEW_PAGES pages as downscaled
+# palette PNGs, once per content hash, and shares them between sessions; the full
+# document is only inlined when the user asks for it.
+import base64
+import io
+import os
+
+from PIL import Image
+
+try:
+    import pymupdf # PyMuPDF, optional: without it only the full document view is available
+except ImportError:
+    pymupdf = None
+
+from cache import AnalysisCache
+
+PREVIEW_PAGES = int(os.getenv('PDF_PREVIEW_PAGES', 2))
+PREVIEW_WIDTH = int(os.getenv('PDF_PREVIEW_WIDTH', 700)) # Pixels, the width of the old iframe
+# Palette size: keeps text crisp (no JPEG ringing) at roughly half the bytes of a full-colour PNG
+PREVIEW_COLORS = int(os.getenv('PDF_PREVIEW_COLORS', 32))
+
+# Memory-only: page images are cheap to rebuild and should not fill the analysis cache directory
+_preview_cache = AnalysisCache(max_entries=int(os.getenv('PDF_PREVIEW_CACHE_ENTRIES', 64)))
+
+
+def preview_available():
+    return pymupdf is not None
+
+def render_preview(pdf_bytes, pages=PREVIEW_PAGES, width=PREVIEW_WIDTH, colors=PREVIEW_COLORS):
+    """PNG bytes of the first `pages` pages, scaled to `width` pixels, and the document page count."""
+    images = []
+    with pymupdf.open(stream=pdf_bytes, filetype='pdf') as doc:
+        for page in doc.pages(0, min(pages, doc.page_count)):
+            # Rasterize straight at the target width instead of rendering large and downscaling
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(width / page.rect.width, width / page.rect.width), alpha=False)
+            image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+            output = io.BytesIO()
+            image.quantize(colors=colors).save(output, format='PNG', optimize=True)
+            images.append(output.getvalue())
+        page_count = doc.page_count
+    return {"images": images, "page_count": page_count}
+
+def get_preview(digest, pdf_file, pages=PREVIEW_PAGES, width=PREVIEW_WIDTH):
+    """
+    Cached preview for an upload with content hash `digest`, or None if it cannot be rendered.
+    Rendered lazily on first request; later reruns and sessions reuse the same images.
+    """
+    if pymupdf is None:
+        return None
+
+    def render():
+        try:
+            # PyMuPDF needs bytes; this is the only copy of the upload and it is dropped after rendering
+            return render_preview(bytes(pdf_file.getbuffer()), pages, width)
+        except Exception as e:
+            print(f"Could not render PDF preview: {e}")
+            return None
+
+    return _preview_cache.get_or_compute(digest, f"preview.{pages}.{width}", render)
+
+def inline_pdf_html(pdf_bytes):
+    """The iframe markup of the full-document view (the original show_pdf)."""
+    base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
+    return f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="700" height="1000" type="application/pdf"></iframe>'
+
+def preview_footprint(pdf_size, preview):
+    """
+    Bytes each display mode sends and holds per session, for the comparison shown in the UI.
+    The inline iframe resends its markup on every rerun and the session holds the file, its
+    base64 encoding and the markup. A rerun of the preview only sends media URLs; the images
+    are fetched once (browsers cache them) and each session's media store holds one copy.
+    """
+    inline_size = len(inline_pdf_html(b'')) + 4 * ((pdf_size + 2) // 3)
+    image_size = sum(len(image) for image in preview["images"]) if preview else 0
+    return {
+        "inline": {"payload_first_view": inline_size, "payload_per_rerun": inline_size,
+                   "session_memory": pdf_size + 2 * inline_size},
+        "preview": {"payload_first_view": image_size, "payload_per_rerun": 0, "session_memory": image_size},
+    }
@@ -0,0 +1,396 @@
+###### Resume text extraction ######
+# PDF/DOCX text extraction shared by the Streamlit app and the batch analyzer.
+# No st.* calls here: problems are logged and the caller sees empty text.
+#
+# PDF text goes through a pluggable backend (PDF_BACKEND):
+#   layout   pdfminer3 with full LAParams layout analysis (the original reader)
+#   fast     pdfminer3 without layout analysis; lines are rebuilt from character
+#            positions in content-stream order, which is linear per page
+#   pymupdf  PyMuPDF, if it is installed
+# Long documents are split into page ranges processed in parallel across
+# processes, and PDF_MAX_PAGES / PDF_MAX_BYTES cap how much of a document is
+# read. A capped read is recorded as truncated rather than failing.
+#
+# A resume can be a path, or the upload itself (bytes, memoryview or a binary
+# file object such as Streamlit's UploadedFile), which is parsed in memory.
+# Only uploads above RESUME_SPOOL_BYTES are spooled to a temporary file, so
+# that the page-parallel workers can open them by path.
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+# libraries used to parse the pdf files
+from pdfminer3.layout import LAParams, LTChar, LTContainer
+from pdfminer3.pdfpage import PDFPage
+from pdfminer3.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer3.pdfparser import PDFParser
+from pdfminer3.pdfdocument import PDFDocument
+from pdfminer3.pdftypes import resolve1
+from pdfminer3.converter import TextConverter
+from docx import Document # For .docx file processing
+
+try:
+    import pymupdf # PyMuPDF, optional
+except ImportError:
+    pymupdf = None
+
+import telemetry
+from analysis import extract_resume_data
+
+PDF_BACKEND = os.getenv('PDF_BACKEND', 'layout')
+# 0 disables a cap
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 10))
+PDF_MAX_BYTES = int(os.getenv('PDF_MAX_BYTES', 200_000)) # UTF-8 bytes of extracted text
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+# Below this many pages the cost of starting work in other processes outweighs the gain
+PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 6))
+RESUME_SPOOL_BYTES = int(os.getenv('RESUME_SPOOL_BYTES', 4 * 1024 * 1024))
+
+TRUNCATED_PAGES = "max_pages"
+TRUNCATED_BYTES = "max_bytes"
+
+
+class ResumeParser:
+    """
+    Resume parsing class using Alibaba Cloud LLM model
+    """
+    def __init__(self, resume, file_name=None, pdf_backend=None, pdf_workers=None):
+        """
+        `resume` is a path or an in-memory upload; `file_name` gives the extension of
+        an upload that has no `name` attribute (bytes, memoryview).
+        """
+        self.resume = resume
+        if isinstance(resume, (str, os.PathLike)):
+            self.file_name = os.fspath(resume)
+        else:
+            self.file_name = file_name or getattr(resume, 'name', '')
+        self.pdf_backend = pdf_backend
+        self.pdf_workers = pdf_workers
+        # Set by extract_text_and_pages: TRUNCATED_PAGES / TRUNCATED_BYTES if only part of the PDF was read
+        self.truncated = None
+        self.resume_text, self.actual_num_pages = self.extract_text_and_pages()
+
+    def extract_text_and_pages(self):
+        """Extract text and count pages from resume PDF or DOCX"""
+        file_format = os.path.splitext(self.file_name)[1].lower().lstrip('.')
+        with telemetry.span("extract_text", format=file_format) as extract_span, telemetry.profiled("extract_text"):
+            text, page_count = self._extract_text_and_pages()
+            extract_span.set(pages=page_count, chars=len(text), truncated=self.truncated,
+                             backend=(self.pdf_backend or PDF_BACKEND) if file_format == 'pdf' else None)
+        return text, page_count
+
+    def _extract_text_and_pages(self):
+        text = ""
+        page_count = 0
+        try:
+            if self.file_name.lower().endswith('.pdf'):
+                with spooled_resume(self.resume, '.pdf') as source:
+                    result = extract_pdf(source, self.pdf_backend, workers=self.pdf_workers)
+                text = result["text"]
+                self.truncated = result["truncated"]
+                # The page count feeds the experience-level heuristics, so report the real
+                # length of a truncated document rather than the pages that were read
+                page_count = result["pages_total"] if result["truncated"] else result["pages_read"]
+            elif self.file_name.lower().endswith('.docx'):
+                with open_resume(self.resume) as fh:
+                    doc = Document(fh)
+                full_text = [para.text for para in doc.paragraphs]
+                text = '\n'.join(full_text)
+                # Page count for docx is not straightforward, can estimate or use a library if crucial.
+                # For simplicity, we'll report 1 or based on text length if needed.
+                # Or, we can rely on the LLM if it's part of the extraction prompt.
+                # For now, let's default to 1 for docx if not otherwise determined.
+                page_count = 1 # Simplification for DOCX page count
+            else:
+                print(f"Unsupported file format for {os.path.basename(self.file_name)}. Please upload a PDF or DOCX file.")
+                return "", 0
+        except Exception as e:
+            print(f"Error reading file {os.path.basename(self.file_name)}: {e}")
+            return "", 0
+        return text, page_count
+
+    def get_extracted_data(self):
+        """Extract structured data from resume using Alibaba Cloud LLM"""
+        return extract_resume_data(self.resume_text, self.actual_num_pages)
+
+
+class _BufferReader(io.RawIOBase):
+    """Seekable binary reader over a bytes-like object, without copying it."""
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._view[self._pos:self._pos + len(b)]
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+def resume_size(resume):
+    """Size in bytes of a path, bytes-like object or seekable binary file."""
+    if isinstance(resume, (str, os.PathLike)):
+        return os.path.getsize(resume)
+    if isinstance(resume, (bytes, bytearray, memoryview)):
+        return memoryview(resume).nbytes
+    if hasattr(resume, 'getbuffer'):
+        return resume.getbuffer().nbytes
+    position = resume.tell()
+    size = resume.seek(0, io.SEEK_END)
+    resume.seek(position)
+    return size
+
+@contextmanager
+def open_resume(resume):
+    """Binary file object for a path, bytes-like object or file object, positioned at the start."""
+    if isinstance(resume, (str, os.PathLike)):
+        with open(resume, 'rb') as fh:
+            yield fh
+    elif isinstance(resume, (bytes, bytearray, memoryview)):
+        with _BufferReader(resume) as fh:
+            yield fh
+    else:
+        # Streamlit's UploadedFile is a BytesIO: read it in place and leave it open for the caller
+        resume.seek(0)
+        yield resume
+
+@contextmanager
+def spooled_resume(resume, suffix):
+    """
+    The resume itself, unless it is an upload larger than RESUME_SPOOL_BYTES: those are
+    written to a temporary file (removed afterwards) so page ranges can be read in parallel.
+    """
+    if isinstance(resume, (str, os.PathLike)) or resume_size(resume) <= RESUME_SPOOL_BYTES:
+        yield resume
+        return
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+        with open_resume(resume) as fh:
+            while True:
+                chunk = fh.read(1024 * 1024)
+                if not chunk:
+                    break
+                spool.write(chunk)
+    try:
+        yield spool.name
+    finally:
+        os.remove(spool.name)
+
+
+class _FastTextConverter(TextConverter):
+    """
+    TextConverter for laparams=None. pdfminer then skips layout analysis entirely,
+    but also emits no line breaks, so lines and word gaps are rebuilt from the
+    character positions in the order the content stream draws them.
+    """
+    def receive_layout(self, ltpage):
+        parts = []
+        last = None
+
+        def render(item):
+            nonlocal last
+            if isinstance(item, LTChar):
+                if last is not None:
+                    line_height = max(last.height, item.height, 1.0)
+                    if abs(item.y0 - last.y0) > line_height * 0.5 or item.x0 < last.x0 - line_height:
+                        parts.append('\n')
+                    elif item.x0 - last.x1 > max(last.width, item.width) * 0.3 and parts[-1] != ' ':
+                        parts.append(' ')
+                parts.append(item.get_text())
+                last = item
+            elif isinstance(item, LTContainer):
+                for child in item:
+                    render(child)
+
+        render(ltpage)
+        parts.append('\n\f')
+        self.write_text(''.join(parts))
+
+
+def _pdfminer_pages(resume, page_numbers, laparams, converter_class):
+    """Yield the text of each page in `page_numbers` (0-based, ascending)."""
+    resource_manager = PDFResourceManager()
+    fake_file_handle = io.StringIO()
+    converter = converter_class(resource_manager, fake_file_handle, laparams=laparams)
+    page_interpreter = PDFPageInterpreter(resource_manager, converter)
+    try:
+        with open_resume(resume) as fh:
+            for page in PDFPage.get_pages(fh, pagenos=set(page_numbers), caching=True, check_extractable=True):
+                try:
+                    page_interpreter.process_page(page)
+                except Exception as e: # Catch errors during processing of a specific page
+                    print(f"Skipping a page in PDF due to error: {e}")
+                    fake_file_handle.seek(0)
+                    fake_file_handle.truncate(0)
+                    yield None
+                    continue # Skip to the next page
+                yield fake_file_handle.getvalue()
+                fake_file_handle.seek(0)
+                fake_file_handle.truncate(0)
+    finally:
+        converter.close()
+        fake_file_handle.close()
+
+def _layout_pages(resume, page_numbers):
+    return _pdfminer_pages(resume, page_numbers, LAParams(), TextConverter)
+
+def _fast_pages(resume, page_numbers):
+    return _pdfminer_pages(resume, page_numbers, None, _FastTextConverter)
+
+def _pymupdf_pages(resume, page_numbers):
+    if isinstance(resume, (str, os.PathLike)):
+        doc = pymupdf.open(resume)
+    else:
+        with open_resume(resume) as fh:
+            doc = pymupdf.open(stream=fh.read(), filetype='pdf')
+    with doc:
+        for number in page_numbers:
+            try:
+                yield doc[number].get_text() + '\f'
+            except Exception:
+                yield None # Counted by extract_pdf
+
+# Backend name -> generator of per-page text (None for a page that failed)
+PDF_BACKENDS = {"layout": _layout_pages, "fast": _fast_pages}
+if pymupdf is not None:
+    PDF_BACKENDS["pymupdf"] = _pymupdf_pages
+
+
+def count_pdf_pages(resume):
+    """Page count from the document catalog, without interpreting any page."""
+    try:
+        with open_resume(resume) as fh:
+            document = PDFDocument(PDFParser(fh))
+            return int(resolve1(document.catalog['Pages'])['Count'])
+    except Exception:
+        # Broken page trees: fall back to walking them
+        with open_resume(resume) as fh:
+            return sum(1 for _ in PDFPage.get_pages(fh))
+
+def _read_pages(resume, backend, page_numbers, max_bytes=0):
+    """Runs in the caller or in a pool worker: [page text or None] for `page_numbers`."""
+    pages = []
+    size = 0
+    for text in PDF_BACKENDS[backend](resume, page_numbers):
+        pages.append(text)
+        size += len(text.encode('utf-8')) if text else 0
+        if max_bytes and size > max_bytes:
+            break # The caller caps the text; later pages would be discarded anyway
+    return pages
+
+def _page_ranges(count, parts):
+    """Split pages 0..count-1 into `parts` contiguous ranges, so each worker parses the file once."""
+    size, extra = divmod(count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+_page_pool = None
+_page_pool_workers = 0
+_page_pool_lock = threading.Lock()
+
+def _get_page_pool(workers):
+    # One pool per process: the Streamlit script reruns on every interaction and
+    # starting worker processes per upload would cost more than it saves. Job worker
+    # threads share it, and forking a multithreaded process can deadlock the child,
+    # so the workers are spawned.
+    global _page_pool, _page_pool_workers
+    with _page_pool_lock:
+        if _page_pool is None or _page_pool_workers < workers:
+            if _page_pool is not None:
+                _page_pool.shutdown(wait=False)
+            _page_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _page_pool_workers = workers
+        return _page_pool
+
+def extract_pdf(resume, backend=None, max_pages=None, max_bytes=None, workers=None):
+    """
+    Extract text from a PDF path or in-memory upload with the given backend (default PDF_BACKEND).
+    At most `max_pages` pages and `max_bytes` UTF-8 bytes of text are kept (0 for no cap).
+    Files on disk with at least PARALLEL_MIN_PAGES pages to read are split across `workers` processes.
+    Returns {"text", "pages_total", "pages_read", "truncated", "backend", "elapsed_s"};
+    "truncated" is None, TRUNCATED_PAGES or TRUNCATED_BYTES.
+    """
+    backend = backend or PDF_BACKEND
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}'. Available: {', '.join(PDF_BACKENDS)}")
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    max_bytes = PDF_MAX_BYTES if max_bytes is None else max_bytes
+    workers = PDF_WORKERS if workers is None else workers
+    start_time = time.perf_counter()
+
+    pages_total = count_pdf_pages(resume)
+    to_read = min(pages_total, max_pages) if max_pages else pages_total
+    truncated = TRUNCATED_PAGES if to_read < pages_total else None
+
+    on_disk = isinstance(resume, (str, os.PathLike))
+    if on_disk and workers > 1 and to_read >= PARALLEL_MIN_PAGES:
+        ranges = _page_ranges(to_read, min(workers, to_read))
+        pool = _get_page_pool(workers)
+        futures = [pool.submit(_read_pages, resume, backend, page_numbers) for page_numbers in ranges]
+        pages = [text for future in futures for text in future.result()]
+    else:
+        pages = _read_pages(resume, backend, list(range(to_read)), max_bytes)
+
+    text = ''.join(page for page in pages if page)
+    if max_bytes:
+        encoded = text.encode('utf-8')
+        if len(encoded) > max_bytes:
+            text = encoded[:max_bytes].decode('utf-8', 'ignore')
+            truncated = TRUNCATED_BYTES
+    # Counted here rather than in the backends, which may run in pool workers
+    page_errors = sum(1 for page in pages if page is None)
+    if page_errors:
+        telemetry.count("pdf_page_errors_total", page_errors, backend=backend)
+    if truncated:
+        telemetry.count("pdf_truncated_total", reason=truncated)
+    return {
+        "text": text,
+        "pages_total": pages_total,
+        "pages_read": sum(1 for page in pages if page is not None),
+        "truncated": truncated,
+        "backend": backend,
+        "elapsed_s": time.perf_counter() - start_time,
+    }
+
+def pdf_reader(resume, backend=None, max_pages=None, max_bytes=None, workers=None):
+    """Compatibility wrapper around extract_pdf: returns (text, pages read)."""
+    result = extract_pdf(resume, backend, max_pages, max_bytes, workers)
+    return result["text"], result["pages_read"]
+
+def extract_resume_text(resume_file_path):
+    """
+    Module-level (picklable) helper for process pools: returns (text, page count, truncated).
+    Runs single-process, since the batch analyzer already extracts one file per worker.
+    """
+    parser = ResumeParser(resume_file_path, pdf_workers=1)
+    return parser.resume_text, parser.actual_num_pages, parser.truncated
@@ -0,0 +1,262 @@
+###### Local skill extraction ######
+# A compiled Aho-Corasick matcher over a skills vocabulary finds every known skill
+# in a resume in one linear pass over the text, in milliseconds and without an LLM
+# call or a spaCy pipeline. The vocabulary is seeded from the per-category lists
+# behind recommend_skills, plus aliases ("JS" -> "JavaScript") and a few common
+# skills those lists do not name.
+import os
+import re
+import threading
+
+# Per job category skills the app recommends; also the seed of the matcher vocabulary
+SKILL_RECOMMENDATIONS = {
+    "Data Science": ['Python', 'R', 'SQL', 'Machine Learning', 'Deep Learning', 'Data Visualization (Tableau, PowerBI)', 'Statistics', 'Big Data (Spark, Hadoop)'],
+    "Web Development": ['HTML', 'CSS', 'JavaScript (ES6+)', 'React', 'Angular', 'Vue.js', 'Node.js', 'Express.js', 'Django', 'Ruby on Rails', 'PHP', 'RESTful APIs', 'GraphQL', 'Databases (SQL, NoSQL)'],
+    "Android Development": ['Kotlin', 'Java', 'Android SDK', 'XML', 'Jetpack Compose', 'Firebase', 'RESTful APIs', 'Git'],
+    "IOS Development": ['Swift', 'Objective-C', 'Xcode', 'UIKit', 'SwiftUI', 'Core Data', 'Firebase', 'RESTful APIs'],
+    "UI-UX Development": ['Figma', 'Adobe XD', 'Sketch', 'User Research', 'Wireframing', 'Prototyping', 'Usability Testing', 'Interaction Design', 'Visual Design'],
+    "Project Manager": ['Agile/Scrum', 'JIRA', 'MS Project', 'Risk Management', 'Stakeholder Communication', 'Budgeting', 'Resource Planning', 'Project Documentation', 'PMP Certification', 'Kanban', 'Confluence'],
+    "Product Manager": ['Market Research', 'User Stories', 'Product Roadmapping', 'A/B Testing', 'Product Analytics', 'Competitive Analysis', 'Wireframing', 'Product Strategy', 'Business Requirements', 'Prioritization Frameworks', 'Product Lifecycle Management'],
+    "Machine Learning Engineer": ['Python', 'TensorFlow', 'PyTorch', 'Scikit-learn', 'MLOps', 'Docker', 'Kubernetes', 'Cloud ML Services (AWS SageMaker, Azure ML)', 'Feature Engineering', 'Model Deployment', 'ML Algorithms', 'Data Pipelines'],
+    "Fullstack Engineer": ['JavaScript/TypeScript', 'React/Angular/Vue', 'Node.js', 'Database Design', 'RESTful APIs', 'GraphQL', 'Git', 'CI/CD', 'Cloud Services', 'Docker', 'Testing Frameworks', 'System Design', 'Frontend & Backend Architecture'],
+    "Software Engineer": ['Data Structures', 'Algorithms', 'System Design', 'Git', 'CI/CD', 'Testing (Unit, Integration)', 'Design Patterns', 'Programming Languages (Java/Python/C++/etc.)', 'Cloud Technologies', 'Microservices', 'DevOps'],
+    "Data Engineer": ['SQL', 'Python', 'ETL Pipelines', 'Data Warehousing', 'Spark', 'Hadoop', 'Airflow', 'Cloud Data Services (Snowflake, BigQuery)', 'Data Modeling', 'Database Administration', 'Kafka', 'Data Governance'],
+    "Data Analyst": ['SQL', 'Excel (Advanced)', 'Python/R', 'Data Visualization (Tableau, PowerBI)', 'Statistical Analysis', 'A/B Testing', 'Business Intelligence Tools', 'Dashboard Design', 'Data Cleaning', 'Google Analytics', 'Business Acumen'],
+    "Other": ["Consider specializing further or exploring related fields based on interests."]
+}
+# Job categories that share another category's recommendation list
+SKILL_LIST_FOR_CATEGORY = {
+    "FrontEnd Development": "Web Development",
+    "Backend Development": "Web Development",
+}
+
+# Common skills the recommendation lists do not name
+EXTRA_SKILLS = [
+    'C', 'C++', 'C#', 'Go', 'Rust', 'Scala', 'Ruby', 'MATLAB', 'Bash', '.NET', 'Spring Boot', 'Flask', 'FastAPI',
+    'Next.js', 'Redux', 'Tailwind CSS', 'Bootstrap', 'jQuery', 'Pandas', 'NumPy', 'Keras', 'OpenCV', 'NLP',
+    'Computer Vision', 'LLMs', 'PostgreSQL', 'MySQL', 'MongoDB', 'Redis', 'Elasticsearch', 'AWS', 'Azure', 'GCP',
+    'Terraform', 'Ansible', 'Jenkins', 'GitHub Actions', 'Linux', 'Power BI', 'Tableau', 'Looker', 'dbt',
+    'Snowflake', 'BigQuery', 'Databricks', 'Excel', 'Jupyter', 'Communication', 'Leadership', 'Teamwork',
+    'Problem Solving',
+]
+
+# Canonical skill -> other spellings found in resumes. Matching is case-insensitive, except
+# for patterns of two characters or less and CASE_SENSITIVE_PATTERNS, which must match
+# exactly so that "R", "Go" or "REST" are not found in ordinary words.
+SKILL_ALIASES = {
+    'JavaScript': ['JS', 'ECMAScript', 'ES6'],
+    'TypeScript': ['TS'],
+    'React': ['ReactJS', 'React.js'],
+    'Vue.js': ['Vue', 'VueJS'],
+    'Angular': ['AngularJS', 'Angular.js'],
+    'Node.js': ['Node', 'NodeJS'],
+    'Express.js': ['Express', 'ExpressJS'],
+    'Next.js': ['NextJS'],
+    'Machine Learning': ['ML'],
+    'Deep Learning': ['DL'],
+    'Scikit-learn': ['sklearn', 'scikit learn', 'scikit'],
+    'TensorFlow': ['Tensor Flow'],
+    'Kubernetes': ['k8s'],
+    'PostgreSQL': ['Postgres'],
+    'MongoDB': ['Mongo'],
+    'Power BI': ['PowerBI'],
+    'AWS': ['Amazon Web Services'],
+    'GCP': ['Google Cloud', 'Google Cloud Platform'],
+    'Azure': ['Microsoft Azure'],
+    'Go': ['Golang'],
+    'C#': ['CSharp'],
+    'C++': ['CPP'],
+    'CI/CD': ['CICD', 'Continuous Integration'],
+    'RESTful APIs': ['REST', 'REST API', 'REST APIs', 'RESTful API', 'RESTful'],
+    'JIRA': ['Atlassian JIRA'],
+    'Agile': ['Agile Methodology'],
+    'Scrum': ['Scrum Master'],
+    'ETL Pipelines': ['ETL'],
+    'Spark': ['Apache Spark', 'PySpark'],
+    'Kafka': ['Apache Kafka'],
+    'Airflow': ['Apache Airflow'],
+    'Hadoop': ['Apache Hadoop'],
+    'NLP': ['Natural Language Processing'],
+    'LLMs': ['LLM', 'Large Language Models'],
+    'A/B Testing': ['AB Testing', 'Split Testing'],
+    'Excel': ['MS Excel', 'Microsoft Excel'],
+    'Objective-C': ['ObjC'],
+    'Problem Solving': ['Problem-Solving'],
+}
+
+CASE_SENSITIVE_PATTERNS = {'REST', 'Node', 'Express', 'Swift', 'Sketch', 'Spark', 'Kanban', 'Looker', 'Rust', 'Ruby'}
+
+# Vocabulary entries that are not skills to look for in a resume text
+_NOT_SKILLS = {'advanced', 'unit', 'integration', 'etc.', 'es6+', 'programming languages', 'cloud technologies',
+               'cloud services', 'databases', 'testing', 'big data', 'cloud ml services', 'cloud data services',
+               'consider specializing further or exploring related fields based on interests.'}
+# Slash-separated entries that name one skill rather than alternatives
+_KEEP_WHOLE = {'CI/CD', 'A/B Testing'}
+
+
+def _vocabulary_entries(entry):
+    """'Data Visualization (Tableau, PowerBI)' -> ['Data Visualization', 'Tableau', 'PowerBI'], 'Python/R' -> ['Python', 'R']."""
+    match = re.match(r"^(.*?)\s*\((.*)\)\s*$", entry)
+    names = [match.group(1)] + re.split(r"[,/]", match.group(2)) if match else [entry]
+    skills = []
+    for name in names:
+        name = name.strip()
+        parts = [name] if name in _KEEP_WHOLE else name.split('/')
+        skills.extend(part.strip() for part in parts if part.strip() and part.strip().lower() not in _NOT_SKILLS)
+    return skills
+
+def default_vocabulary():
+    """Canonical skill names: the recommendation lists, expanded, plus EXTRA_SKILLS, in first-seen order."""
+    vocabulary = {}
+    for entries in SKILL_RECOMMENDATIONS.values():
+        for entry in entries:
+            for skill in _vocabulary_entries(entry):
+                vocabulary.setdefault(skill.lower(), skill)
+    for skill in EXTRA_SKILLS:
+        vocabulary.setdefault(skill.lower(), skill)
+    return list(vocabulary.values())
+
+
+class SkillMatcher:
+    """
+    Aho-Corasick automaton over the skill patterns (canonical names and their aliases).
+    Built once; `find` then scans a text in a single pass, O(len(text) + matches),
+    regardless of the vocabulary size.
+    """
+    def __init__(self, vocabulary=None, aliases=None):
+        vocabulary = default_vocabulary() if vocabulary is None else list(vocabulary)
+        aliases = SKILL_ALIASES if aliases is None else aliases
+        # The automaton runs over lowercased text; pattern -> canonical skill
+        self._canonical = {}
+        self._exact = {}
+        # Aliases first, so a vocabulary entry that is also an alias ("PowerBI") maps to its canonical name
+        for skill, spellings in aliases.items():
+            for spelling in spellings:
+                self._add_pattern(spelling, skill)
+        for skill in vocabulary:
+            self._add_pattern(skill, skill)
+        self._build()
+
+    def _add_pattern(self, pattern, skill):
+        key = pattern.lower()
+        self._canonical.setdefault(key, skill)
+        if len(pattern) <= 2 or pattern in CASE_SENSITIVE_PATTERNS:
+            self._exact.setdefault(key, set()).add(pattern)
+
+    def _build(self):
+        # Node i: outgoing edges self._goto[i], failure link self._fail[i], and self._out[i],
+        # the patterns ending at i (its own and those reached through failure links)
+        self._goto, self._fail, self._out = [{}], [0], [[]]
+        for pattern in self._canonical:
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append(pattern)
+        # Breadth-first, so a node's failure target is finished before the node itself
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while char not in self._goto[fallback] and fallback:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        # Fold the failure links into a full transition table (a DFA), so the scan takes
+        # exactly one dict lookup per character. Characters outside every pattern go to the root.
+        self._delta = [None] * len(self._goto)
+        self._delta[0] = dict(self._goto[0])
+        for node in queue:
+            self._delta[node] = dict(self._delta[self._fail[node]], **self._goto[node])
+
+    @staticmethod
+    def _is_boundary(text, index):
+        return index < 0 or index >= len(text) or not text[index].isalnum()
+
+    def find(self, text):
+        """
+        Every whole-word skill mention as (start, end, canonical skill), in text order.
+        Mentions inside a longer one are dropped ("C" in "C++", "Spark" in "Apache Spark").
+        """
+        lowered = text.lower()
+        delta, out = self._delta, self._out
+        matches = []
+        node = 0
+        for index, char in enumerate(lowered):
+            node = delta[node].get(char, 0)
+            for pattern in out[node]:
+                start = index - len(pattern) + 1
+                if not (self._is_boundary(lowered, start - 1) and self._is_boundary(lowered, index + 1)):
+                    continue
+                if pattern in self._exact and text[start:index + 1] not in self._exact[pattern]:
+                    continue
+                matches.append((start, index + 1, self._canonical[pattern]))
+        matches.sort(key=lambda match: (match[0], -match[1]))
+        longest, end = [], -1
+        for match in matches:
+            if match[1] > end:
+                longest.append(match)
+                end = match[1]
+        return longest
+
+    def extract(self, text):
+        """Distinct canonical skills mentioned in `text`, in order of first mention."""
+        skills = {}
+        for _, _, skill in self.find(text):
+            skills.setdefault(skill, None)
+        return list(skills)
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_skill_matcher():
+    """Process-wide matcher for the default vocabulary, compiled on first use."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = SkillMatcher()
+    return _matcher
+
+def extract_skills(text):
+    return get_skill_matcher().extract(text)
+
+def canonical_skill(name):
+    """Canonical spelling of one skill name ("k8s" -> "Kubernetes"); names outside the vocabulary are kept as they are."""
+    name = name.strip()
+    matches = get_skill_matcher().find(name)
+    if len(matches) == 1 and matches[0][:2] == (0, len(name)):
+        return matches[0][2]
+    return name
+
+def skill_recommendations(job_category):
+    """The recommendation list for a job category, [] if it has none."""
+    return SKILL_RECOMMENDATIONS.get(SKILL_LIST_FOR_CATEGORY.get(job_category, job_category), [])
+
+def category_skills(job_category):
+    """Canonical skills behind a category's recommendation list, in list order."""
+    skills = {}
+    for entry in skill_recommendations(job_category):
+        for skill in _vocabulary_entries(entry):
+            skills.setdefault(canonical_skill(skill), None)
+    return list(skills)
+
+# With at least this many skills found locally, the LLM prompts skip skill extraction
+# and the matched skills are used instead; below it the LLM extracts skills as before.
+# 0 disables the pre-fill.
+SKILL_PREFILL_MIN = int(os.getenv('SKILL_PREFILL_MIN', 5))
+
+def skills_for_prefill(matched_skills):
+    """`matched_skills` if there are enough to pre-fill the extraction with, else None (the LLM extracts them)."""
+    if SKILL_PREFILL_MIN and len(matched_skills) >= SKILL_PREFILL_MIN:
+        return matched_skills
+    return None
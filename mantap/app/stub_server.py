@@ -0,0 +1,313 @@
+###### Local OpenAI-compatible stub server ######
+# Stands in for the DashScope compatible-mode endpoint so the LLM client, retry
+# policy and connection pooling can be exercised offline:
+#
+#   python stub_server.py --port 8011 --fail-first 2 --fail-status 429
+#   ALIBABA_BASE_URL=http://127.0.0.1:8011/v1 streamlit run app.py
+#
+# For load tests it can draw latencies from a distribution, fail a share of the
+# requests and pace completions at a token rate:
+#
+#   python stub_server.py --latency lognormal:2.5,0.5 --error-rate 0.02 --tokens-per-s 40
+#
+# and record real responses once, then replay them offline:
+#
+#   python stub_server.py --upstream https://dashscope-intl.aliyuncs.com/compatible-mode/v1 --record-to replies.jsonl
+#   python stub_server.py --replay-from replies.jsonl
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Request fields that select a recorded response
+REPLAY_KEY_FIELDS = ("model", "messages", "max_tokens", "temperature", "top_p", "response_format")
+
+
+def parse_latency(spec):
+    """
+    Latency sampler `sample(rng) -> seconds` from a spec: "fixed:S", "uniform:LO,HI",
+    "normal:MEAN,SD", "lognormal:MEDIAN,SIGMA" or "exp:MEAN". A plain number is fixed.
+    """
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)) or ':' not in spec:
+        return lambda rng: float(spec)
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',')]
+    samplers = {
+        "fixed": lambda rng: values[0],
+        "uniform": lambda rng: rng.uniform(values[0], values[1]),
+        "normal": lambda rng: max(0.0, rng.gauss(values[0], values[1])),
+        "lognormal": lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+        "exp": lambda rng: rng.expovariate(1 / values[0]),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution '{kind}'. Available: {', '.join(samplers)}")
+    return samplers[kind]
+
+def replay_key(request):
+    key = {name: request.get(name) for name in REPLAY_KEY_FIELDS}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def load_recordings(path):
+    recordings = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                recordings[record["key"]] = record
+    return recordings
+
+
+class StubLLMServer:
+    """
+    Minimal /v1/chat/completions server speaking HTTP/1.1 with keep-alive.
+    The first `fail_first` requests get `fail_status`; after that each request fails
+    with probability `error_rate`, with a status drawn from `error_statuses`.
+    Every response is delayed by `latency_s`, or by a draw from `latency` (see
+    parse_latency) when given, and with `tokens_per_s` by the time to generate its
+    completion tokens. `responder(messages)` returns the assistant message content.
+    Requests with "stream": true get server-sent events, one small delta every
+    `chunk_delay_s` seconds.
+
+    With `upstream` every request is forwarded there (with the caller's Authorization
+    header) and the response appended to `record_to`; with `replay_from` recorded
+    responses are served, at their recorded latency unless `latency` is given, and
+    requests without a recording fall back to `responder`.
+    """
+    def __init__(self, host="127.0.0.1", port=0, responder=None, latency_s=0.0,
+                 fail_first=0, fail_status=429, chunk_delay_s=0.0, latency=None, error_rate=0.0,
+                 error_statuses=(429, 500, 503), tokens_per_s=0.0, seed=None,
+                 upstream=None, record_to=None, replay_from=None):
+        self.responder = responder or (lambda messages: "OK")
+        self.latency_s = latency_s
+        self.latency = parse_latency(latency) if latency is not None else None
+        self.chunk_delay_s = chunk_delay_s
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.tokens_per_s = tokens_per_s
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.record_to = record_to
+        self.recordings = load_recordings(replay_from) if replay_from else {}
+        self.requests_seen = 0
+        self.connections_seen = 0
+        self.errors_injected = 0
+        self.replay_hits = 0
+        self.replay_misses = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    def _draw(self, sampler):
+        with self._lock:
+            return sampler(self._rng)
+
+    def _injected_error(self, request_number):
+        if request_number <= self.fail_first:
+            return self.fail_status
+        if self.error_rate:
+            with self._lock:
+                if self._rng.random() < self.error_rate:
+                    self.errors_injected += 1
+                    return self._rng.choice(self.error_statuses)
+        return None
+
+    def _forward(self, request, authorization):
+        """(status, content, usage, error payload, seconds) from the upstream endpoint, recorded on success."""
+        body = dict(request, stream=False)
+        body.pop("stream_options", None)
+        upstream_request = urllib.request.Request(
+            self.upstream + "/chat/completions", data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": authorization or ""})
+        start_time = time.perf_counter()
+        try:
+            with urllib.request.urlopen(upstream_request, timeout=300) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, None, None, json.loads(e.read() or b"{}"), time.perf_counter() - start_time
+        elapsed = time.perf_counter() - start_time
+        content, usage = payload["choices"][0]["message"]["content"], payload.get("usage")
+        if self.record_to:
+            line = json.dumps({"key": replay_key(request), "model": request.get("model"), "latency_s": round(elapsed, 3),
+                               "content": content, "usage": usage}, ensure_ascii=False)
+            with self._lock:
+                with open(self.record_to, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        return 200, content, usage, None, elapsed
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests_seen, "connections": self.connections_seen,
+                    "errors_injected": self.errors_injected, "replay_hits": self.replay_hits,
+                    "replay_misses": self.replay_misses}
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections_seen += 1
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output readable
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_event(self, payload):
+                data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode("utf-8")
+                # Chunked transfer encoding keeps the connection reusable without a Content-Length
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream_completion(self, request, request_number, content, usage, chunk_delay_s):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base = {"id": f"chatcmpl-stub-{request_number}", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": request.get("model", "stub")}
+                for start in range(0, len(content), 8):
+                    self._send_event(dict(base, choices=[{"index": 0, "finish_reason": None,
+                                                          "delta": {"content": content[start:start + 8]}}]))
+                    if chunk_delay_s:
+                        time.sleep(chunk_delay_s)
+                self._send_event(dict(base, choices=[{"index": 0, "finish_reason": "stop", "delta": {}}]))
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    self._send_event(dict(base, choices=[], usage=usage))
+                self._send_event("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests_seen += 1
+                    request_number = server.requests_seen
+                recording = server.recordings.get(replay_key(request)) if server.recordings else None
+                if server.recordings:
+                    with server._lock:
+                        if recording is None:
+                            server.replay_misses += 1
+                        else:
+                            server.replay_hits += 1
+                if server.upstream:
+                    latency_s = 0.0  # The upstream call is the latency
+                elif server.latency is not None:
+                    latency_s = server._draw(server.latency)
+                else:
+                    latency_s = recording["latency_s"] if recording else server.latency_s
+                if latency_s:
+                    time.sleep(latency_s)
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                error_status = server._injected_error(request_number)
+                if error_status:
+                    self._send_json(error_status, {"error": {"message": "Injected failure", "code": str(error_status)}},
+                                    headers={"Retry-After": "0"})
+                    return
+                messages = request.get("messages", [])
+                usage = None
+                if server.upstream:
+                    status, content, usage, error, _ = server._forward(request, self.headers.get("Authorization"))
+                    if status != 200:
+                        self._send_json(status, error)
+                        return
+                elif recording is not None:
+                    content, usage = recording["content"], recording.get("usage")
+                else:
+                    content = server.responder(messages)
+                if usage is None:
+                    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+                    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                             "total_tokens": prompt_tokens + len(content) // 4}
+                # Generation time at tokens_per_s; streamed deltas carry ~2 tokens (8 characters) each
+                generation_s = usage["completion_tokens"] / server.tokens_per_s if server.tokens_per_s and not server.upstream else 0.0
+                if request.get("stream"):
+                    chunks = max(1, math.ceil(len(content) / 8))
+                    self._stream_completion(request, request_number, content, usage,
+                                            max(server.chunk_delay_s, generation_s / chunks))
+                    return
+                if generation_s:
+                    time.sleep(generation_s)
+                self._send_json(200, {
+                    "id": f"chatcmpl-stub-{request_number}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": usage,
+                })
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub for the DashScope endpoint.")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8011)
+    arg_parser.add_argument("--latency", default="0",
+                            help="Seconds to wait before each response, or a distribution such as lognormal:2.5,0.5")
+    arg_parser.add_argument("--fail-first", type=int, default=0, help="Number of initial requests to fail")
+    arg_parser.add_argument("--fail-status", type=int, default=429)
+    arg_parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed deltas")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests to fail at random")
+    arg_parser.add_argument("--error-statuses", type=int, nargs="+", default=[429, 500, 503])
+    arg_parser.add_argument("--tokens-per-s", type=float, default=0.0, help="Completion generation rate (0: instant)")
+    arg_parser.add_argument("--seed", type=int, default=None)
+    arg_parser.add_argument("--upstream", help="Forward requests to this base URL (e.g. the real endpoint)")
+    arg_parser.add_argument("--record-to", help="With --upstream: append the responses to this JSONL file")
+    arg_parser.add_argument("--replay-from", help="Serve the responses recorded in this JSONL file")
+    args = arg_parser.parse_args()
+    stub = StubLLMServer(args.host, args.port, fail_first=args.fail_first, fail_status=args.fail_status,
+                         chunk_delay_s=args.chunk_delay, latency=args.latency if args.latency != "0" else None,
+                         error_rate=args.error_rate, error_statuses=args.error_statuses, tokens_per_s=args.tokens_per_s,
+                         seed=args.seed, upstream=args.upstream, record_to=args.record_to, replay_from=args.replay_from)
+    print(f"Stub LLM server listening on {stub.base_url}")
+    try:
+        stub._httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,296 @@
+###### Instrumentation ######
+# Timing spans, counters and histograms for the resume pipeline: text extraction,
+# every pipeline stage, every LLM call (model, latency, prompt/completion tokens,
+# errors, retries), the repairs needed to find the JSON in a response, how each
+# stage's response fared against its schema and which cheap-model answers were
+# escalated to the next model tier.
+#
+#   TELEMETRY_TRACE_FILE=trace.jsonl    one JSON line per span and event
+#   TELEMETRY_METRICS_PORT=9464         Prometheus text format on /metrics
+#   TELEMETRY=1                         metrics only, e.g. for prometheus_text()
+#   PROFILE_DIR=profiles                cProfile dumps of text extraction
+#
+# With none of them set, span() hands out a shared no-op context manager and
+# count()/observe()/event() return after one flag check.
+import contextlib
+import contextvars
+import cProfile
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY_TRACE_FILE = os.getenv('TELEMETRY_TRACE_FILE') or None
+TELEMETRY_METRICS_PORT = int(os.getenv('TELEMETRY_METRICS_PORT', 0))
+TELEMETRY_ENABLED = os.getenv('TELEMETRY', '1' if TELEMETRY_TRACE_FILE or TELEMETRY_METRICS_PORT else '0') != '0'
+PROFILE_DIR = os.getenv('PROFILE_DIR') or None
+
+METRIC_PREFIX = "mantap_"
+# Seconds; LLM calls take seconds, local stages milliseconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRIC_HELP = {
+    "span_duration_seconds": "Duration of instrumented spans (extraction, pipeline stages, LLM calls).",
+    "span_errors_total": "Spans that ended in an error or timeout.",
+    "llm_tokens_total": "Tokens reported by the API usage field, by stage and kind.",
+    "llm_first_token_seconds": "Time to the first streamed token.",
+    "llm_errors_total": "LLM calls that failed after retries.",
+    "llm_retries_total": "Retried LLM requests, by error type.",
+    "json_parse_total": "LLM responses by the repairs needed to find the JSON (direct, markdown_fence, brace_scan, trailing_comma).",
+    "llm_json_total": "Schema-checked LLM responses by stage and outcome (ok, coerced, repaired, failed).",
+    "llm_admission_wait_seconds": "Time LLM requests waited in the admission queue.",
+    "llm_admission_queue_depth": "LLM requests waiting for admission.",
+    "llm_admission_total": "LLM requests throttled by the endpoint (429) or timed out waiting for admission.",
+    "llm_concurrency_limit": "Current adaptive limit on concurrent LLM requests.",
+    "fused_fallbacks_total": "Fused analyses that failed and fell back to the multi-call path.",
+    "llm_escalations_total": "Answers of a cheaper model tier passed over for the next tier, by stage, model and reason.",
+    "pdf_page_errors_total": "PDF pages skipped because the backend could not read them, by backend.",
+    "pdf_truncated_total": "PDFs cut short by PDF_MAX_PAGES or PDF_MAX_BYTES, by reason.",
+    "jobs_total": "Analysis jobs by outcome (submitted, attached, rejected, done, failed).",
+    "job_wait_seconds": "Time analysis jobs waited in the queue for a worker.",
+    "job_queue_depth": "Analysis jobs waiting for a worker.",
+    "job_workers_busy": "Job workers running an analysis.",
+    "store_rows_total": "Analysis store rows by outcome (written, dropped, failed).",
+}
+
+_trace_id = contextvars.ContextVar('trace_id', default=None)
+
+
+class Metrics:
+    """Thread-safe counters, gauges and histograms keyed by (name, labels)."""
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts, then sum and count
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self):
+        """{"counters": {...}, "gauges": {...}, "histograms": {...}} keyed by "name{label=value,...}"."""
+        def key_text(name, labels):
+            return name + ("{" + ",".join(f"{key}={value}" for key, value in labels) + "}" if labels else "")
+        with self._lock:
+            return {
+                "counters": {key_text(*key): value for key, value in self._counters.items()},
+                "gauges": {key_text(*key): value for key, value in self._gauges.items()},
+                "histograms": {key_text(*key): {"count": histogram[-1], "sum": histogram[-2]}
+                               for key, histogram in self._histograms.items()},
+            }
+
+    def prometheus_text(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, list(histogram)) for key, histogram in self._histograms.items())
+        lines, described = [], set()
+
+        def describe(name, metric_type):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {METRIC_PREFIX}{name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{METRIC_PREFIX}{name}{label_text(labels)} {value}")
+        for (name, labels), value in gauges:
+            describe(name, "gauge")
+            lines.append(f"{METRIC_PREFIX}{name}{label_text(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram):
+                cumulative += count
+                lines.append(f"{METRIC_PREFIX}{name}_bucket{label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{METRIC_PREFIX}{name}_bucket{label_text(labels, [('le', '+Inf')])} {histogram[-1]}")
+            lines.append(f"{METRIC_PREFIX}{name}_sum{label_text(labels)} {histogram[-2]}")
+            lines.append(f"{METRIC_PREFIX}{name}_count{label_text(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+class TraceSink:
+    """Appends one JSON object per line; whole lines, so several processes can share the file."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        line = json.dumps(record, default=str, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+class _Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.status = "ok"
+
+    def set(self, **attrs):
+        """Attach attributes known only once the work is done (page count, token counts...)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.status = "error"
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        record_span(self.name, time.perf_counter() - self._start, self.status, **self.attrs)
+        return False
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+metrics = Metrics()
+_sink = TraceSink(TELEMETRY_TRACE_FILE) if TELEMETRY_ENABLED and TELEMETRY_TRACE_FILE else None
+
+
+def span(name, **attrs):
+    """
+    Context manager timing the enclosed block as span `name`. An exception marks it as an
+    error (and propagates); `set()` on the returned span adds attributes.
+    """
+    if not TELEMETRY_ENABLED:
+        return _NULL_SPAN
+    return _Span(name, attrs)
+
+def record_span(name, duration_s, status="ok", **attrs):
+    """Record a span timed elsewhere, e.g. a pipeline stage whose StageResult has the duration."""
+    if not TELEMETRY_ENABLED:
+        return
+    metrics.observe("span_duration_seconds", duration_s, span=name)
+    if status != "ok":
+        metrics.inc("span_errors_total", span=name, status=status)
+    if _sink is not None:
+        _sink.write(dict(attrs, ts=round(time.time(), 6), trace_id=_trace_id.get(), span=name,
+                         duration_s=round(duration_s, 6), status=status))
+
+def count(name, amount=1, **labels):
+    if TELEMETRY_ENABLED:
+        metrics.inc(name, amount, **labels)
+
+def gauge(name, value, **labels):
+    if TELEMETRY_ENABLED:
+        metrics.set(name, value, **labels)
+
+def observe(name, value, **labels):
+    if TELEMETRY_ENABLED:
+        metrics.observe(name, value, **labels)
+
+def event(name, **attrs):
+    """A point-in-time trace record (a retry, a JSON repair), written to the trace sink only."""
+    if TELEMETRY_ENABLED and _sink is not None:
+        _sink.write(dict(attrs, ts=round(time.time(), 6), trace_id=_trace_id.get(), event=name))
+
+@contextlib.contextmanager
+def trace(trace_id):
+    """Tag the spans and events of the enclosed block (and of the tasks it starts) with `trace_id`."""
+    token = _trace_id.set(trace_id)
+    try:
+        yield
+    finally:
+        _trace_id.reset(token)
+
+@contextlib.contextmanager
+def profiled(name):
+    """Run the block under cProfile when PROFILE_DIR is set; the stats go to PROFILE_DIR/<name>-<time>.prof."""
+    if not PROFILE_DIR:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}-{time.time_ns()}.prof")
+        profiler.dump_stats(path)
+        print(f"Wrote profile {path} (view with: python -m pstats {path})")
+
+def prometheus_text():
+    return metrics.prometheus_text()
+
+
+###### Prometheus endpoint ######
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /metrics from a daemon thread; once per process, however often it is called."""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                # E.g. a worker process re-importing this module while the parent holds the port
+                print(f"Could not serve metrics on port {port}: {e}")
+                return None
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+            print(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+        return _metrics_server
+
+if TELEMETRY_ENABLED and TELEMETRY_METRICS_PORT:
+    start_metrics_server(TELEMETRY_METRICS_PORT)
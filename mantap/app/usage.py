@@ -0,0 +1,159 @@
+###### LLM token & latency accounting ######
+# Lives outside app.py because Streamlit re-executes the main script on every
+# rerun, which would reset any module-level counters defined there.
+import json
+import os
+import threading
+
+# USD per million prompt and completion tokens, for the cost estimates (DashScope
+# international list prices; override or extend with LLM_MODEL_PRICES, a JSON object
+# such as {"qwen-max": [1.6, 6.4]})
+MODEL_PRICES = {"qwen-max": (1.6, 6.4), "qwen-plus": (0.4, 1.2), "qwen-turbo": (0.05, 0.2)}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv('LLM_MODEL_PRICES', '{}')).items()})
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of one call; 0 for a model without a known price."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return ((prompt_tokens or 0) * prompt_price + (completion_tokens or 0) * completion_price) / 1e6
+
+
+class UsageTracker:
+    """
+    Accumulates prompt/completion tokens, latency and estimated cost per LLM stage so
+    the fused and multi-call analysis modes can be compared on cost, and per stage and
+    model (tier) so the model routing can be tuned.
+    """
+    def __init__(self):
+        self._stages = {}
+        self._tiers = {}
+        self._json = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, prompt_tokens, completion_tokens, latency_s, first_token_s=None, model=None):
+        """`first_token_s` is the time to the first streamed token, for streaming calls only."""
+        cost_usd = call_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            stats = self._stages.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_s": 0.0,
+                                                    "streamed_calls": 0, "first_token_s": 0.0, "cost_usd": 0.0})
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens or 0
+            stats["completion_tokens"] += completion_tokens or 0
+            stats["latency_s"] += latency_s
+            stats["cost_usd"] += cost_usd
+            if first_token_s is not None:
+                stats["streamed_calls"] += 1
+                stats["first_token_s"] += first_token_s
+            tier = self._tier(stage, model)
+            tier["calls"] += 1
+            tier["prompt_tokens"] += prompt_tokens or 0
+            tier["completion_tokens"] += completion_tokens or 0
+            tier["latency_s"] += latency_s
+            tier["cost_usd"] += cost_usd
+
+    def _tier(self, stage, model):
+        return self._tiers.setdefault((stage, model), {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                       "latency_s": 0.0, "cost_usd": 0.0, "escalations": {}})
+
+    def record_escalation(self, stage, model, reason):
+        """The answer of `model` for `stage` was not used and the next tier was asked."""
+        with self._lock:
+            escalations = self._tier(stage, model)["escalations"]
+            escalations[reason] = escalations.get(reason, 0) + 1
+
+    def tier_report(self):
+        """
+        {stage: {model: stats}} with per-call averages (latency, tokens, cost), the total
+        cost and the escalation rate: the share of the model's calls whose answer was
+        passed over for the next tier.
+        """
+        with self._lock:
+            tiers = {key: dict(stats, escalations=dict(stats["escalations"])) for key, stats in self._tiers.items()}
+        report = {}
+        for (stage, model), stats in sorted(tiers.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            calls = max(stats["calls"], 1)
+            escalated = sum(stats["escalations"].values())
+            report.setdefault(stage, {})[model] = {
+                "calls": stats["calls"],
+                "latency_s": stats["latency_s"] / calls,
+                "prompt_tokens": stats["prompt_tokens"] / calls,
+                "completion_tokens": stats["completion_tokens"] / calls,
+                "cost_usd": stats["cost_usd"] / calls,
+                "total_cost_usd": stats["cost_usd"],
+                "escalations": stats["escalations"],
+                "escalation_rate": escalated / calls,
+            }
+        return report
+
+    def record_json(self, stage, outcome):
+        """Outcome of a JSON response: ok, coerced (fixed locally), repaired (by a retry) or failed."""
+        with self._lock:
+            counts = self._json.setdefault(stage, {"ok": 0, "coerced": 0, "repaired": 0, "failed": 0})
+            counts[outcome] += 1
+
+    def json_report(self):
+        """Per stage: response counts by outcome, with the repair (retry) and failure rates."""
+        with self._lock:
+            report = {stage: dict(counts) for stage, counts in self._json.items()}
+        for counts in report.values():
+            responses = sum(counts.values())
+            counts["responses"] = responses
+            counts["repair_rate"] = counts["repaired"] / responses
+            counts["failure_rate"] = counts["failed"] / responses
+        return report
+
+    def stage_averages(self):
+        """Per-call averages for every stage seen so far."""
+        with self._lock:
+            return {
+                stage: {
+                    "calls": stats["calls"],
+                    "prompt_tokens": stats["prompt_tokens"] / stats["calls"],
+                    "completion_tokens": stats["completion_tokens"] / stats["calls"],
+                    "latency_s": stats["latency_s"] / stats["calls"],
+                    "cost_usd": stats["cost_usd"] / stats["calls"],
+                    "first_token_s": stats["first_token_s"] / stats["streamed_calls"] if stats["streamed_calls"] else None,
+                }
+                for stage, stats in self._stages.items()
+            }
+
+    def totals(self):
+        """Calls and tokens across all stages, e.g. for tokens/min in the batch analyzer."""
+        with self._lock:
+            return {
+                "calls": sum(stats["calls"] for stats in self._stages.values()),
+                "prompt_tokens": sum(stats["prompt_tokens"] for stats in self._stages.values()),
+                "completion_tokens": sum(stats["completion_tokens"] for stats in self._stages.values()),
+                "cost_usd": sum(stats["cost_usd"] for stats in self._stages.values()),
+            }
+
+    def mode_report(self, mode_stages):
+        """
+        Estimated cost of one analysis per mode, as the sum of the per-call averages of
+        the stages that mode runs. `mode_stages` maps a mode name to its stage names.
+        Modes with a stage that has not been observed yet are reported as None.
+        """
+        averages = self.stage_averages()
+        report = {}
+        for mode, stages in mode_stages.items():
+            if not all(stage in averages for stage in stages):
+                report[mode] = None
+                continue
+            report[mode] = {
+                "llm_calls": len(stages),
+                "prompt_tokens": sum(averages[stage]["prompt_tokens"] for stage in stages),
+                "completion_tokens": sum(averages[stage]["completion_tokens"] for stage in stages),
+                "latency_s": sum(averages[stage]["latency_s"] for stage in stages),
+                "cost_usd": sum(averages[stage]["cost_usd"] for stage in stages),
+                "samples": min(averages[stage]["calls"] for stage in stages),
+            }
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._tiers.clear()
+            self._json.clear()
+
+
+usage_tracker = UsageTracker()
@@ -0,0 +1,90 @@
+import gc
+import os
+import resource
+import sys
+import threading
+
+import spacy
+from spacy.matcher import Matcher
+
+# Process-wide registry of the spaCy pipelines used by ResumeParser. Loading
+# en_core_web_sm and the custom model costs far more than parsing one resume,
+# so each is loaded once per process and shared by every parser instance.
+
+_models = {}
+_lock = threading.Lock()
+
+CUSTOM_MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _get(name, loader):
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                model = loader()
+                _models[name] = model
+    return model
+
+
+# Components the extractors in utils actually consume. en_core_web_sm needs POS
+# tags for the NAME matcher and the dependency parse for noun_chunks; only the
+# entities of the custom model are read. Everything else is skipped per document.
+NLP_COMPONENTS = {'tok2vec', 'tagger', 'attribute_ruler', 'parser'}
+CUSTOM_NLP_COMPONENTS = {'tok2vec', 'ner'}
+
+
+def unused_components(nlp, needed):
+    return [name for name in nlp.pipe_names if name not in needed]
+
+
+def get_nlp():
+    return _get('nlp', lambda: spacy.load('en_core_web_sm'))
+
+
+def get_custom_nlp():
+    return _get('custom_nlp', lambda: spacy.load(CUSTOM_MODEL_DIR))
+
+
+def get_matcher():
+    # utils.extract_name adds its NAME pattern on every call; ResumeParser
+    # removes it again afterwards so the shared matcher does not accumulate
+    # duplicate patterns.
+    return _get('matcher', lambda: Matcher(get_nlp().vocab))
+
+
+def preload():
+    '''
+    Load every model into this process. Use as a multiprocessing.Pool
+    initializer so each worker pays the load cost once instead of per resume.
+    '''
+    get_nlp()
+    get_custom_nlp()
+    get_matcher()
+
+
+def preload_before_fork():
+    '''
+    Load the models in the parent before forking workers, so they inherit the
+    model pages copy-on-write instead of each loading their own copy.
+    gc.freeze() keeps the collector from touching (and so copying) those pages.
+    '''
+    preload()
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+
+
+def memory_usage_mb():
+    '''Current and peak resident set size of this process, in MB.'''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux but in bytes on macOS
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    current_mb = None
+    try:
+        with open('/proc/self/statm') as f:
+            current_mb = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    return {'rss_mb': current_mb, 'peak_rss_mb': peak_mb}
@@ -1,9 +1,10 @@
 import os
 import multiprocessing as mp
 import io
-import spacy
 import pprint
-from spacy.matcher import Matcher
+import sys
+import time
+from . import models
 from . import utils
 
 
@@ -13,13 +14,16 @@ class ResumeParser(object):
         self,
         resume,
         skills_file=None,
-        custom_regex=None
+        custom_regex=None,
+        text_raw=None,
+        docs=None
     ):
-        nlp = spacy.load('en_core_web_sm')
-        custom_nlp = spacy.load(os.path.dirname(os.path.abspath(__file__)))
+        # Models are loaded once per process and shared between parsers
+        nlp = models.get_nlp()
+        custom_nlp = models.get_custom_nlp()
         self.__skills_file = skills_file
         self.__custom_regex = custom_regex
-        self.__matcher = Matcher(nlp.vocab)
+        self.__matcher = models.get_matcher()
         self.__details = {
             'name': None,
             'email': None,
@@ -29,14 +33,20 @@ class ResumeParser(object):
             'no_of_pages': None,
         }
         self.__resume = resume
-        if not isinstance(self.__resume, io.BytesIO):
-            ext = os.path.splitext(self.__resume)[1].split('.')[1]
-        else:
-            ext = self.__resume.name.split('.')[1]
-        self.__text_raw = utils.extract_text(self.__resume, '.' + ext)
+        # text_raw and docs (nlp doc, custom nlp doc) are passed in by
+        # parse_resumes, which runs both pipelines in batches with nlp.pipe
+        if text_raw is None:
+            text_raw = _extract_raw_text(self.__resume)
+        self.__text_raw = text_raw
         self.__text = ' '.join(self.__text_raw.split())
-        self.__nlp = nlp(self.__text)
-        self.__custom_nlp = custom_nlp(self.__text_raw)
+        if docs is None:
+            docs = (
+                nlp(self.__text, disable=models.unused_components(
+                    nlp, models.NLP_COMPONENTS)),
+                custom_nlp(self.__text_raw, disable=models.unused_components(
+                    custom_nlp, models.CUSTOM_NLP_COMPONENTS)),
+            )
+        self.__nlp, self.__custom_nlp = docs
         self.__noun_chunks = list(self.__nlp.noun_chunks)
         self.__get_basic_details()
 
@@ -48,6 +58,10 @@ class ResumeParser(object):
                             self.__custom_nlp
                         )
         name = utils.extract_name(self.__nlp, matcher=self.__matcher)
+        # extract_name registers its pattern on every call; drop it so the
+        # shared matcher does not grow with each resume
+        if 'NAME' in self.__matcher:
+            self.__matcher.remove('NAME')
         email = utils.extract_email(self.__text)
         mobile = utils.extract_mobile_number(self.__text, self.__custom_regex)
         skills = utils.extract_skills(
@@ -85,14 +99,95 @@ class ResumeParser(object):
         return
 
 
+def _extract_raw_text(resume):
+    if not isinstance(resume, io.BytesIO):
+        ext = os.path.splitext(resume)[1].split('.')[1]
+    else:
+        ext = resume.name.split('.')[1]
+    return utils.extract_text(resume, '.' + ext)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_resumes(
+    resumes,
+    batch_size=32,
+    skills_file=None,
+    custom_regex=None
+):
+    '''
+    Bulk counterpart of ResumeParser: takes an iterable of resume paths (or
+    named BytesIO objects) and yields their detail dicts in order. Texts are
+    fed through nlp.pipe in batches of batch_size with the components the
+    extractors never use disabled.
+    '''
+    nlp = models.get_nlp()
+    custom_nlp = models.get_custom_nlp()
+    nlp_disabled = models.unused_components(nlp, models.NLP_COMPONENTS)
+    custom_disabled = models.unused_components(
+        custom_nlp, models.CUSTOM_NLP_COMPONENTS)
+    for chunk in _chunks(resumes, batch_size):
+        raw_texts = [_extract_raw_text(resume) for resume in chunk]
+        texts = [' '.join(text.split()) for text in raw_texts]
+        docs = nlp.pipe(texts, batch_size=batch_size, disable=nlp_disabled)
+        custom_docs = custom_nlp.pipe(
+            raw_texts, batch_size=batch_size, disable=custom_disabled)
+        for resume, text_raw, doc, custom_doc in zip(
+                chunk, raw_texts, docs, custom_docs):
+            parser = ResumeParser(
+                resume,
+                skills_file=skills_file,
+                custom_regex=custom_regex,
+                text_raw=text_raw,
+                docs=(doc, custom_doc)
+            )
+            yield parser.get_extracted_data()
+
+
+def measure_throughput(resumes, batch_sizes=(1, 8, 32, 128)):
+    '''Docs/sec of parse_resumes for each batch size over the same resumes.'''
+    resumes = list(resumes)
+    models.preload()
+    throughput = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for _ in parse_resumes(resumes, batch_size=batch_size):
+            pass
+        throughput[batch_size] = len(resumes) / (time.perf_counter() - start)
+    return throughput
+
+
 def resume_result_wrapper(resume):
     parser = ResumeParser(resume)
     return parser.get_extracted_data()
 
 
-if __name__ == '__main__':
-    pool = mp.Pool(mp.cpu_count())
+def _resume_result_with_memory(resume):
+    return resume_result_wrapper(resume), os.getpid(), models.memory_usage_mb()
+
 
+def create_pool(processes=None, preload_before_fork=True):
+    '''
+    Worker pool whose processes load the spaCy models once. With the fork
+    start method and preload_before_fork, the parent loads them first and the
+    workers share those pages copy-on-write; otherwise each worker loads them
+    in the pool initializer.
+    '''
+    if preload_before_fork and mp.get_start_method() == 'fork':
+        models.preload_before_fork()
+    return mp.Pool(processes or mp.cpu_count(), initializer=models.preload)
+
+
+if __name__ == '__main__':
     resumes = []
     data = []
     for root, directories, filenames in os.walk('resumes'):
@@ -100,13 +195,31 @@ if __name__ == '__main__':
             file = os.path.join(root, filename)
             resumes.append(file)
 
+    if '--bench' in sys.argv:
+        for batch_size, docs_per_sec in measure_throughput(resumes).items():
+            print('batch_size {:>4}: {:.1f} docs/sec'.format(
+                batch_size, docs_per_sec))
+        sys.exit(0)
+
+    pool = create_pool(
+        preload_before_fork=os.getenv('PYRESPARSER_PRELOAD', '1') != '0'
+    )
+
     results = [
         pool.apply_async(
-            resume_result_wrapper,
+            _resume_result_with_memory,
             args=(x,)
         ) for x in resumes
     ]
 
     results = [p.get() for p in results]
+    worker_memory = {pid: memory for _, pid, memory in results}
+    results = [details for details, _, _ in results]
 
     pprint.pprint(results)
+    for pid, memory in sorted(worker_memory.items()):
+        print('worker {}: rss {} MB, peak {:.1f} MB'.format(
+            pid,
+            '{:.1f}'.format(memory['rss_mb']) if memory['rss_mb'] else 'n/a',
+            memory['peak_rss_mb']
+        ))